@@ -0,0 +1,150 @@
+"""adaptive_refresh.py — Proximity-weighted price refresh intervals
+
+Between candle closes the scanner refreshes prices per symbol. Symbols with
+gaps near price matter most, so each symbol gets its own interval from the
+best memory tier of its active FVGs (see fvg_metrics.classify_memory_tier)
+and its recent volatility:
+
+    priority   5s        (price inside / touching a gap)
+    high       15s       (< 2%)
+    medium     60s       (< 10%)
+    low        180s
+    no gaps    300s
+
+Faster-moving symbols get shorter intervals (up to 2x), calmer ones longer.
+The sum of the planned refreshes is kept inside a global request budget
+(exchange weight per minute) by stretching every interval proportionally;
+with no budget left at all (candle-close rescans spend it) every symbol
+falls back to max_interval.
+"""
+
+import math
+import time
+import logging
+from collections import Counter
+
+from fvg_metrics import MEMORY_TIERS
+from scheduler import timeframe_seconds
+
+logger = logging.getLogger(__name__)
+
+TIER_INTERVALS = {'priority': 5, 'high': 15, 'medium': 60, 'low': 180}
+IDLE_INTERVAL = 300
+
+TICKER_WEIGHT = 2        # Binance /ticker/24hr weight for 1-20 symbols
+TICKER_BATCH_SIZE = 20   # Symbols per fetch_tickers call at that weight
+OHLCV_WEIGHT = 2         # /klines weight for up to 1000 candles
+
+def candle_close_weight(series):
+    """Weight per minute spent by candle-close rescans of (symbol, timeframe) series"""
+    return sum(OHLCV_WEIGHT * 60 / timeframe_seconds(timeframe) for _, timeframe in series)
+
+def best_tier(tiers):
+    """Most urgent memory tier out of an iterable (None if empty)"""
+    best = None
+    for tier in tiers:
+        if tier in TIER_INTERVALS and (best is None or MEMORY_TIERS.index(tier) < MEMORY_TIERS.index(best)):
+            best = tier
+    return best
+
+class AdaptiveRefreshPlanner:
+    """Per-symbol refresh intervals inside a global request budget"""
+
+    def __init__(self, request_budget=600, min_interval=2, max_interval=900, reference_volatility=0.1):
+        self.request_budget = request_budget              # Exchange weight per minute for price refreshes
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.reference_volatility = reference_volatility  # % per minute treated as "normal"
+
+        self.intervals = {}
+        self.tiers = {}
+        self.last_refresh = {}
+        self.volatility = {}          # EWMA of |return| in % per minute
+        self._last_price = {}
+        self.budget_scale = 1.0
+        self.available_budget = request_budget
+
+    def observe(self, symbol, price, now=None):
+        """Feed a refreshed price into the symbol's volatility estimate"""
+        now = time.time() if now is None else now
+        previous = self._last_price.get(symbol)
+        self._last_price[symbol] = (price, now)
+        if previous is None or not previous[0]:
+            return
+        elapsed = max(now - previous[1], 1.0)
+        move = abs(price - previous[0]) / previous[0] * 100
+        # Scale the move to a one-minute horizon (random-walk sqrt-time scaling)
+        per_minute = move * math.sqrt(60 / elapsed)
+        current = self.volatility.get(symbol)
+        self.volatility[symbol] = per_minute if current is None else 0.8 * current + 0.2 * per_minute
+
+    def base_interval(self, symbol, tier):
+        interval = TIER_INTERVALS.get(tier, IDLE_INTERVAL)
+        volatility = self.volatility.get(symbol)
+        if volatility:
+            interval *= min(max(self.reference_volatility / volatility, 0.5), 2.0)
+        return interval
+
+    def plan(self, symbol_tiers, available_budget=None):
+        """
+        Recompute intervals
+
+        symbol_tiers: {symbol: best memory tier or None}
+        available_budget: weight per minute left for price refreshes
+        """
+        budget = self.request_budget if available_budget is None else available_budget
+        self.available_budget = budget
+        intervals = {
+            symbol: min(max(self.base_interval(symbol, tier), self.min_interval), self.max_interval)
+            for symbol, tier in symbol_tiers.items()
+        }
+
+        demand = sum(TICKER_WEIGHT * 60 / interval for interval in intervals.values())
+        if budget <= 0:
+            # Rescans take the whole budget: refresh only as often as the plan ever allows
+            self.budget_scale = math.inf
+            intervals = {s: self.max_interval for s in intervals}
+        elif demand > budget:
+            self.budget_scale = demand / budget
+            intervals = {s: min(i * self.budget_scale, self.max_interval) for s, i in intervals.items()}
+        else:
+            self.budget_scale = 1.0
+
+        self.tiers = dict(symbol_tiers)
+        self.intervals = intervals
+        for symbol in list(self.last_refresh):
+            if symbol not in intervals:
+                del self.last_refresh[symbol]
+        return intervals
+
+    def due(self, now=None):
+        """Symbols whose refresh interval has elapsed (most urgent first)"""
+        now = time.time() if now is None else now
+        ready = [s for s, interval in self.intervals.items() if now - self.last_refresh.get(s, 0) >= interval]
+        ready.sort(key=lambda s: self.intervals[s])
+        return ready
+
+    def mark_refreshed(self, symbols, now=None):
+        now = time.time() if now is None else now
+        for symbol in symbols:
+            self.last_refresh[symbol] = now
+
+    def seconds_until_next(self, now=None):
+        now = time.time() if now is None else now
+        if not self.intervals:
+            return None
+        return max(0.0, min(self.last_refresh.get(s, 0) + i - now for s, i in self.intervals.items()))
+
+    def planned_weight(self):
+        """Exchange weight per minute the current plan spends (upper bound, unbatched)"""
+        return sum(TICKER_WEIGHT * 60 / interval for interval in self.intervals.values())
+
+    def log_plan(self):
+        counts = Counter(self.tiers.get(s) or 'idle' for s in self.intervals)
+        summary = ', '.join(f"{counts[t]} {t}" for t in (*MEMORY_TIERS, 'idle') if counts[t])
+        logger.info(f"🎚️ ADAPTIVE REFRESH: {summary} | ~{self.planned_weight():.0f} weight/min "
+                    f"(budget {self.available_budget:.0f}, "
+                    f"{'exhausted' if math.isinf(self.budget_scale) else f'scale x{self.budget_scale:.2f}'})")
+        fastest = sorted(self.intervals.items(), key=lambda item: item[1])
+        logger.info("🎚️ ADAPTIVE REFRESH intervals: " +
+                    ', '.join(f"{s} {i:.0f}s" for s, i in fastest))
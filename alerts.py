@@ -0,0 +1,280 @@
+"""alerts.py — Server-side FVG alert engine
+
+Rules are evaluated once, on the server, against FVG state changes instead
+of in every open dashboard:
+
+    touch       a gap was touched                       (touch index transition)
+    distance    a gap came within ``threshold`` percent  (transition or updated record)
+    new_block   a new institutional block formed         (block diff per series)
+    strength    a new gap with power_score >= threshold (new detection)
+
+Each rule has a dedupe window (the same gap / block does not re-alert inside
+it) and a rate limit (at most ``max_alerts`` per ``per_seconds``). Alerts are
+delivered on their own low-volume 'alert' channel.
+
+The server's rules (the defaults) are a read-only base layer that alerts
+every alert subscriber. Rules added by a client belong to that client: only
+it sees, removes and is alerted by them, and they go when it disconnects.
+
+Rule definition (also accepted from clients via 'add_alert_rule'):
+
+    {
+        'rule_id': 'near-0.5',
+        'kind': 'distance',
+        'threshold': 0.5,
+        'symbols': ['BTCUSDT'],       # optional filters
+        'timeframes': ['4h', '1d'],
+        'types': ['Bullish'],
+        'dedupe_window': 300,         # seconds
+        'max_alerts': 10,             # rate limit ...
+        'per_seconds': 60             # ... per window
+    }
+"""
+
+import time
+import logging
+from collections import deque
+
+from subscriptions import normalize_symbol
+
+logger = logging.getLogger(__name__)
+
+RULE_KINDS = ('touch', 'distance', 'new_block', 'strength')
+MAX_CLIENT_RULES = 20
+
+# Category drives the dashboard styling (matches the old browser alerts)
+RULE_CATEGORIES = {
+    'touch': 'touch',
+    'distance': 'proximity',
+    'new_block': 'block',
+    'strength': 'strength'
+}
+
+class AlertRule:
+    """A single alert rule with its own dedupe and rate-limit state"""
+
+    def __init__(self, rule_id, kind, threshold=None, symbols=None, timeframes=None, types=None,
+                 dedupe_window=300, max_alerts=10, per_seconds=60, enabled=True):
+        if kind not in RULE_KINDS:
+            raise ValueError(f"Unknown alert rule kind: {kind}")
+        if kind in ('distance', 'strength') and threshold is None:
+            raise ValueError(f"Alert rule '{kind}' needs a threshold")
+
+        self.rule_id = str(rule_id)
+        self.kind = kind
+        self.threshold = float(threshold) if threshold is not None else None
+        self.symbols = {normalize_symbol(s) for s in symbols} if symbols else None
+        self.timeframes = set(timeframes) if timeframes else None
+        self.types = {str(t).capitalize() for t in types} if types else None
+        self.dedupe_window = float(dedupe_window)
+        self.max_alerts = int(max_alerts)
+        self.per_seconds = float(per_seconds)
+        self.enabled = bool(enabled)
+
+        self._last_fired = {}      # dedupe key -> last alert time
+        self._sent = deque()       # alert times inside the rate-limit window
+        self.fired = 0
+        self.deduped = 0
+        self.rate_limited = 0
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            rule_id=data.get('rule_id') or data.get('id') or f"{data.get('kind')}-{int(time.time() * 1000)}",
+            kind=data.get('kind'),
+            threshold=data.get('threshold'),
+            symbols=data.get('symbols'),
+            timeframes=data.get('timeframes'),
+            types=data.get('types'),
+            dedupe_window=data.get('dedupe_window', 300),
+            max_alerts=data.get('max_alerts', 10),
+            per_seconds=data.get('per_seconds', 60),
+            enabled=data.get('enabled', True)
+        )
+
+    def to_dict(self):
+        return {
+            'rule_id': self.rule_id,
+            'kind': self.kind,
+            'threshold': self.threshold,
+            'symbols': sorted(self.symbols) if self.symbols else None,
+            'timeframes': sorted(self.timeframes) if self.timeframes else None,
+            'types': sorted(self.types) if self.types else None,
+            'dedupe_window': self.dedupe_window,
+            'max_alerts': self.max_alerts,
+            'per_seconds': self.per_seconds,
+            'enabled': self.enabled,
+            'stats': {'fired': self.fired, 'deduped': self.deduped, 'rate_limited': self.rate_limited}
+        }
+
+    def _in_scope(self, item):
+        if self.symbols is not None and normalize_symbol(item.get('pair') or item.get('symbol')) not in self.symbols:
+            return False
+        if self.timeframes is not None and (item.get('tf') or item.get('timeframe')) not in self.timeframes:
+            return False
+        item_type = item.get('fvg_type') or item.get('type')
+        if self.types is not None and item_type not in self.types:
+            return False
+        return True
+
+    def match(self, event):
+        """Return (dedupe_key, message) if the event triggers this rule"""
+        kind = event['kind']
+
+        if kind == 'block':
+            if self.kind != 'new_block':
+                return None
+            block = event['block']
+            if not self._in_scope(block):
+                return None
+            return event['key'], f"🔥 BLOCK DETECTED: {block['symbol']} {block['badge']}"
+
+        fvg = event['fvg']
+        if not self._in_scope(fvg):
+            return None
+
+        label = f"{fvg.get('pair')} {fvg.get('tf')} {fvg.get('fvg_type')} FVG"
+        distance = fvg.get('distance_percentage')
+
+        if self.kind == 'touch':
+            if event.get('transition') == 'touched':
+                return (fvg['fvg_id'], 'touch'), f"🎯 FVG TOUCHED: {label}"
+        elif self.kind == 'distance':
+            if distance is not None and distance <= self.threshold and event.get('transition') != 'left':
+                return (fvg['fvg_id'], 'distance'), f"⚠️ PROXIMITY: {label} - {distance}%"
+        elif self.kind == 'strength':
+            if event.get('is_new') and fvg.get('power_score', 0) >= self.threshold:
+                return (fvg['fvg_id'], 'strength'), f"💪 STRONG FVG: {label} - power {fvg.get('power_score')}"
+        return None
+
+    def admit(self, key, now):
+        """Apply dedupe window and rate limit; True if the alert may fire"""
+        last = self._last_fired.get(key)
+        if last is not None and now - last < self.dedupe_window:
+            self.deduped += 1
+            return False
+
+        while self._sent and now - self._sent[0] >= self.per_seconds:
+            self._sent.popleft()
+        if len(self._sent) >= self.max_alerts:
+            self.rate_limited += 1
+            return False
+
+        self._sent.append(now)
+        self._last_fired[key] = now
+        self.fired += 1
+
+        # Keep the dedupe table bounded by the window
+        if len(self._last_fired) > 4 * max(self.max_alerts, 256):
+            self._last_fired = {k: t for k, t in self._last_fired.items() if now - t < self.dedupe_window}
+        return True
+
+def default_rules():
+    """Server-side equivalents of the old browser checkFVGAlerts"""
+    return [
+        AlertRule('touch', 'touch'),
+        AlertRule('proximity-0.5', 'distance', threshold=0.5),
+        AlertRule('new-block', 'new_block', dedupe_window=3600),
+        AlertRule('strength-80', 'strength', threshold=80, dedupe_window=3600)
+    ]
+
+class AlertEngine:
+    """Evaluates rules incrementally against FVG state-change events"""
+
+    def __init__(self, rules=None):
+        self.rules = {}              # Server rules: rule_id -> AlertRule
+        self.client_rules = {}       # owner -> {rule_id: AlertRule}
+        for rule in (default_rules() if rules is None else rules):
+            self.add_rule(rule)
+
+    def add_rule(self, rule, owner=None):
+        """Add a server rule, or with ``owner`` one only that client gets"""
+        if owner is None:
+            self.rules[rule.rule_id] = rule
+            return rule
+        rules = self.client_rules.setdefault(owner, {})
+        if rule.rule_id not in rules and len(rules) >= MAX_CLIENT_RULES:
+            raise ValueError(f"At most {MAX_CLIENT_RULES} alert rules per client")
+        rules[rule.rule_id] = rule
+        return rule
+
+    def remove_rule(self, rule_id, owner=None):
+        """Remove a rule of ``owner`` (None: a server rule)"""
+        if owner is None:
+            return self.rules.pop(str(rule_id), None)
+        rules = self.client_rules.get(owner, {})
+        if str(rule_id) not in rules and str(rule_id) in self.rules:
+            raise ValueError(f"Alert rule '{rule_id}' is a server rule and read-only")
+        rule = rules.pop(str(rule_id), None)
+        if not rules:
+            self.client_rules.pop(owner, None)
+        return rule
+
+    def remove_owner(self, owner):
+        """Drop every rule of a client that went away"""
+        return self.client_rules.pop(owner, None)
+
+    def list_rules(self, owner=None):
+        """Server rules (read-only for clients), then the rules of ``owner``"""
+        rules = [dict(rule.to_dict(), read_only=owner is not None) for rule in self.rules.values()]
+        if owner is not None:
+            rules.extend(dict(rule.to_dict(), read_only=False)
+                         for rule in self.client_rules.get(owner, {}).values())
+        return rules
+
+    def _owned_rules(self):
+        for rule in self.rules.values():
+            yield None, rule
+        for owner, rules in list(self.client_rules.items()):
+            for rule in rules.values():
+                yield owner, rule
+
+    def process(self, events, now=None):
+        """
+        Evaluate a batch of events
+
+        Returns (owner, alert payload) pairs: owner None for server rules
+        (every alert subscriber), otherwise the one client the rule belongs to.
+        """
+        now = time.time() if now is None else now
+        alerts = []
+        for event in events:
+            for owner, rule in self._owned_rules():
+                if not rule.enabled:
+                    continue
+                matched = rule.match(event)
+                if matched is None:
+                    continue
+                key, message = matched
+                if not rule.admit(key, now):
+                    continue
+
+                source = event.get('fvg') or event.get('block')
+                alerts.append((owner, {
+                    'rule_id': rule.rule_id,
+                    'kind': rule.kind,
+                    'category': RULE_CATEGORIES[rule.kind],
+                    'message': message,
+                    'pair': source.get('pair') or source.get('symbol'),
+                    'tf': source.get('tf') or source.get('timeframe'),
+                    'fvg_id': source.get('fvg_id'),
+                    'block_id': source.get('block_id'),
+                    'timestamp': now
+                }))
+        if alerts:
+            logger.info(f"🚨 ALERTS: {len(alerts)} fired")
+        return alerts
+
+    # Event constructors used by the scanner
+
+    @staticmethod
+    def transition_event(state):
+        return {'kind': 'transition', 'fvg': state, 'transition': state.get('transition')}
+
+    @staticmethod
+    def fvg_event(fvg, is_new):
+        return {'kind': 'fvg', 'fvg': fvg, 'is_new': is_new}
+
+    @staticmethod
+    def block_event(block, key):
+        return {'kind': 'block', 'block': block, 'key': key}
@@ -0,0 +1,397 @@
+"""candle_ring.py — Shared-memory candle / FVG rings across server workers
+
+With several uvicorn / gunicorn workers each process would otherwise keep
+its own candles and hit the exchange on its own. With FVG_SHARED_CANDLES=1
+exactly one worker (the holder of an flock on the lock file) is the writer:
+it scans as usual and publishes every series into shared memory. All other
+workers are readers that follow the published series and only serve their
+own WebSocket clients, so exchange traffic does not grow with workers.
+
+One segment per published (symbol, timeframe), named by the series and its
+registration serial:
+
+    header    int64[8]    seq, written, capacity, fvg_count, generation
+              float64[2]  last price, updated_at
+    candles   float64[capacity, 6]   ring of OHLCV rows (slot = n % capacity)
+    fvgs      float64[capacity, 6]   detection arrays (detection_pool layout)
+
+plus a directory segment listing the published series with their serials.
+A series the writer stops scanning is unregistered and its segment
+unlinked; readers drop it on their next poll, and one published again gets
+a new serial (a new segment), so readers never follow a stale segment.
+Writes are guarded by a sequence counter (seqlock): the writer makes ``seq``
+odd, writes, and makes it even again; readers never lock, they copy and
+retry if ``seq`` was odd or changed meanwhile (the copy is what they keep,
+since the writer moves on right after). ``generation`` only moves when candles / FVGs
+change, so readers can tell a price update from a rescan. The writer stamps
+the lock file with an epoch; readers re-attach when it changes (a reader
+that took over after the writer died).
+
+The seqlock relies on stores becoming visible in program order, which holds
+on x86-64 (TSO); numpy writes the header words with single 8-byte stores.
+"""
+
+import os
+import time
+import fcntl
+import hashlib
+import logging
+from collections import defaultdict
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEQ, WRITTEN, CAPACITY, FVG_COUNT, GENERATION = range(5)
+PRICE, UPDATED_AT = range(2)
+HEADER_INTS, HEADER_FLOATS = 8, 2
+HEADER_BYTES = (HEADER_INTS + HEADER_FLOATS) * 8
+
+DIRECTORY_SLOTS = 4096
+KEY_BYTES = 48                  # "SYMBOL|timeframe|serial", utf-8, zero padded
+
+def default_prefix():
+    return os.environ.get('FVG_SHM_PREFIX', 'fvgring')
+
+def shared_candles_enabled():
+    return os.environ.get('FVG_SHARED_CANDLES', '0').lower() in ('1', 'true', 'yes')
+
+def segment_name(prefix, symbol, timeframe, serial=0):
+    digest = hashlib.md5(f"{symbol}|{timeframe}|{serial}".encode()).hexdigest()[:16]
+    return f"{prefix}_{digest}"
+
+def _open_segment(name, size, create):
+    """Create (or take over a stale) segment as writer, or attach as reader"""
+    if not create:
+        shm = shared_memory.SharedMemory(name=name)
+        # Readers must not unlink on exit: only the writer owns the segment's lifetime
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+    try:
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        # Left behind by a writer that died; its content is overwritten by the new writer
+        shm = shared_memory.SharedMemory(name=name)
+        if shm.size >= size:
+            return shm
+        shm.close()
+        shm.unlink()
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+class _SeqLocked:
+    """Seqlock protocol over an int64 header"""
+
+    def _begin_write(self):
+        self._ints[SEQ] += 1        # Odd: write in progress
+
+    def _end_write(self):
+        self._ints[SEQ] += 1        # Even: consistent
+
+    def _read(self, copy_fn, retries=1000):
+        for _ in range(retries):
+            before = int(self._ints[SEQ])
+            if before & 1:
+                time.sleep(0)
+                continue
+            result = copy_fn()
+            if int(self._ints[SEQ]) == before:
+                return before, result
+        raise TimeoutError(f"{self.name}: writer did not finish")
+
+    @property
+    def sequence(self):
+        return int(self._ints[SEQ])
+
+class SeriesRing(_SeqLocked):
+    """Candle ring + FVG arrays of one series in shared memory"""
+
+    def __init__(self, name, capacity=1000, create=False):
+        self.name = name
+        size = HEADER_BYTES + 2 * capacity * 6 * 8
+        self.shm = _open_segment(name, size, create)
+        buffer = self.shm.buf
+        self._ints = np.ndarray((HEADER_INTS,), dtype=np.int64, buffer=buffer)
+        self._floats = np.ndarray((HEADER_FLOATS,), dtype=np.float64, buffer=buffer, offset=HEADER_INTS * 8)
+        if create:
+            self._ints[:] = 0
+            self._ints[CAPACITY] = capacity
+        self.capacity = int(self._ints[CAPACITY])
+        self._candles = np.ndarray((self.capacity, 6), dtype=np.float64, buffer=buffer, offset=HEADER_BYTES)
+        self._fvgs = np.ndarray((self.capacity, 6), dtype=np.float64, buffer=buffer,
+                                offset=HEADER_BYTES + self.capacity * 6 * 8)
+
+    # ------------------------------------------------------------------ writer
+
+    def replace(self, candles, fvg_arrays=None, price=None):
+        """Publish a whole series (newest ``capacity`` rows) and its detections"""
+        candles = np.asarray(candles, dtype=np.float64).reshape(-1, 6)[-self.capacity:]
+        self._begin_write()
+        try:
+            self._candles[:len(candles)] = candles
+            self._ints[WRITTEN] = len(candles)
+            self._write_fvgs(fvg_arrays)
+            if price:
+                self._floats[PRICE] = price
+            self._floats[UPDATED_AT] = time.time()
+            self._ints[GENERATION] += 1
+        finally:
+            self._end_write()
+
+    def set_price(self, price):
+        self._begin_write()
+        self._floats[PRICE] = price
+        self._floats[UPDATED_AT] = time.time()
+        self._end_write()
+
+    def _write_fvgs(self, fvg_arrays):
+        if fvg_arrays is None:
+            return
+        count = min(len(fvg_arrays[0]), self.capacity)
+        for column, values in enumerate(fvg_arrays):
+            self._fvgs[:count, column] = values[:count]
+        self._ints[FVG_COUNT] = count
+
+    # ------------------------------------------------------------------ reader
+
+    def _ordered(self):
+        written = int(self._ints[WRITTEN])
+        if written <= self.capacity:
+            return self._candles[:written].copy()
+        start = written % self.capacity
+        return np.concatenate((self._candles[start:], self._candles[:start]))
+
+    def read(self):
+        """Consistent copy: (seq, generation, candles, fvg_arrays, price)"""
+        def copy():
+            count = int(self._ints[FVG_COUNT])
+            fvgs = self._fvgs[:count].copy()
+            arrays = (fvgs[:, 0].astype(np.int64), fvgs[:, 1].astype(bool), fvgs[:, 2], fvgs[:, 3],
+                      fvgs[:, 4], fvgs[:, 5])
+            return int(self._ints[GENERATION]), self._ordered(), arrays, float(self._floats[PRICE])
+        seq, (generation, candles, arrays, price) = self._read(copy)
+        return seq, generation, candles, arrays, price
+
+    def read_price(self):
+        return self._read(lambda: (int(self._ints[GENERATION]), float(self._floats[PRICE])))[1]
+
+    def close(self, unlink=False):
+        self._ints = self._floats = self._candles = self._fvgs = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+class RingDirectory(_SeqLocked):
+    """Shared list of published (symbol, timeframe, serial) series"""
+
+    def __init__(self, prefix, create=False):
+        self.name = f"{prefix}_dir"
+        self.shm = _open_segment(self.name, HEADER_INTS * 8 + DIRECTORY_SLOTS * KEY_BYTES, create)
+        self._ints = np.ndarray((HEADER_INTS,), dtype=np.int64, buffer=self.shm.buf)
+        self._keys = np.ndarray((DIRECTORY_SLOTS, KEY_BYTES), dtype=np.uint8, buffer=self.shm.buf,
+                                offset=HEADER_INTS * 8)
+        if create:
+            self._ints[:] = 0
+
+    def register(self, symbol, timeframe):
+        """Add a series; returns its serial (unique for this writer)"""
+        count = int(self._ints[WRITTEN])
+        if count >= DIRECTORY_SLOTS:
+            raise OverflowError("candle ring directory is full")
+        serial = int(self._ints[GENERATION]) + 1
+        key = f"{symbol}|{timeframe}|{serial}".encode()
+        if len(key) > KEY_BYTES:
+            raise ValueError(f"series key too long: {key!r}")
+        self._begin_write()
+        try:
+            self._keys[count] = 0
+            self._keys[count, :len(key)] = np.frombuffer(key, dtype=np.uint8)
+            self._ints[WRITTEN] = count + 1
+            self._ints[GENERATION] = serial
+        finally:
+            self._end_write()
+        return serial
+
+    def unregister(self, symbol, timeframe):
+        """Remove a series (the last slot moves into its place)"""
+        count = int(self._ints[WRITTEN])
+        for slot, (slot_symbol, slot_timeframe, _) in enumerate(self.series()):
+            if (slot_symbol, slot_timeframe) == (symbol, timeframe):
+                self._begin_write()
+                try:
+                    self._keys[slot] = self._keys[count - 1]
+                    self._keys[count - 1] = 0
+                    self._ints[WRITTEN] = count - 1
+                finally:
+                    self._end_write()
+                return True
+        return False
+
+    def series(self):
+        """[(symbol, timeframe, serial)] of every published series"""
+        def copy():
+            return self._keys[:int(self._ints[WRITTEN])].copy()
+        _, keys = self._read(copy)
+        series = []
+        for row in keys:
+            symbol, timeframe, serial = bytes(row).rstrip(b'\0').decode().rsplit('|', 2)
+            series.append((symbol, timeframe, int(serial)))
+        return series
+
+    def close(self, unlink=False):
+        self._ints = self._keys = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+class CandleRings:
+    """Writer / reader facade over the directory and the per-series rings"""
+
+    def __init__(self, prefix=None, capacity=1000, lock_path=None):
+        self.prefix = prefix or default_prefix()
+        self.capacity = capacity
+        self.lock_path = lock_path or os.path.join('/tmp', f"{self.prefix}.lock")
+        self.is_writer = False
+        self.directory = None
+        self.rings = {}                 # (symbol, timeframe) -> SeriesRing
+        self.serials = {}               # (symbol, timeframe) -> serial of the attached segment
+        self._by_symbol = defaultdict(dict)     # symbol -> {timeframe: SeriesRing}
+        self._lock_file = None
+        self._epoch = None
+        self._seen = {}                 # Reader: (symbol, timeframe) -> (seq, generation)
+
+    def elect(self):
+        """Become the writer if no other live process is; returns is_writer"""
+        if self.is_writer:
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Drop a reader's attachments before recreating the segments as writer
+        self.close()
+        self._lock_file = lock_file
+        self.is_writer = True
+        self.directory = RingDirectory(self.prefix, create=True)
+        lock_file.truncate(0)
+        lock_file.write(f"{os.getpid()}-{time.time()}")
+        lock_file.flush()
+        return True
+
+    def _writer_epoch(self):
+        try:
+            with open(self.lock_path) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _ring(self, symbol, timeframe, serial=None):
+        """Writer: the series' ring, registered on first use; reader: attach the published serial"""
+        key = (symbol, timeframe)
+        ring = self.rings.get(key)
+        if ring is not None and (serial is None or self.serials[key] == serial):
+            return ring
+        if ring is not None:
+            self._detach(symbol, timeframe)     # Republished under a new serial
+        if self.is_writer:
+            serial = self.directory.register(symbol, timeframe)
+        ring = SeriesRing(segment_name(self.prefix, symbol, timeframe, serial), self.capacity,
+                          create=self.is_writer)
+        self.rings[key] = ring
+        self.serials[key] = serial
+        self._by_symbol[symbol][timeframe] = ring
+        return ring
+
+    def _detach(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        ring = self.rings.pop(key, None)
+        if ring is None:
+            return
+        self.serials.pop(key, None)
+        self._seen.pop(key, None)
+        timeframes = self._by_symbol.get(symbol)
+        if timeframes is not None:
+            timeframes.pop(timeframe, None)
+            if not timeframes:
+                del self._by_symbol[symbol]
+        ring.close(unlink=self.is_writer)
+
+    # ------------------------------------------------------------------ writer
+
+    def publish_series(self, symbol, timeframe, candles, fvg_arrays, price=None):
+        self._ring(symbol, timeframe).replace(candles, fvg_arrays, price)
+
+    def publish_price(self, symbol, price):
+        for ring in self._by_symbol.get(symbol, {}).values():
+            ring.set_price(price)
+
+    def drop_symbol(self, symbol):
+        """Writer: stop publishing a symbol (readers drop it on their next poll)"""
+        for timeframe in list(self._by_symbol.get(symbol, ())):
+            self.directory.unregister(symbol, timeframe)
+            self._detach(symbol, timeframe)
+
+    def retain(self, symbols):
+        """Writer: universe changed, stop publishing every symbol outside it"""
+        symbols = set(symbols)
+        for symbol in [symbol for symbol in self._by_symbol if symbol not in symbols]:
+            self.drop_symbol(symbol)
+
+    # ------------------------------------------------------------------ reader
+
+    def poll(self):
+        """
+        Reader: series changed since the last poll
+
+        Returns (symbol, timeframe, kind, candles, fvg_arrays, price) with kind
+        'series' (new candles / detections), 'price' (price only) or 'removed'
+        (no longer published; candles, arrays and price are None).
+        """
+        epoch = self._writer_epoch()
+        if epoch != self._epoch:
+            self.close()            # New writer: its segments replace the ones we attached
+            self._epoch = epoch
+        if self.directory is None:
+            try:
+                self.directory = RingDirectory(self.prefix)
+            except FileNotFoundError:
+                return []   # Writer has not published anything yet
+
+        changes = []
+        published = self.directory.series()
+        current = {(symbol, timeframe) for symbol, timeframe, _ in published}
+        for symbol, timeframe in [key for key in self.rings if key not in current]:
+            self._detach(symbol, timeframe)
+            changes.append((symbol, timeframe, 'removed', None, None, None))
+
+        for symbol, timeframe, serial in published:
+            try:
+                ring = self._ring(symbol, timeframe, serial)
+            except FileNotFoundError:
+                continue
+            key = (symbol, timeframe)
+            seen = self._seen.get(key)
+            if seen is not None and seen[0] == ring.sequence:
+                continue
+            seq, generation, candles, arrays, price = ring.read()
+            kind = 'series' if seen is None or seen[1] != generation else 'price'
+            self._seen[key] = (seq, generation)
+            changes.append((symbol, timeframe, kind, candles, arrays, price))
+        return changes
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close(unlink=self.is_writer)
+        self.rings = {}
+        self.serials = {}
+        self._by_symbol = defaultdict(dict)
+        if self.directory is not None:
+            self.directory.close(unlink=self.is_writer)
+            self.directory = None
+        self._seen = {}
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self.is_writer = False
@@ -0,0 +1,182 @@
+"""candle_series.py — Columnar OHLCV candles shared by the scanner and fvg_metrics
+
+Exchanges return candles as a list of [timestamp, open, high, low, close,
+volume] rows. CandleSeries converts that payload once into contiguous
+columns (int64 open times, float64 open/high/low/close/volume) that the
+detection engines read directly, so no DataFrame is built per fetch:
+
+    CandleSeries.from_ohlcv(rows)   exchange payload -> columns
+    series[-200:]                   zero-copy view (shares the buffers)
+    series.append(candle)           amortized O(1); grows into spare capacity
+    series[-1]                      one row as a list, like the raw payload
+    np.asarray(series)              (n, 6) float64 rows for code that wants them
+
+Views share rows with the series they were taken from: set_last() on the
+newest candle is visible through every view that contains it. Appending to
+a view that does not end at its buffer's newest row copies it first, so a
+view never overwrites rows another view still reads.
+"""
+
+import numpy as np
+
+FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)    # Rows of the float64 value block
+MIN_CAPACITY = 64
+
+class _Buffer:
+    """Storage behind one or more CandleSeries views"""
+    __slots__ = ('times', 'values', 'fill')
+
+    def __init__(self, times, values, fill):
+        self.times = times           # (capacity,) int64 open times in ms
+        self.values = values         # (5, capacity) float64, one contiguous row per field
+        self.fill = fill             # Rows written
+
+    @classmethod
+    def allocate(cls, capacity):
+        return cls(np.empty(capacity, dtype=np.int64), np.empty((5, capacity), dtype=np.float64), 0)
+
+class CandleSeries:
+    """Columnar candle series; slicing returns views, appending grows in place"""
+    __slots__ = ('_buffer', '_start', '_stop')
+
+    def __init__(self, buffer=None, start=0, stop=None):
+        self._buffer = buffer if buffer is not None else _Buffer.allocate(MIN_CAPACITY)
+        self._start = start
+        self._stop = self._buffer.fill if stop is None else stop
+
+    # ---------------------------------------------------------------- building
+
+    @classmethod
+    def from_ohlcv(cls, rows):
+        """Series from exchange OHLCV rows (list of lists or an (n, 6) array)"""
+        array = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+        return cls.from_columns(array[:, 0], np.ascontiguousarray(array[:, 1:].T))
+
+    @classmethod
+    def from_columns(cls, times, values):
+        """Series over existing columns: (n,) open times and a (5, n) OHLCV block (no copy when already typed)"""
+        times = np.asarray(times)
+        if times.dtype != np.int64:
+            times = times.astype(np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        return cls(_Buffer(times, values, len(times)))
+
+    @classmethod
+    def coerce(cls, candles):
+        """CandleSeries as is, anything else through from_ohlcv"""
+        return candles if isinstance(candles, cls) else cls.from_ohlcv(candles)
+
+    # ------------------------------------------------------------------ access
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("CandleSeries slices must be contiguous")
+            return CandleSeries(self._buffer, self._start + start, self._start + max(stop, start))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("candle index out of range")
+        position = self._start + key
+        return [int(self._buffer.times[position])] + self._buffer.values[:, position].tolist()
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def __array__(self, dtype=None, copy=None):
+        rows = np.empty((len(self), 6), dtype=np.float64)
+        rows[:, 0] = self.timestamp
+        rows[:, 1:] = self.values.T
+        return rows if dtype is None else rows.astype(dtype, copy=False)
+
+    @property
+    def timestamp(self):
+        return self._buffer.times[self._start:self._stop]
+
+    @property
+    def values(self):
+        """(5, n) float64 block: open, high, low, close, volume"""
+        return self._buffer.values[:, self._start:self._stop]
+
+    @property
+    def open(self):
+        return self._buffer.values[OPEN, self._start:self._stop]
+
+    @property
+    def high(self):
+        return self._buffer.values[HIGH, self._start:self._stop]
+
+    @property
+    def low(self):
+        return self._buffer.values[LOW, self._start:self._stop]
+
+    @property
+    def close(self):
+        return self._buffer.values[CLOSE, self._start:self._stop]
+
+    @property
+    def volume(self):
+        return self._buffer.values[VOLUME, self._start:self._stop]
+
+    @property
+    def last_timestamp(self):
+        return int(self._buffer.times[self._stop - 1]) if len(self) else None
+
+    def to_rows(self):
+        """Exchange-style list of [timestamp, open, high, low, close, volume] rows"""
+        return [[t] + list(v) for t, v in zip(self.timestamp.tolist(), self.values.T.tolist())]
+
+    # ---------------------------------------------------------------- updating
+
+    def _reserve(self, count):
+        """Make room for ``count`` rows after this view, copying it out when it cannot grow in place"""
+        buffer = self._buffer
+        if self._stop == buffer.fill and buffer.fill + count <= len(buffer.times):
+            return
+        size = len(self)
+        grown = _Buffer.allocate(max(MIN_CAPACITY, 2 * (size + count)))
+        grown.times[:size] = self.timestamp
+        grown.values[:, :size] = self.values
+        grown.fill = size
+        self._buffer, self._start, self._stop = grown, 0, size
+
+    def append(self, candle):
+        """Append one [timestamp, open, high, low, close, volume] candle"""
+        self._reserve(1)
+        buffer = self._buffer
+        buffer.times[self._stop] = candle[0]
+        buffer.values[:, self._stop] = candle[1:6]
+        self._stop += 1
+        buffer.fill = self._stop
+
+    def extend(self, rows):
+        """Append OHLCV rows (or another series)"""
+        other = CandleSeries.coerce(rows)
+        count = len(other)
+        if not count:
+            return
+        self._reserve(count)
+        buffer = self._buffer
+        buffer.times[self._stop:self._stop + count] = other.timestamp
+        buffer.values[:, self._stop:self._stop + count] = other.values
+        self._stop += count
+        buffer.fill = self._stop
+
+    def set_last(self, candle):
+        """Overwrite the newest candle (the forming candle of a live stream)"""
+        if not len(self):
+            raise IndexError("set_last on an empty CandleSeries")
+        self._buffer.times[self._stop - 1] = candle[0]
+        self._buffer.values[:, self._stop - 1] = candle[1:6]
+
+    def to_frame(self):
+        """pandas DataFrame with the exchange column names (for code that still wants one)"""
+        import pandas as pd
+        return pd.DataFrame({'timestamp': self.timestamp, 'open': self.open, 'high': self.high,
+                             'low': self.low, 'close': self.close, 'volume': self.volume})
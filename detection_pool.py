@@ -0,0 +1,227 @@
+"""detection_pool.py — FVG detection in a process pool over shared memory
+
+The candle loop in FVGScanner.detect_fvgs is CPU-bound and used to run on
+the event loop that also serves WebSocket clients. DetectionPool moves it to
+worker processes:
+
+    parent   copies the CandleSeries columns into a multiprocessing.shared_memory
+             block (one contiguous float64 row per field)
+    worker   attaches to the block by name, wraps it in a CandleSeries without
+             copying, runs the vectorized detection and returns compact
+             arrays (no DataFrames, no per-FVG dicts are pickled)
+    parent   unlinks the block and expands the result into FVG dicts
+
+The detection rules are the same as detect_fvgs: for every middle candle i,
+bullish if high[i-1] < low[i+1], else bearish if low[i-1] > high[i+1].
+
+With mitigation on, gaps price has since traded through are dropped before
+they leave the worker, like the Pine script deleting its boxes: a bullish
+gap dies once a later low goes below its bottom, a bearish one once a later
+high goes above its top. changelvl moves the touched edge with price (the
+bullish top down to the lowest later low, the bearish bottom up to the
+highest later high).
+
+Before that, with min_gap_atr set, gaps smaller than that fraction of the
+series' rolling ATR (taken at the candle before the gap, so the displacement
+candle does not inflate it) are pruned as noise; they never become dicts.
+"""
+
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from candle_series import CandleSeries
+
+logger = logging.getLogger(__name__)
+
+def default_pool_size():
+    """FVG_DETECTION_WORKERS, else one worker per spare core (max 4); 0 disables the pool"""
+    configured = os.environ.get('FVG_DETECTION_WORKERS')
+    if configured is not None:
+        return max(int(configured), 0)
+    return max(min((os.cpu_count() or 1) - 1, 4), 1)
+
+def detect_fvg_arrays(candles):
+    """
+    Vectorized detection on a CandleSeries (or OHLCV rows)
+
+    Returns (index, is_bullish, gap_low, gap_high, volume, timestamp_ms) arrays.
+    """
+    candles = CandleSeries.coerce(candles)
+    if len(candles) < 3:
+        empty = np.empty(0)
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=bool), empty, empty, empty, empty
+
+    high, low = candles.high, candles.low
+    prev_high, next_low = high[:-2], low[2:]
+    prev_low, next_high = low[:-2], high[2:]
+
+    bullish = prev_high < next_low
+    bearish = ~bullish & (prev_low > next_high)
+    positions = np.flatnonzero(bullish | bearish)
+    is_bullish = bullish[positions]
+
+    gap_low = np.where(is_bullish, prev_high[positions], next_high[positions])
+    gap_high = np.where(is_bullish, next_low[positions], prev_low[positions])
+    index = positions + 1
+    return (index, is_bullish, gap_low, gap_high,
+            candles.volume[index], candles.timestamp[index].astype(np.float64))
+
+def mitigate_fvg_arrays(candles, arrays, changelvl=True):
+    """Drop mitigated gaps from detection arrays; changelvl moves touched edges with price"""
+    index, is_bullish, gap_low, gap_high, volume, timestamp = arrays
+    if len(index) == 0:
+        return arrays
+
+    # Lowest low / highest high from each candle to the end, read from the gap's third candle on
+    candles = CandleSeries.coerce(candles)
+    later_low = np.minimum.accumulate(candles.low[::-1])[::-1][index + 1]
+    later_high = np.maximum.accumulate(candles.high[::-1])[::-1][index + 1]
+
+    live = np.where(is_bullish, later_low >= gap_low, later_high <= gap_high)
+    if changelvl:
+        gap_high = np.where(is_bullish, np.minimum(gap_high, later_low), gap_high)
+        gap_low = np.where(is_bullish, gap_low, np.maximum(gap_low, later_high))
+    return tuple(array[live] for array in (index, is_bullish, gap_low, gap_high, volume, timestamp))
+
+def average_true_range(candles, period=14):
+    """Rolling simple-average true range per candle (shorter window over the first ``period`` candles)"""
+    candles = CandleSeries.coerce(candles)
+    high, low, close = candles.high, candles.low, candles.close
+    if not len(close):
+        return np.empty(0)
+    previous_close = np.concatenate((close[:1], close[:-1]))
+    true_range = np.maximum(high - low, np.maximum(np.abs(high - previous_close), np.abs(low - previous_close)))
+    sums = np.cumsum(true_range)
+    atr = np.empty_like(sums)
+    warmup = min(period, len(sums))
+    atr[:warmup] = sums[:warmup] / np.arange(1, warmup + 1)
+    atr[warmup:] = (sums[warmup:] - sums[:-warmup]) / period
+    return atr
+
+def prefilter_fvg_arrays(candles, arrays, min_gap_atr, atr_period=14):
+    """Drop gaps smaller than ``min_gap_atr`` x ATR; returns (arrays, pruned count)"""
+    index, _, gap_low, gap_high = arrays[:4]
+    if not min_gap_atr or len(index) == 0:
+        return arrays, 0
+    atr = average_true_range(candles, atr_period)[index - 1]
+    keep = (gap_high - gap_low) >= min_gap_atr * atr
+    return tuple(array[keep] for array in arrays), int(len(keep) - np.count_nonzero(keep))
+
+def detect_active_fvg_arrays(candles, mitigation=True, changelvl=True, min_gap_atr=0.0, atr_period=14):
+    """
+    detect_fvg_arrays, the ATR prefilter, then mitigate_fvg_arrays when mitigation is on
+
+    Returns (arrays, pruned) - pruned counts the gaps the prefilter rejected.
+    """
+    candles = CandleSeries.coerce(candles)
+    arrays, pruned = prefilter_fvg_arrays(candles, detect_fvg_arrays(candles), min_gap_atr, atr_period)
+    if mitigation:
+        arrays = mitigate_fvg_arrays(candles, arrays, changelvl)
+    return arrays, pruned
+
+def _detect_shared(name, rows, options):
+    """Worker entry point: detect on the candles in a shared-memory block"""
+    # Workers share the parent's resource tracker, so attaching does not double-register
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # Every returned array is a copy, so the view can go before close()
+        block = np.ndarray((6, rows), dtype=np.float64, buffer=shm.buf)
+        candles = CandleSeries.from_columns(block[0], block[1:])
+        return detect_active_fvg_arrays(candles, **options)
+    finally:
+        shm.close()
+
+def expand_detections(arrays):
+    """Compact detection arrays -> FVG dicts in the detect_fvgs format"""
+    import pandas as pd
+
+    index, is_bullish, gap_low, gap_high, volume, timestamp = arrays
+    return [
+        {
+            'index': int(index[k]),
+            'fvg_type': 'Bullish' if is_bullish[k] else 'Bearish',
+            'gap_low': float(gap_low[k]),
+            'gap_high': float(gap_high[k]),
+            'gap_size': float(gap_high[k] - gap_low[k]),
+            'timestamp': pd.Timestamp(int(timestamp[k]), unit='ms'),
+            'volume_strength': float(volume[k])
+        }
+        for k in range(len(index))
+    ]
+
+def detections_to_arrays(fvgs):
+    """FVG dicts (detect_fvgs format) -> compact detection arrays (inverse of expand_detections)"""
+    def timestamp_ms(value):
+        return value.value // 1_000_000 if hasattr(value, 'value') else float(value)
+
+    return (
+        np.fromiter((f['index'] for f in fvgs), dtype=np.int64, count=len(fvgs)),
+        np.fromiter((f['fvg_type'] == 'Bullish' for f in fvgs), dtype=bool, count=len(fvgs)),
+        np.fromiter((f['gap_low'] for f in fvgs), dtype=np.float64, count=len(fvgs)),
+        np.fromiter((f['gap_high'] for f in fvgs), dtype=np.float64, count=len(fvgs)),
+        np.fromiter((f['volume_strength'] for f in fvgs), dtype=np.float64, count=len(fvgs)),
+        np.fromiter((timestamp_ms(f['timestamp']) for f in fvgs), dtype=np.float64, count=len(fvgs))
+    )
+
+class DetectionPool:
+    """Process pool running FVG detection on shared-memory candle arrays"""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = default_pool_size() if max_workers is None else max_workers
+        self._executor = None
+        self.stats = {'jobs': 0, 'errors': 0, 'pruned': 0}
+
+    @property
+    def enabled(self):
+        return self.max_workers > 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: workers only import numpy + this module, never the scanner's sockets/threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+            )
+            logger.info(f"🧮 DETECTION POOL: started {self.max_workers} worker processes")
+        return self._executor
+
+    async def detect(self, ohlcv, **options):
+        """
+        Detect FVGs on a CandleSeries (or raw OHLCV rows) in a worker process
+
+        ``options`` are detect_active_fvg_arrays' (mitigation, changelvl,
+        min_gap_atr, atr_period). Returns (FVG dicts, pruned count).
+        """
+        candles = CandleSeries.coerce(ohlcv)
+        if len(candles) < 3:
+            return [], 0
+
+        shm = shared_memory.SharedMemory(create=True, size=6 * len(candles) * 8)
+        try:
+            block = np.ndarray((6, len(candles)), dtype=np.float64, buffer=shm.buf)
+            block[0] = candles.timestamp
+            block[1:] = candles.values
+            del block                     # No exported views may outlive close()
+            loop = asyncio.get_running_loop()
+            arrays, pruned = await loop.run_in_executor(self._get_executor(), _detect_shared, shm.name,
+                                                        len(candles), options)
+            self.stats['jobs'] += 1
+            self.stats['pruned'] += pruned
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            shm.close()
+            shm.unlink()
+
+        return expand_detections(arrays), pruned
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
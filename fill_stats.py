@@ -0,0 +1,292 @@
+"""fill_stats.py — Streaming time-to-fill statistics per symbol, timeframe, type and gap size
+
+Answers "how long do 4h bullish gaps on this pair usually take to get tested
+or filled" from the lifecycle the scanner already observes, with no
+historical recomputation:
+
+    born        a gap first seen within BIRTH_GRACE candles of forming (the
+                third candle's close); gaps found already old at startup
+                have an unknown past and are not tracked
+    touched     first 'touched' touch-index transition -> time to touch
+    mitigated   the gap left its series while mitigation is on -> time to fill
+    expired     the gap aged out of the lookback unfilled (or disappeared
+                with mitigation off)
+
+Aggregates are kept per (symbol, timeframe, fvg_type, size bucket) cell:
+counters plus two fixed-memory log-bucket quantile sketches (relative
+error ~SKETCH_GAMMA - 1, range SKETCH_MIN_SECONDS .. SKETCH_MAX_SECONDS).
+Cells merge by adding counts, so shard workers' stats combine exactly on
+the coordinator, and a cell's summary is cached until the cell changes,
+which makes the per-record enrichment a dict lookup. Each aggregator carries
+an incarnation id (kept across snapshot restores): the coordinator holds one
+cumulative copy per incarnation and replaces it when the same incarnation
+reports again, so a worker that reconnects is never counted twice.
+"""
+
+import bisect
+import math
+import time
+import uuid
+from collections import defaultdict
+
+import numpy as np
+
+from scheduler import timeframe_seconds
+from subscriptions import normalize_symbol
+
+SKETCH_MIN_SECONDS = 60             # Faster than this lands in the underflow bucket (reported as 0)
+SKETCH_MAX_SECONDS = 2 ** 27        # ~4 years
+SKETCH_GAMMA = 1.1                  # Bucket growth: quantiles within ~5%
+SKETCH_BUCKETS = int(math.ceil(math.log(SKETCH_MAX_SECONDS / SKETCH_MIN_SECONDS, SKETCH_GAMMA))) + 2
+SIZE_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0)    # Gap size edges, percent of gap_low
+BIRTH_GRACE = 3                     # Candles after forming within which a first sighting counts as a birth
+MIN_BIRTH_GRACE_SECONDS = 900       # Poll-mode rescans of fast timeframes can lag a few candles
+
+def size_bucket(gap_low, gap_high):
+    """Size bucket label of a gap ('<0.1%', '0.1-0.25%', ..., '>=2%')"""
+    size = (gap_high - gap_low) / gap_low * 100 if gap_low else 0.0
+    position = bisect.bisect_right(SIZE_BUCKETS, size)
+    if position == 0:
+        return f"<{SIZE_BUCKETS[0]:g}%"
+    if position == len(SIZE_BUCKETS):
+        return f">={SIZE_BUCKETS[-1]:g}%"
+    return f"{SIZE_BUCKETS[position - 1]:g}-{SIZE_BUCKETS[position]:g}%"
+
+def timestamp_seconds(value):
+    """Epoch seconds of a detection timestamp (pandas Timestamp, datetime or ms number)"""
+    if hasattr(value, 'value'):
+        return value.value / 1e9
+    if hasattr(value, 'timestamp'):
+        return value.timestamp()
+    return float(value) / 1000
+
+class QuantileSketch:
+    """Fixed log-bucket histogram of durations in seconds"""
+    __slots__ = ('counts',)
+
+    def __init__(self, counts=None):
+        self.counts = np.zeros(SKETCH_BUCKETS, dtype=np.int64) if counts is None else counts
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    @staticmethod
+    def bucket(seconds):
+        if seconds < SKETCH_MIN_SECONDS:
+            return 0
+        return min(1 + int(math.log(seconds / SKETCH_MIN_SECONDS, SKETCH_GAMMA)), SKETCH_BUCKETS - 1)
+
+    def add(self, seconds):
+        self.counts[self.bucket(seconds)] += 1
+
+    def merge(self, other):
+        self.counts += other.counts
+
+    def quantile(self, q):
+        """Duration at quantile q (geometric bucket midpoint), None when empty"""
+        cumulative = np.cumsum(self.counts)
+        if not cumulative[-1]:
+            return None
+        position = int(np.searchsorted(cumulative, q * cumulative[-1], side='left'))
+        if position == 0:
+            return 0.0
+        return SKETCH_MIN_SECONDS * SKETCH_GAMMA ** (position - 0.5)
+
+    def to_dict(self):
+        """Sparse form: non-empty bucket indexes and their counts"""
+        buckets = np.flatnonzero(self.counts)
+        return {'buckets': buckets.tolist(), 'counts': self.counts[buckets].tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls()
+        sketch.counts[np.asarray(data.get('buckets', []), dtype=np.int64)] = data.get('counts', [])
+        return sketch
+
+class FillCell:
+    """Counters and duration sketches of one (symbol, timeframe, fvg_type, size bucket)"""
+    __slots__ = ('observed', 'touched', 'mitigated', 'expired', 'touch_times', 'fill_times', '_summary')
+
+    def __init__(self):
+        self.observed = 0
+        self.touched = 0
+        self.mitigated = 0
+        self.expired = 0
+        self.touch_times = QuantileSketch()
+        self.fill_times = QuantileSketch()
+        self._summary = None
+
+    def merge(self, other):
+        self.observed += other.observed
+        self.touched += other.touched
+        self.mitigated += other.mitigated
+        self.expired += other.expired
+        self.touch_times.merge(other.touch_times)
+        self.fill_times.merge(other.fill_times)
+        self._summary = None
+
+    def summary(self):
+        """Rates and quantiles (seconds); cached until the cell changes"""
+        if self._summary is None:
+            resolved = self.mitigated + self.expired
+            self._summary = {
+                'samples': self.observed,
+                'touch_rate': round(self.touched / self.observed, 3) if self.observed else None,
+                'fill_rate': round(self.mitigated / resolved, 3) if resolved else None,
+                'touch_p50': self.touch_times.quantile(0.5),
+                'touch_p90': self.touch_times.quantile(0.9),
+                'fill_p50': self.fill_times.quantile(0.5),
+                'fill_p90': self.fill_times.quantile(0.9)
+            }
+        return self._summary
+
+    def to_dict(self):
+        return {
+            'observed': self.observed, 'touched': self.touched,
+            'mitigated': self.mitigated, 'expired': self.expired,
+            'touch_times': self.touch_times.to_dict(), 'fill_times': self.fill_times.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        cell = cls()
+        for field in ('observed', 'touched', 'mitigated', 'expired'):
+            setattr(cell, field, int(data.get(field, 0)))
+        cell.touch_times = QuantileSketch.from_dict(data.get('touch_times') or {})
+        cell.fill_times = QuantileSketch.from_dict(data.get('fill_times') or {})
+        return cell
+
+class FillStats:
+    """Lifecycle-fed fill statistics with the open gaps they are still waiting on"""
+
+    def __init__(self, incarnation=None):
+        self.incarnation = incarnation or uuid.uuid4().hex
+        self.cells = {}                      # (symbol, timeframe, fvg_type, size bucket) -> FillCell
+        self.open = defaultdict(dict)        # (symbol, timeframe) -> {fvg_id: [cell key, formed_at, touched]}
+        self._open_series = {}               # fvg_id -> (symbol, timeframe)
+        self.version = 0
+
+    def __len__(self):
+        return len(self.cells)
+
+    def _cell(self, key):
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = FillCell()
+        cell._summary = None
+        self.version += 1
+        return cell
+
+    # ------------------------------------------------------------- lifecycle
+
+    def observe_series(self, symbol, timeframe, fvgs, now=None, mitigation=True, lookback=None):
+        """A series was (re)detected: register newborn gaps and resolve the ones that left it"""
+        now = time.time() if now is None else now
+        period = timeframe_seconds(timeframe)
+        grace = max(BIRTH_GRACE * period, MIN_BIRTH_GRACE_SECONDS)
+        series = (symbol, timeframe)
+        tracked = self.open[series]
+
+        current = set()
+        for fvg in fvgs:
+            fvg_id = fvg['fvg_id']
+            current.add(fvg_id)
+            if fvg_id in tracked:
+                continue
+            # Confirmed when the candle after the middle one closes
+            formed_at = timestamp_seconds(fvg['timestamp']) + 2 * period
+            if now - formed_at > grace:
+                continue
+            key = (symbol, timeframe, fvg['fvg_type'], size_bucket(fvg['gap_low'], fvg['gap_high']))
+            self._cell(key).observed += 1
+            tracked[fvg_id] = [key, formed_at, False]
+            self._open_series[fvg_id] = series
+
+        for fvg_id in [fvg_id for fvg_id in tracked if fvg_id not in current]:
+            key, formed_at, _ = tracked.pop(fvg_id)
+            self._open_series.pop(fvg_id, None)
+            cell = self._cell(key)
+            aged_out = lookback is not None and now - formed_at >= (lookback - 3) * period
+            if mitigation and not aged_out:
+                cell.mitigated += 1
+                cell.fill_times.add(max(now - formed_at, 0))
+            else:
+                cell.expired += 1
+
+        if not tracked:
+            del self.open[series]
+
+    def record_touch(self, fvg_id, now=None):
+        """'touched' transition: the first touch of a tracked gap is its time to touch"""
+        series = self._open_series.get(fvg_id)
+        if series is None:
+            return
+        entry = self.open[series][fvg_id]
+        if entry[2]:
+            return
+        entry[2] = True
+        now = time.time() if now is None else now
+        cell = self._cell(entry[0])
+        cell.touched += 1
+        cell.touch_times.add(max(now - entry[1], 0))
+
+    def forget_symbol(self, symbol):
+        """Stop waiting on a symbol's gaps (moved to another shard); its aggregates stay"""
+        for series in [series for series in self.open if series[0] == symbol]:
+            for fvg_id in self.open.pop(series):
+                self._open_series.pop(fvg_id, None)
+
+    # ---------------------------------------------------------------- queries
+
+    def summary(self, symbol, timeframe, fvg_type, gap_low, gap_high):
+        """Summary of the cell a gap falls in, None before the first sample"""
+        cell = self.cells.get((symbol, timeframe, fvg_type, size_bucket(gap_low, gap_high)))
+        return cell.summary() if cell is not None else None
+
+    def query(self, symbol=None, timeframe=None, fvg_type=None):
+        """Summaries of every cell matching the filters"""
+        symbol = normalize_symbol(symbol) if symbol is not None else None
+        return [
+            dict(cell.summary(), symbol=key[0], timeframe=key[1], fvg_type=key[2], size_bucket=key[3])
+            for key, cell in self.cells.items()
+            if (symbol is None or normalize_symbol(key[0]) == symbol) and (timeframe is None or key[1] == timeframe)
+            and (fvg_type is None or key[2] == fvg_type)
+        ]
+
+    def stats(self):
+        return {'cells': len(self.cells), 'open_gaps': len(self._open_series), 'version': self.version}
+
+    # ---------------------------------------------------------- merge / wire
+
+    def merge(self, other):
+        """Add another aggregator's cells (open gaps stay with the process observing them)"""
+        for key, cell in other.cells.items():
+            self._cell(key).merge(cell)
+
+    @classmethod
+    def merged(cls, parts):
+        total = cls()
+        for part in parts:
+            total.merge(part)
+        return total
+
+    def to_dict(self, include_open=False):
+        data = {'incarnation': self.incarnation,
+                'cells': [[list(key), cell.to_dict()] for key, cell in self.cells.items()]}
+        if include_open:
+            data['open'] = [[fvg_id, list(entry[0]), entry[1], entry[2]]
+                            for tracked in self.open.values() for fvg_id, entry in tracked.items()]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data.get('incarnation'))
+        for key, cell in data.get('cells', []):
+            stats.cells[tuple(key)] = FillCell.from_dict(cell)
+        for fvg_id, key, formed_at, touched in data.get('open', []):
+            series = (key[0], key[1])
+            stats.open[series][fvg_id] = [tuple(key), formed_at, touched]
+            stats._open_series[fvg_id] = series
+        stats.version = 1 if stats.cells else 0
+        return stats
@@ -8,6 +8,10 @@ ENHANCED: Support for 500 historical candles
 Main usage:
     fvgs = get_active_fvgs(ohlcv)
 
+    # Whole universe, concurrently, results streamed per symbol
+    async for symbol, timeframes in analyze_many(symbols, ['4h', '1d']):
+        ...
+
 Returns list of dicts:
     {
         'type': 'Bullish' or 'Bearish',
@@ -21,9 +25,23 @@ Returns list of dicts:
     }
 """
 
-import ccxt.async_support as ccxt
+import asyncio
+from collections import Counter
 from datetime import datetime
-from typing import List, Dict
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from candle_series import CandleSeries
+from ohlcv_history import OHLCVHistory, PAGE_LIMIT
+from scheduler import candle_open_time
+from singleflight import SingleFlight
+
+# ENHANCED: Concurrent callers for the same candle share one request / analysis
+OHLCV_EXCHANGE_KEY = 'binance:future'
+_ohlcv_flights = SingleFlight(ttl=2.0)
+_analysis_flights = SingleFlight(ttl=2.0)
+
+# ENHANCED: Limits beyond one request page backward through an on-disk history
+_history = OHLCVHistory()
 
 # FIXED: Exact distance calculation from your working version
 def calculate_exact_distance(gap_low, gap_high, current_price):
@@ -79,39 +97,75 @@ def calculate_exact_touching(gap_low, gap_high, current_price, tolerance=0.15):
     except:
         return False
 
-async def fetch_ohlcv(symbol: str, timeframe: str, limit: int = 500) -> List:
+def flight_key(symbol: str, timeframe: str, limit: int) -> tuple:
+    """Singleflight key: (exchange, symbol, timeframe, limit, candle-close epoch)"""
+    return (OHLCV_EXCHANGE_KEY, symbol, timeframe, limit, candle_open_time(timeframe))
+
+def create_exchange():
+    """Async futures exchange with ccxt's own throttling enabled"""
+    import ccxt.async_support as ccxt  # Lazy: importing ccxt dominates module load time
+    return ccxt.binance({'enableRateLimit': True, 'options': {'defaultType': 'future'}})
+
+async def fetch_ohlcv(symbol: str, timeframe: str, limit: int = 500, exchange=None) -> CandleSeries:
     """
     ENHANCED: Fetch OHLCV data with support for 500 candles
+    
+    Returns a columnar CandleSeries. Concurrent calls for the same series and
+    candle share one request (singleflight); the returned series is shared
+    and must not be modified. A ``limit`` above PAGE_LIMIT (e.g. the full
+    1d history) is fetched in pages and persisted, see ohlcv_history.
+    Pass ``exchange`` to reuse one connection (and its loaded markets).
     """
-    exchange = ccxt.binance({'options': {'defaultType': 'future'}})
+    return await _ohlcv_flights.do(
+        flight_key(symbol, timeframe, limit), _fetch_ohlcv, symbol, timeframe, limit, exchange
+    )
+
+async def _fetch_ohlcv(symbol: str, timeframe: str, limit: int, exchange=None) -> CandleSeries:
+    if exchange is not None:
+        return await _fetch_with(exchange, symbol, timeframe, limit)
+    
+    exchange = create_exchange()
     try:
-        ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-        return ohlcv
+        return await _fetch_with(exchange, symbol, timeframe, limit)
     finally:
         await exchange.close()
 
+async def _fetch_with(exchange, symbol: str, timeframe: str, limit: int) -> CandleSeries:
+    if limit <= PAGE_LIMIT:
+        return CandleSeries.from_ohlcv(await exchange.fetch_ohlcv(symbol, timeframe, limit=limit))
+    
+    async def fetch_page(since, page_limit):
+        return await exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=page_limit)
+    return await _history.fetch(fetch_page, symbol, timeframe, limit)
+
 # ENHANCED: FVG detection with exact distance calculation
-def get_active_fvgs(ohlcv: List, changelvl: bool = True) -> List[Dict]:
+def get_active_fvgs(ohlcv, changelvl: bool = True) -> List[Dict]:
     """
     ENHANCED: Get active (unmitigated) FVGs with FIXED distance calculation
     
     This function now includes the exact distance calculation from your
     working version to ensure 100% accuracy.
+    
+    ``ohlcv`` is a CandleSeries or raw exchange rows. Distance, touching and
+    the timestamp label only depend on the final gap levels, so they are
+    computed once for the gaps that survive instead of on every candle.
     """
     active_bull_fvgs = []
     active_bear_fvgs = []
     
-    if len(ohlcv) < 3:
+    candles = CandleSeries.coerce(ohlcv)
+    if len(candles) < 3:
         return []
     
     # Get current price for distance calculations
-    current_price = ohlcv[-1][4]  # Close price of last candle
+    current_price = float(candles.close[-1])  # Close price of last candle
+    times, highs, lows = candles.timestamp.tolist(), candles.high.tolist(), candles.low.tolist()
     
-    for i in range(2, len(ohlcv)):
+    for i in range(2, len(candles)):
         # Detect new FVG
-        timestamp, o, h, l, c, v = ohlcv[i]
-        prev2_h = ohlcv[i-2][2]  # High of candle 2 bars ago
-        prev2_l = ohlcv[i-2][3]  # Low of candle 2 bars ago
+        timestamp, h, l = times[i], highs[i], lows[i]
+        prev2_h = highs[i-2]  # High of candle 2 bars ago
+        prev2_l = lows[i-2]  # Low of candle 2 bars ago
         
         x = 0
         top = None
@@ -128,18 +182,14 @@ def get_active_fvgs(ohlcv: List, changelvl: bool = True) -> List[Dict]:
             bottom = h
         
         if x != 0:
-            # FIXED: Calculate exact distance using your working formula
-            distance_pct = calculate_exact_distance(bottom, top, current_price)
-            is_touching = calculate_exact_touching(bottom, top, current_price)
-            
             fvg = {
                 'type': 'Bullish' if x == 1 else 'Bearish',
                 'top': top,
                 'bottom': bottom,
-                'timestamp': datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S'),
+                'timestamp': None,             # Formatted for surviving gaps only
                 'tested': False,
-                'distance_pct': distance_pct,  # FIXED: Exact calculation
-                'is_touching': is_touching,    # FIXED: Exact touching detection
+                'distance_pct': None,          # FIXED: Exact calculation (below)
+                'is_touching': False,          # FIXED: Exact touching detection (below)
                 'current_price': current_price,
                 'gap_size': top - bottom,
                 'created_at': timestamp / 1000,
@@ -165,11 +215,6 @@ def get_active_fvgs(ohlcv: List, changelvl: bool = True) -> List[Dict]:
                 if not fvg['tested']:
                     fvg['tested'] = True
             
-            # FIXED: Recalculate distance with exact formula
-            fvg['distance_pct'] = calculate_exact_distance(fvg['bottom'], fvg['top'], current_price)
-            fvg['is_touching'] = calculate_exact_touching(fvg['bottom'], fvg['top'], current_price)
-            fvg['current_price'] = current_price
-            
             new_bull.append(fvg)
         active_bull_fvgs = new_bull
         
@@ -185,24 +230,42 @@ def get_active_fvgs(ohlcv: List, changelvl: bool = True) -> List[Dict]:
                 if not fvg['tested']:
                     fvg['tested'] = True
             
-            # FIXED: Recalculate distance with exact formula
-            fvg['distance_pct'] = calculate_exact_distance(fvg['bottom'], fvg['top'], current_price)
-            fvg['is_touching'] = calculate_exact_touching(fvg['bottom'], fvg['top'], current_price)
-            fvg['current_price'] = current_price
-            
             new_bear.append(fvg)
         active_bear_fvgs = new_bear
     
     # Combine and sort by distance (closest first), then by timestamp (newest first)
     all_fvgs = active_bull_fvgs + active_bear_fvgs
     
+    # FIXED: Exact distance / touching against the final levels
+    for fvg in all_fvgs:
+        fvg['timestamp'] = datetime.fromtimestamp(fvg['created_at']).strftime('%Y-%m-%d %H:%M:%S')
+        fvg['distance_pct'] = calculate_exact_distance(fvg['bottom'], fvg['top'], current_price)
+        fvg['is_touching'] = calculate_exact_touching(fvg['bottom'], fvg['top'], current_price)
+    
     # ENHANCED: Sort by distance (closest first) for better priority
     all_fvgs.sort(key=lambda f: (f['distance_pct'], -f['created_at']))
     
     return all_fvgs
 
+# ENHANCED: Memory tier classification shared by the scanner and the metrics CLI
+MEMORY_TIERS = ('priority', 'high', 'medium', 'low')
+
+def classify_memory_tier(distance, is_touching=False):
+    """
+    Classify an FVG into a memory tier from its distance to price
+    
+    priority: touching / inside, high: < 2%, medium: < 10%, low: everything else
+    """
+    if is_touching or distance == 0:
+        return 'priority'
+    elif distance < 2:
+        return 'high'
+    elif distance < 10:
+        return 'medium'
+    return 'low'
+
 # ENHANCED: Get FVGs with memory tier classification
-def get_fvgs_with_tiers(ohlcv: List, changelvl: bool = True) -> List[Dict]:
+def get_fvgs_with_tiers(ohlcv, changelvl: bool = True) -> List[Dict]:
     """
     ENHANCED: Get FVGs with memory tier classification for smart management
     """
@@ -210,16 +273,7 @@ def get_fvgs_with_tiers(ohlcv: List, changelvl: bool = True) -> List[Dict]:
     
     # Add memory tier classification
     for fvg in fvgs:
-        distance = fvg['distance_pct']
-        
-        if fvg['is_touching'] or distance == 0:
-            fvg['memory_tier'] = 'priority'
-        elif distance < 2:
-            fvg['memory_tier'] = 'high'
-        elif distance < 10:
-            fvg['memory_tier'] = 'medium'
-        else:
-            fvg['memory_tier'] = 'low'
+        fvg['memory_tier'] = classify_memory_tier(fvg['distance_pct'], fvg['is_touching'])
         
         # Add timeframe strength if available
         fvg['timeframe_strength'] = 'Unknown'  # Will be set by scanner
@@ -289,6 +343,83 @@ def test_distance_calculation_accuracy():
     
     return all_passed
 
+def summarize_fvgs(fvgs: List[Dict]) -> Dict:
+    """
+    ENHANCED: Per-timeframe result with touching / tier counts from a single pass
+    """
+    tiers = Counter()
+    touching = 0
+    for fvg in fvgs:
+        tiers[fvg['memory_tier']] += 1
+        if fvg['is_touching']:
+            touching += 1
+    
+    result = {'fvgs': fvgs, 'count': len(fvgs), 'touching': touching}
+    for tier in MEMORY_TIERS:
+        result[tier] = tiers[tier]
+    return result
+
+async def analyze_timeframe(symbol: str, timeframe: str, limit: int = 500, exchange=None) -> Dict:
+    """
+    ENHANCED: Fetch + FVG analysis for one series, deduplicated per candle
+    
+    Concurrent callers share both the request and the parsed result.
+    """
+    return await _analysis_flights.do(
+        ('analysis',) + flight_key(symbol, timeframe, limit), _analyze_timeframe, symbol, timeframe, limit, exchange
+    )
+
+async def _analyze_timeframe(symbol: str, timeframe: str, limit: int, exchange=None) -> Dict:
+    ohlcv = await fetch_ohlcv(symbol, timeframe, limit, exchange)
+    return summarize_fvgs(get_fvgs_with_tiers(ohlcv))
+
+async def analyze_many(symbols: Iterable[str], timeframes: Optional[List[str]] = None, limit: int = 500,
+                       concurrency: int = 20) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    ENHANCED: Analyze many symbols concurrently, streaming results per symbol
+    
+    Every (symbol, timeframe) combination is fetched concurrently, at most
+    ``concurrency`` at a time, over one shared exchange connection. Yields
+    (symbol, {timeframe: result}) as soon as all timeframes of a symbol are
+    done; a failed timeframe yields {'error': message} like the sync API.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    timeframes = list(timeframes or ['4h', '12h', '1d', '1w'])
+    if not symbols or not timeframes:
+        return
+    
+    exchange = create_exchange()
+    semaphore = asyncio.Semaphore(concurrency)
+    completed = asyncio.Queue()
+    results = {symbol: {} for symbol in symbols}
+    
+    async def run(symbol, timeframe):
+        result = {'error': 'cancelled'}
+        try:
+            async with semaphore:
+                try:
+                    result = await analyze_timeframe(symbol, timeframe, limit, exchange)
+                except Exception as e:
+                    result = {'error': str(e)}
+        finally:
+            # Always report, also when a shared (singleflight) fetch was cancelled by its leader's caller
+            completed.put_nowait((symbol, timeframe, result))
+    
+    tasks = []
+    try:
+        await exchange.load_markets()  # Once, instead of once per request
+        tasks = [asyncio.create_task(run(symbol, tf)) for symbol in symbols for tf in timeframes]
+        for _ in range(len(tasks)):
+            symbol, timeframe, result = await completed.get()
+            results[symbol][timeframe] = result
+            if len(results[symbol]) == len(timeframes):
+                yield symbol, {tf: results[symbol][tf] for tf in timeframes}
+                del results[symbol]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await exchange.close()
+
 # ENHANCED: Advanced FVG analysis with multiple timeframes
 def analyze_multi_timeframe_fvgs(symbol: str, timeframes: List[str] = None) -> Dict:
     """
@@ -297,27 +428,21 @@ def analyze_multi_timeframe_fvgs(symbol: str, timeframes: List[str] = None) -> D
     if timeframes is None:
         timeframes = ['4h', '12h', '1d', '1w']
     
-    results = {}
+    async def collect():
+        # ENHANCED: all timeframes concurrently (use analyze_many inside a running loop)
+        async for _, results in analyze_many([symbol], timeframes, 500):
+            return results
+        return {}
     
-    for tf in timeframes:
-        try:
-            import asyncio
-            ohlcv = asyncio.run(fetch_ohlcv(symbol, tf, 500))  # ENHANCED: 500 candles
-            fvgs = get_fvgs_with_tiers(ohlcv)
-            
-            results[tf] = {
-                'fvgs': fvgs,
-                'count': len(fvgs),
-                'touching': len([f for f in fvgs if f['is_touching']]),
-                'priority': len([f for f in fvgs if f['memory_tier'] == 'priority']),
-                'high': len([f for f in fvgs if f['memory_tier'] == 'high']),
-                'medium': len([f for f in fvgs if f['memory_tier'] == 'medium']),
-                'low': len([f for f in fvgs if f['memory_tier'] == 'low'])
-            }
-            
-        except Exception as e:
-            print(f"❌ Error analyzing {symbol} {tf}: {e}")
-            results[tf] = {'error': str(e)}
+    try:
+        results = asyncio.run(collect())
+    except Exception as e:
+        print(f"❌ Error analyzing {symbol}: {e}")
+        return {tf: {'error': str(e)} for tf in timeframes}
+    
+    for tf, result in results.items():
+        if 'error' in result:
+            print(f"❌ Error analyzing {symbol} {tf}: {result['error']}")
     
     return results
 
@@ -0,0 +1,363 @@
+"""fvg_store.py — Indexed in-memory FVG state for the REST query API
+
+The scanner writes every processed series into the store; the REST endpoints
+in main.py (/fvgs, /blocks, /symbols/{symbol}) read from it. Queries are
+answered from secondary indexes instead of scanning everything:
+
+    equality indexes   symbol, timeframe, fvg_type, memory_tier  (id sets)
+    sorted indexes     distance_percentage, power_score          ((value, id) lists)
+
+Every write bumps a global version (and a per-symbol version) which the API
+turns into ETags, so polling clients get cheap 304s. Writes also feed the
+universe-wide top-K rankings of the screener (screener.py).
+"""
+
+import bisect
+import heapq
+from collections import defaultdict
+
+from screener import Screener
+from subscriptions import normalize_symbol
+
+# Public sort key -> record field with a maintained sorted index
+SORTED_FIELDS = {
+    'distance': 'distance_percentage',
+    'strength': 'power_score'
+}
+EQUALITY_FIELDS = ('symbol', 'timeframe', 'fvg_type', 'memory_tier')
+
+def _field_value(record, field):
+    if field == 'symbol':
+        return normalize_symbol(record.get('pair'))
+    if field == 'timeframe':
+        return record.get('tf')
+    return record.get(field)
+
+def _sort_value(value):
+    """Orders numbers numerically, ahead of everything else compared as text"""
+    if isinstance(value, (int, float)):
+        return (0, value, '')
+    return (1, 0, str(value))
+
+class FVGStore:
+    """Active FVGs and blocks with secondary indexes"""
+
+    def __init__(self):
+        self.records = {}
+        self.series = defaultdict(set)
+        self.blocks = {}
+        self.version = 0
+        self.symbol_versions = defaultdict(int)
+
+        self._equality = {field: defaultdict(set) for field in EQUALITY_FIELDS}
+        self._sorted = {field: [] for field in SORTED_FIELDS.values()}
+        self.screener = Screener(self)
+
+    def __len__(self):
+        return len(self.records)
+
+    # ------------------------------------------------------------------ writes
+
+    def _bump(self, symbol):
+        self.version += 1
+        self.symbol_versions[normalize_symbol(symbol)] = self.version
+
+    def _index(self, fvg_id, record):
+        for field in EQUALITY_FIELDS:
+            self._equality[field][_field_value(record, field)].add(fvg_id)
+        for field, entries in self._sorted.items():
+            bisect.insort(entries, (record.get(field) or 0, fvg_id))
+
+    def _unindex(self, fvg_id, record):
+        for field in EQUALITY_FIELDS:
+            value = _field_value(record, field)
+            ids = self._equality[field].get(value)
+            if ids is not None:
+                ids.discard(fvg_id)
+                if not ids:
+                    del self._equality[field][value]
+        for field, entries in self._sorted.items():
+            entry = (record.get(field) or 0, fvg_id)
+            pos = bisect.bisect_left(entries, entry)
+            if pos < len(entries) and entries[pos] == entry:
+                del entries[pos]
+
+    @staticmethod
+    def _index_entries(record):
+        """Everything the indexes hold for a record"""
+        return (tuple(_field_value(record, field) for field in EQUALITY_FIELDS) +
+                tuple(record.get(field) or 0 for field in SORTED_FIELDS.values()))
+
+    def replace_series(self, symbol, timeframe, records, blocks=None):
+        """Replace everything known about one (symbol, timeframe) series"""
+        key = (normalize_symbol(symbol), timeframe)
+        previous = self.series.pop(key, set())
+
+        ids = set()
+        for record in records:
+            fvg_id = record['fvg_id']
+            old = self.records.get(fvg_id)
+            if old is not None and self._index_entries(old) == self._index_entries(record):
+                self.records[fvg_id] = record     # Same index entries (e.g. a settings re-filter): swap only
+            else:
+                if old is not None:
+                    self._unindex(fvg_id, old)
+                self.records[fvg_id] = record
+                self._index(fvg_id, record)
+            self.screener.upsert_record(record)
+            ids.add(fvg_id)
+        if ids:
+            self.series[key] = ids
+
+        for fvg_id in previous - ids:
+            record = self.records.pop(fvg_id, None)
+            if record is not None:
+                self._unindex(fvg_id, record)
+                self.screener.remove_record(fvg_id)
+
+        if blocks is not None:
+            previous_blocks = self.blocks.pop(key, [])
+            summaries = [self.block_summary(block) for block in blocks]
+            if summaries:
+                self.blocks[key] = summaries
+            self.screener.replace_blocks(previous_blocks, summaries)
+
+        self._bump(symbol)
+
+    def series_records(self, symbol, timeframe):
+        """Every stored record of one series"""
+        return [self.records[fvg_id] for fvg_id in self.series.get((normalize_symbol(symbol), timeframe), ())]
+
+    def apply_state(self, state):
+        """Apply a touch-index transition to a stored record"""
+        record = self.records.get(state.get('fvg_id'))
+        if record is None:
+            return False
+
+        fvg_id = state['fvg_id']
+        self._unindex(fvg_id, record)
+        for field in ('current_price', 'distance_percentage', 'is_within_proximity', 'is_touched', 'memory_tier'):
+            if field in state:
+                record[field] = state[field]
+        self._index(fvg_id, record)
+        self.screener.upsert_record(record)
+        self._bump(record.get('pair'))
+        return True
+
+    def remove_symbol(self, symbol):
+        symbol = normalize_symbol(symbol)
+        for key in [k for k in self.series if k[0] == symbol]:
+            for fvg_id in self.series.pop(key):
+                record = self.records.pop(fvg_id, None)
+                if record is not None:
+                    self._unindex(fvg_id, record)
+                    self.screener.remove_record(fvg_id)
+        for key in [k for k in self.blocks if k[0] == symbol]:
+            self.screener.replace_blocks(self.blocks.pop(key), [])
+        self._bump(symbol)
+
+    @staticmethod
+    def block_summary(block):
+        """Block without the nested FVG dicts (summaries pass through unchanged)"""
+        summary = {k: v for k, v in block.items() if k != 'fvgs'}
+        if 'fvgs' in block:
+            summary['fvg_ids'] = [fvg.get('fvg_id') for fvg in block['fvgs']]
+        return summary
+
+    # ----------------------------------------------------------------- queries
+
+    def _candidate_ids(self, filters):
+        """Intersect equality indexes, smallest set first (None = no equality filter)"""
+        sets = []
+        for field in EQUALITY_FIELDS:
+            value = filters.get(field)
+            if value is None:
+                continue
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            if field == 'symbol':
+                values = [normalize_symbol(v) for v in values]
+            if len(values) == 1:
+                # Read-only use of the index set, no copy
+                sets.append(self._equality[field].get(values[0], set()))
+                continue
+            ids = set()
+            for v in values:
+                ids |= self._equality[field].get(v, set())
+            sets.append(ids)
+
+        if not sets:
+            return None
+        sets.sort(key=len)
+        if len(sets) == 1:
+            return sets[0]
+        return sets[0].intersection(*sets[1:])
+
+    def _range_slice(self, field, low, high):
+        entries = self._sorted[field]
+        start = 0 if low is None else bisect.bisect_left(entries, (low, ''))
+        end = len(entries) if high is None else bisect.bisect_right(entries, (high, '\uffff'))
+        return entries, start, max(start, end)
+
+    def query(self, symbol=None, timeframe=None, fvg_type=None, tier=None,
+              min_distance=None, max_distance=None, min_strength=None, max_strength=None,
+              touched=None, proximity_only=False, sort='distance', order='asc', offset=0, limit=100):
+        """Filtered, sorted and paginated FVG query"""
+        candidates = self._candidate_ids({
+            'symbol': symbol, 'timeframe': timeframe, 'fvg_type': fvg_type, 'memory_tier': tier
+        })
+
+        # Only the filters not already answered by an index are checked per record
+        distance_checks = []
+        if min_distance is not None:
+            distance_checks.append(lambda r: (r.get('distance_percentage') or 0) >= min_distance)
+        if max_distance is not None:
+            distance_checks.append(lambda r: (r.get('distance_percentage') or 0) <= max_distance)
+        strength_checks = []
+        if min_strength is not None:
+            strength_checks.append(lambda r: (r.get('power_score') or 0) >= min_strength)
+        if max_strength is not None:
+            strength_checks.append(lambda r: (r.get('power_score') or 0) <= max_strength)
+        state_checks = []
+        if touched is not None:
+            state_checks.append(lambda r: bool(r.get('is_touched')) == touched)
+        if proximity_only:
+            state_checks.append(lambda r: bool(r.get('is_within_proximity')))
+
+        def matcher(checks):
+            if not checks:
+                return None
+            return lambda record: all(check(record) for check in checks)
+
+        field = SORTED_FIELDS.get(sort)
+        descending = order == 'desc'
+        all_checks = matcher(state_checks + distance_checks + strength_checks)
+
+        if field is not None:
+            if field == 'distance_percentage':
+                entries, start, end = self._range_slice(field, min_distance, max_distance)
+                walk_checks = matcher(state_checks + strength_checks)
+            else:
+                entries, start, end = self._range_slice(field, min_strength, max_strength)
+                walk_checks = matcher(state_checks + distance_checks)
+
+            if candidates is not None and len(candidates) < (end - start):
+                # Small equality result: filter, then select the page by (value, id)
+                records = self.records
+                if all_checks:
+                    ids = [i for i in candidates if all_checks(records[i])]
+                else:
+                    ids = candidates
+                keyed = [(records[i].get(field) or 0, i) for i in ids]
+                total = len(keyed)
+                wanted = offset + limit
+                if wanted * 4 < total:
+                    select = heapq.nlargest if descending else heapq.nsmallest
+                    keyed = select(wanted, keyed)
+                else:
+                    keyed.sort(reverse=descending)
+                items = [records[i] for _, i in keyed[offset:wanted]]
+            elif candidates is None and walk_checks is None:
+                # The range slice is the answer: page straight out of the index
+                total = end - start
+                if descending:
+                    page = entries[max(start, end - offset - limit):end - offset] if offset < total else []
+                    page = page[::-1]
+                else:
+                    page = entries[start + offset:min(end, start + offset + limit)]
+                items = [self.records[fvg_id] for _, fvg_id in page]
+            else:
+                # Walk the sorted index in order; only page members are materialized
+                positions = range(end - 1, start - 1, -1) if descending else range(start, end)
+                total = 0
+                items = []
+                for pos in positions:
+                    fvg_id = entries[pos][1]
+                    if candidates is not None and fvg_id not in candidates:
+                        continue
+                    if walk_checks is not None and not walk_checks(self.records[fvg_id]):
+                        continue
+                    if offset <= total < offset + limit:
+                        items.append(self.records[fvg_id])
+                    total += 1
+        else:
+            ids = candidates if candidates is not None else self.records.keys()
+            matched = [self.records[i] for i in ids]
+            if all_checks:
+                matched = [r for r in matched if all_checks(r)]
+            # Records without the field go last in either order
+            missing = [r for r in matched if r.get(sort) is None]
+            matched = [r for r in matched if r.get(sort) is not None]
+            matched.sort(key=lambda r: (_sort_value(r[sort]), r['fvg_id']), reverse=descending)
+            matched.extend(sorted(missing, key=lambda r: r['fvg_id']))
+            total = len(matched)
+            items = matched[offset:offset + limit]
+
+        return {
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'version': self.version,
+            'items': items
+        }
+
+    def query_blocks(self, symbol=None, timeframe=None, block_type=None, min_strength=None,
+                     offset=0, limit=100):
+        """Blocks sorted by strength (strongest first)"""
+        if symbol is not None:
+            symbol = normalize_symbol(symbol)
+            keys = [k for k in self.blocks if k[0] == symbol]
+        else:
+            keys = list(self.blocks)
+        if timeframe is not None:
+            keys = [k for k in keys if k[1] == timeframe]
+
+        blocks = [
+            block for key in keys for block in self.blocks[key]
+            if (block_type is None or block.get('type') == block_type) and
+               (min_strength is None or block.get('strength', 0) >= min_strength)
+        ]
+        blocks.sort(key=lambda b: (-b.get('strength', 0), b.get('block_id') or ''))
+        return {
+            'total': len(blocks),
+            'offset': offset,
+            'limit': limit,
+            'version': self.version,
+            'items': blocks[offset:offset + limit]
+        }
+
+    def symbol_view(self, symbol):
+        """Everything known about one symbol, grouped by timeframe"""
+        symbol = normalize_symbol(symbol)
+        timeframes = {}
+        for (sym, timeframe), ids in self.series.items():
+            if sym != symbol:
+                continue
+            records = sorted((self.records[i] for i in ids), key=lambda r: r.get('distance_percentage') or 0)
+            timeframes[timeframe] = {
+                'fvgs': records,
+                'blocks': self.blocks.get((sym, timeframe), [])
+            }
+        return {
+            'symbol': symbol,
+            'version': self.symbol_versions.get(symbol, 0),
+            'timeframes': timeframes
+        }
+
+    def symbol_tiers(self, symbol):
+        """Memory tiers of a symbol's active FVGs"""
+        ids = self._equality['symbol'].get(normalize_symbol(symbol), ())
+        return [self.records[i].get('memory_tier') for i in ids]
+
+    def series_tiers(self, symbol, timeframe):
+        """Memory tiers of one series' active FVGs"""
+        ids = self.series.get((normalize_symbol(symbol), timeframe), ())
+        return [self.records[i].get('memory_tier') for i in ids]
+
+    def stats(self):
+        return {
+            'active_fvgs': len(self.records),
+            'series': len(self.series),
+            'blocks': sum(len(b) for b in self.blocks.values()),
+            'symbols': len(self._equality['symbol']),
+            'version': self.version
+        }
@@ -0,0 +1,232 @@
+"""gateway.py — WebSocket fan-out gateway fed by the message bus
+
+A gateway holds client connections only: it subscribes to the scanner's
+events channel and routes every message to its own clients with the same
+subscription filters the scanner uses (subscriptions.SubscriptionIndex).
+Subscription and ping messages are answered locally; scan control, alert
+rule and screener messages are forwarded to the scanner on the control
+channel with a reply_to address (gateway id:client id), and the tagged
+replies that come back on the events channel reach only that client. On
+connect and on every subscribe the gateway asks the scanner for the
+client's last known state (known_state -> fvg_snapshot), as the scanner
+does for its own clients.
+
+Running it locally:
+
+    python message_bus.py broker --port 6380
+    FVG_BUS_URL=redis://127.0.0.1:6380 uvicorn main:app --port 8000
+    python gateway.py --bus redis://127.0.0.1:6380 --port 8766
+    python gateway.py --bus redis://127.0.0.1:6380 --port 8767
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import uuid
+
+import websockets
+
+from message_bus import CONTROL_CHANNEL, EVENTS_CHANNEL, create_bus
+from subscriptions import Subscription, SubscriptionIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GATEWAY_PORT = int(os.environ.get('FVG_GATEWAY_PORT', 8766))
+LOCAL_MESSAGES = ('subscribe', 'unsubscribe', 'subscribe_alerts', 'unsubscribe_alerts', 'ping')
+
+class BusGateway:
+    """Client connections of one gateway process"""
+
+    def __init__(self, bus, host='0.0.0.0', port=DEFAULT_GATEWAY_PORT):
+        self.bus = bus
+        self.host = host
+        self.port = port
+        self.clients = set()
+        self.subscriptions = SubscriptionIndex()
+        self.alert_clients = set()
+        self.last_stats = {}
+        self.last_settings = {}
+        self.gateway_id = uuid.uuid4().hex[:12]
+        self.client_ids = {}          # websocket -> reply id
+        self.clients_by_id = {}       # reply id -> websocket
+        self.screener_clients = set()
+        self.rule_clients = set()     # Clients with alert rules of their own at the scanner
+        self._ids = itertools.count(1)
+        self.server = None
+        self._consumer = None
+        self.stats = {'events': 0, 'sent': 0, 'forwarded': 0, 'replies': 0}
+
+    async def start(self):
+        self.server = await websockets.serve(self.handle_client, self.host, self.port,
+                                             ping_interval=30, ping_timeout=10)
+        self._consumer = asyncio.create_task(self.consume_events())   # Referenced: the loop holds tasks weakly
+        logger.info(f"🛰️ GATEWAY: serving clients on ws://{self.host}:{self.port}")
+        return self.server
+
+    async def consume_events(self):
+        async for payload in self.bus.subscribe(EVENTS_CHANNEL):
+            try:
+                await self.route_event(payload)
+            except Exception as e:
+                logger.error(f"Error routing bus event: {e}")
+
+    async def route_event(self, payload):
+        """Deliver one scanner message (already encoded) to the interested clients"""
+        self.stats['events'] += 1
+        message = json.loads(payload)
+        message_type = message.get('type')
+        if message.get('stats'):
+            self.last_stats = message['stats']
+        if message.get('settings') and message_type in ('settings_updated', 'connection_established'):
+            self.last_settings = message['settings']
+
+        reply_to = message.pop('reply_to', None)
+        if reply_to is not None:
+            await self.send_reply(reply_to, message)
+            return
+
+        if message_type == 'fvg_data':
+            recipients = self.subscriptions.route(message.get('data') or {})
+        elif message_type == 'fvg_state':
+            state = message.get('data') or {}
+            recipients = self.subscriptions.route(state, ignore_distance=(state.get('transition') == 'left'))
+        elif message_type == 'alert':
+            recipients = self.alert_clients
+        elif message_type == 'fvg_refresh':
+            await self.send_refresh(message)
+            return
+        else:
+            recipients = self.clients
+        await self.send_payload(recipients, payload)
+
+    async def send_reply(self, reply_to, message):
+        """A reply to one client's forwarded message: to that client only (if it is ours)"""
+        gateway_id, _, client_id = reply_to.partition(':')
+        client = self.clients_by_id.get(client_id) if gateway_id == self.gateway_id else None
+        if client is None:
+            return
+        self.stats['replies'] += 1
+        if message.get('type') == 'alert_rules':
+            message['subscribed'] = client in self.alert_clients    # Alert subscriptions live here
+        elif message.get('type') == 'alert' and client not in self.alert_clients:
+            return                                                  # The client's own rule, unsubscribed
+        await self.send_payload([client], json.dumps(message))
+
+    async def forward(self, data, websocket):
+        """Send a client message to the scanner, addressed for the reply"""
+        self.stats['forwarded'] += 1
+        message = dict(data, reply_to=f"{self.gateway_id}:{self.client_ids[websocket]}")
+        await self.bus.publish(CONTROL_CHANNEL, json.dumps(message))
+
+    async def request_known_state(self, websocket, subscription):
+        await self.forward({'type': 'known_state', 'subscription': subscription.to_dict()}, websocket)
+
+    async def send_refresh(self, message):
+        """Re-filtered batch: every client gets the part its subscription asks for"""
+        fvgs = message.get('data') or []
+        for client in list(self.clients):
+            subscription = self.subscriptions.subscriptions.get(client)
+            if subscription is None:
+                continue
+            selected = fvgs if subscription.is_wildcard else [fvg for fvg in fvgs if subscription.accepts(fvg)]
+            await self.send_payload([client], json.dumps(dict(message, data=selected)))
+
+    async def send_payload(self, clients, payload):
+        for client in list(clients):
+            try:
+                await client.send(payload)
+                self.stats['sent'] += 1
+            except Exception:
+                self.remove_client(client)
+
+    def remove_client(self, client):
+        self.clients.discard(client)
+        self.alert_clients.discard(client)
+        self.subscriptions.remove_client(client)
+        self.clients_by_id.pop(self.client_ids.pop(client, None), None)
+
+    async def handle_client(self, websocket, path=None):
+        client_id = str(next(self._ids))
+        self.client_ids[websocket] = client_id
+        self.clients_by_id[client_id] = websocket
+        self.clients.add(websocket)
+        self.subscriptions.add_client(websocket)
+        try:
+            await websocket.send(json.dumps({
+                'type': 'connection_established',
+                'message': '🚀 PINE SCRIPT FVG SCANNER - Connected successfully',
+                'stats': self.last_stats,
+                'settings': self.last_settings
+            }))
+            await self.request_known_state(websocket, self.subscriptions.subscriptions[websocket])
+            async for raw in websocket:
+                try:
+                    await self.handle_client_message(json.loads(raw), websocket)
+                except json.JSONDecodeError:
+                    logger.error(f"Invalid JSON from client: {raw}")
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            if websocket in self.screener_clients:
+                self.screener_clients.discard(websocket)
+                await self.forward({'type': 'unsubscribe_screener'}, websocket)
+            if websocket in self.rule_clients:
+                # Its alert rules are its own: they go with it
+                self.rule_clients.discard(websocket)
+                await self.forward({'type': 'clear_alert_rules'}, websocket)
+            self.remove_client(websocket)
+
+    async def handle_client_message(self, data, websocket):
+        message_type = data.get('type')
+        if message_type not in LOCAL_MESSAGES:
+            # Scan control / settings / alert rules / screens belong to the scanner
+            if message_type == 'screener':
+                self.screener_clients.add(websocket)
+            elif message_type == 'unsubscribe_screener':
+                self.screener_clients.discard(websocket)
+            elif message_type == 'add_alert_rule':
+                self.rule_clients.add(websocket)
+            await self.forward(data, websocket)
+            return
+
+        if message_type == 'ping':
+            reply = {'type': 'pong'}
+        elif message_type in ('subscribe', 'unsubscribe'):
+            try:
+                subscription = Subscription.from_message(data) if message_type == 'subscribe' else Subscription()
+            except (TypeError, ValueError) as e:
+                await websocket.send(json.dumps({'type': 'error', 'message': f'Invalid subscription: {e}'}))
+                return
+            self.subscriptions.subscribe(websocket, subscription)
+            await websocket.send(json.dumps({'type': 'subscription_updated', 'subscription': subscription.to_dict()}))
+            await self.request_known_state(websocket, subscription)
+            return
+        else:
+            subscribed = message_type == 'subscribe_alerts'
+            if subscribed:
+                self.alert_clients.add(websocket)
+                if data.get('alerts_only'):
+                    self.subscriptions.remove_client(websocket)
+            else:
+                self.alert_clients.discard(websocket)
+            reply = {'type': 'alert_rules', 'subscribed': subscribed}
+        await websocket.send(json.dumps(reply))
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="FVG WebSocket fan-out gateway")
+    parser.add_argument('--bus', default=os.environ.get('FVG_BUS_URL', 'redis://127.0.0.1:6380'))
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_GATEWAY_PORT)
+    args = parser.parse_args()
+
+    async def _main():
+        server = await BusGateway(create_bus(args.bus), args.host, args.port).start()
+        await server.wait_closed()
+
+    asyncio.run(_main())
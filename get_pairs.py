@@ -3,6 +3,8 @@ import asyncio
 import aiohttp
 import ssl
 
+from rate_governor import PRIORITY_LOW, get_shared_governor
+
 async def get_all_usdt_perpetual_pairs():
     """
     MAXIMUM COVERAGE: Get 450+ USDT perpetual trading pairs from Binance
@@ -80,6 +82,10 @@ async def get_all_usdt_perpetual_pairs():
     
     all_methods_results = []
     
+    # These are futures (fapi) endpoints: they count against the process-wide futures
+    # weight budget, separate from the scanner's spot budget
+    governor = get_shared_governor('futures')
+    
     # Method 1: CCXT with maximum aggressive settings
     try:
         print("\n📡 Method 1: CCXT Maximum Extraction")
@@ -93,7 +99,7 @@ async def get_all_usdt_perpetual_pairs():
                 'fetchMarketsMethod': 'fapiPublicGetExchangeInfo',  # Direct futures API
             },
             'timeout': 60000,  # Longer timeout
-            'enableRateLimit': False,  # Disable for max speed
+            'enableRateLimit': True,  # Single call; the governor handles the bulk endpoints below
             'headers': {
                 'User-Agent': 'get_pairs.py/2.0 (450+ Pairs Maximum Coverage)',
                 'Accept': 'application/json',
@@ -150,7 +156,9 @@ async def get_all_usdt_perpetual_pairs():
         async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
             
             # Get exchange info
+            await governor.acquire(1, PRIORITY_LOW)
             async with session.get("https://fapi.binance.com/fapi/v1/exchangeInfo") as response:
+                governor.observe_headers(response.headers)
                 if response.status == 200:
                     data = await response.json()
                     api_pairs = []
@@ -179,8 +187,10 @@ async def get_all_usdt_perpetual_pairs():
                     print(f"✅ Direct API: Found {len(api_pairs)} USDT perpetual pairs")
                     print(f"🚫 Direct API: Blocked {blocked_count} delisted tokens")
             
-            # BONUS: Get 24hr ticker data for volume validation
+            # BONUS: Get 24hr ticker data for volume validation (weight 40 for all symbols)
+            await governor.acquire(40, PRIORITY_LOW)
             async with session.get("https://fapi.binance.com/fapi/v1/ticker/24hr") as response:
+                governor.observe_headers(response.headers)
                 if response.status == 200:
                     ticker_data = await response.json()
                     ticker_pairs = []
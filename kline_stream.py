@@ -0,0 +1,308 @@
+"""kline_stream.py — Live kline / price ingestion over multiplexed WebSockets
+
+Instead of re-polling fetch_ohlcv for every pair and timeframe, the scanner can
+keep a handful of Binance combined-stream connections open:
+
+    <symbol>@kline_<tf>     -> candle-close events drive FVG detection
+    <symbol>@markPrice@1s   -> price ticks drive distance / touch refresh
+
+REST is only used to backfill each series at startup and to repair the gap
+after a reconnect (see the ``on_reconnect`` callback).
+
+For local testing the module ships a stand-in server that replays recorded
+combined-stream messages:
+
+    python kline_stream.py record BTCUSDT 1m --seconds 120 --out klines.jsonl
+    python kline_stream.py replay klines.jsonl --port 8766
+    FVG_KLINE_STREAM_URL=ws://127.0.0.1:8766 python scanner.py
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+
+import websockets
+
+from subscriptions import normalize_symbol
+
+logger = logging.getLogger(__name__)
+
+FUTURES_STREAM_URL = 'wss://fstream.binance.com'
+SPOT_STREAM_URL = 'wss://stream.binance.com:9443'
+FUTURES_PRICE_STREAM = 'markPrice@1s'
+SPOT_PRICE_STREAM = 'miniTicker'   # Spot has no mark price
+MAX_STREAMS_PER_CONNECTION = 200   # Binance limit for combined streams
+STABLE_CONNECTION_SECONDS = 60     # Up this long before the reconnect backoff starts over
+
+def stream_symbol(symbol):
+    """'BTC/USDT' -> 'btcusdt'"""
+    return normalize_symbol(symbol).lower()
+
+def parse_stream_message(message):
+    """
+    Parse a combined-stream message
+
+    Returns ('kline', symbol, timeframe, candle, is_closed),
+    ('price', symbol, price) or None for anything else (e.g. SUBSCRIBE acks).
+    candle is an exchange-style row [timestamp, open, high, low, close, volume].
+    """
+    data = message.get('data') if isinstance(message, dict) else None
+    if not data:
+        return None
+
+    event = data.get('e')
+    if event == 'kline':
+        k = data['k']
+        candle = [int(k['t']), float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])]
+        return ('kline', data['s'], k['i'], candle, bool(k['x']))
+
+    if event == 'markPriceUpdate':
+        return ('price', data['s'], float(data['p']))
+
+    if event == '24hrMiniTicker':
+        return ('price', data['s'], float(data['c']))
+
+    return None
+
+class KlineStreamIngestor:
+    """Keeps multiplexed kline/price streams open and dispatches events"""
+
+    def __init__(self, symbols, timeframes, on_candle_close, on_price=None, on_candle_update=None,
+                 on_reconnect=None, base_url=FUTURES_STREAM_URL, price_stream=FUTURES_PRICE_STREAM,
+                 streams_per_connection=MAX_STREAMS_PER_CONNECTION):
+        self.symbols = list(symbols)
+        self.timeframes = list(timeframes)
+        self.on_candle_close = on_candle_close
+        self.on_price = on_price
+        self.on_candle_update = on_candle_update
+        self.on_reconnect = on_reconnect
+        self.base_url = base_url.rstrip('/')
+        self.price_stream = price_stream
+        self.streams_per_connection = max(1, min(streams_per_connection, MAX_STREAMS_PER_CONNECTION))
+
+        # Stream symbol ('btcusdt') -> caller symbol ('BTC/USDT')
+        self.symbol_map = {stream_symbol(s): s for s in self.symbols}
+
+        self.is_running = False
+        self._tasks = []
+        self.stats = {
+            'connections': 0,
+            'messages': 0,
+            'candles_closed': 0,
+            'price_ticks': 0,
+            'reconnects': 0,
+            'last_message_at': None
+        }
+
+    def stream_names(self):
+        """All stream names this ingestor needs, grouped per symbol"""
+        streams = []
+        for symbol in self.symbols:
+            name = stream_symbol(symbol)
+            for timeframe in self.timeframes:
+                streams.append(f"{name}@kline_{timeframe}")
+            if self.price_stream and self.on_price:
+                streams.append(f"{name}@{self.price_stream}")
+        return streams
+
+    def connection_groups(self):
+        """Split the streams into chunks of at most streams_per_connection"""
+        streams = self.stream_names()
+        size = self.streams_per_connection
+        return [streams[i:i + size] for i in range(0, len(streams), size)]
+
+    async def run(self):
+        """Open all connections and dispatch until stop() is called"""
+        self.is_running = True
+        groups = self.connection_groups()
+        logger.info(f"📡 KLINE STREAM: {len(groups)} connection(s) for {sum(len(g) for g in groups)} streams")
+
+        self._tasks = [asyncio.create_task(self._run_connection(group)) for group in groups]
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.is_running = False
+
+    def stop(self):
+        self.is_running = False
+        for task in self._tasks:
+            task.cancel()
+
+    async def _run_connection(self, streams):
+        """One multiplexed connection with reconnect + gap repair"""
+        url = f"{self.base_url}/stream"
+        backoff = 1.0
+        connected_before = False
+
+        while self.is_running:
+            connected_at = None
+            try:
+                async with websockets.connect(url, ping_interval=20, ping_timeout=20, max_size=2 ** 22) as ws:
+                    await ws.send(json.dumps({'method': 'SUBSCRIBE', 'params': streams, 'id': 1}))
+                    self.stats['connections'] += 1
+                    connected_at = time.monotonic()
+
+                    if connected_before and self.on_reconnect:
+                        # Candles may have closed while we were away - repair via REST
+                        self.stats['reconnects'] += 1
+                        await self.on_reconnect(self._series_for(streams))
+                    connected_before = True
+
+                    async for raw in ws:
+                        await self._dispatch(raw)
+                        if not self.is_running:
+                            break
+                # A clean close (Binance's 24h limit, a rejected subscription) backs off like an error
+                reason = 'closed by server'
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                reason = f'connection lost ({e})'
+
+            if not self.is_running:
+                break
+            if connected_at is not None and time.monotonic() - connected_at >= STABLE_CONNECTION_SECONDS:
+                backoff = 1.0
+            delay = backoff + random.uniform(0, backoff)
+            logger.warning(f"⚠️ KLINE STREAM: {reason}, reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, 60)
+            connected_before = True
+
+    def _series_for(self, streams):
+        """(symbol, timeframe) pairs covered by a list of kline streams"""
+        series = []
+        for stream in streams:
+            name, _, kind = stream.partition('@')
+            if kind.startswith('kline_') and name in self.symbol_map:
+                series.append((self.symbol_map[name], kind[len('kline_'):]))
+        return series
+
+    async def _dispatch(self, raw):
+        try:
+            event = parse_stream_message(json.loads(raw))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Invalid stream message: {e}")
+            return
+        if event is None:
+            return
+
+        self.stats['messages'] += 1
+        self.stats['last_message_at'] = time.time()
+
+        symbol = self.symbol_map.get(event[1].lower())
+        if symbol is None:
+            return
+
+        try:
+            if event[0] == 'kline':
+                _, _, timeframe, candle, is_closed = event
+                if is_closed:
+                    self.stats['candles_closed'] += 1
+                    await self.on_candle_close(symbol, timeframe, candle)
+                elif self.on_candle_update:
+                    await self.on_candle_update(symbol, timeframe, candle)
+            elif self.on_price:
+                self.stats['price_ticks'] += 1
+                await self.on_price(symbol, event[2])
+        except Exception as e:
+            logger.error(f"Error handling stream event for {symbol}: {e}")
+
+# ---------------------------------------------------------------------------
+# Local stand-in server: record live messages and replay them for tests
+# ---------------------------------------------------------------------------
+
+async def record_streams(streams, path, seconds=60, base_url=FUTURES_STREAM_URL):
+    """Record raw combined-stream messages to a JSONL file"""
+    deadline = time.time() + seconds
+    count = 0
+    async with websockets.connect(f"{base_url.rstrip('/')}/stream") as ws:
+        await ws.send(json.dumps({'method': 'SUBSCRIBE', 'params': streams, 'id': 1}))
+        with open(path, 'w', encoding='utf-8') as f:
+            while time.time() < deadline:
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=max(0.1, deadline - time.time()))
+                except asyncio.TimeoutError:
+                    break
+                message = json.loads(raw)
+                if 'stream' in message:
+                    f.write(json.dumps(message) + '\n')
+                    count += 1
+    logger.info(f"📼 Recorded {count} messages to {path}")
+    return count
+
+def load_recording(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+async def serve_replay(path, host='127.0.0.1', port=8766, interval=0.0, loop_forever=False):
+    """
+    Stand-in for the Binance combined-stream endpoint
+
+    Accepts SUBSCRIBE requests and replays the recorded messages for the
+    subscribed streams, ``interval`` seconds apart.
+    """
+    recording = load_recording(path)
+
+    async def handler(websocket, path_=None):
+        subscribed = set()
+        try:
+            request = json.loads(await websocket.recv())
+            subscribed.update(request.get('params', []))
+            await websocket.send(json.dumps({'result': None, 'id': request.get('id')}))
+
+            while True:
+                for message in recording:
+                    if message.get('stream') in subscribed:
+                        await websocket.send(json.dumps(message))
+                        if interval:
+                            await asyncio.sleep(interval)
+                if not loop_forever:
+                    break
+            await websocket.wait_closed()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    server = await websockets.serve(handler, host, port)
+    logger.info(f"📼 Replay server on ws://{host}:{port} ({len(recording)} recorded messages)")
+    return server
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Kline stream recorder / replay server")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rec = sub.add_parser('record')
+    rec.add_argument('symbol')
+    rec.add_argument('timeframes', nargs='+')
+    rec.add_argument('--seconds', type=int, default=60)
+    rec.add_argument('--out', default='klines.jsonl')
+    rec.add_argument('--url', default=FUTURES_STREAM_URL)
+
+    rep = sub.add_parser('replay')
+    rep.add_argument('path')
+    rep.add_argument('--host', default='127.0.0.1')
+    rep.add_argument('--port', type=int, default=8766)
+    rep.add_argument('--interval', type=float, default=0.05)
+    rep.add_argument('--loop', action='store_true')
+
+    args = parser.parse_args()
+
+    async def _main():
+        if args.command == 'record':
+            name = stream_symbol(args.symbol)
+            streams = [f"{name}@kline_{tf}" for tf in args.timeframes] + [f"{name}@{FUTURES_PRICE_STREAM}"]
+            await record_streams(streams, args.out, args.seconds, args.url)
+        else:
+            server = await serve_replay(args.path, args.host, args.port, args.interval, args.loop)
+            await server.wait_closed()
+
+    asyncio.run(_main())
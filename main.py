@@ -1,14 +1,20 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+from typing import Optional
 import os
 import asyncio
 import json
 import time
+import hashlib
+import importlib
+import sys
 from pathlib import Path
 import logging
 
+from static_assets import StaticBundle
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -38,44 +44,38 @@ else:
 
 # Global variables for WebSocket connections
 connected_clients = set()
-fvg_data_buffer = []
+
+# Page and assets are rendered, hashed and compressed once (see static_assets.py)
+static_bundle = None
+
+def get_static_bundle():
+    """Prepared dashboard assets (built at startup, or on first use)"""
+    global static_bundle
+    if static_bundle is None:
+        static_bundle = StaticBundle().build()
+    return static_bundle
+
+@app.on_event("startup")
+async def build_static_bundle():
+    """Render index.html and precompress the assets before the first request"""
+    get_static_bundle()
+
+def asset_response(request: Request, asset, immutable=False):
+    """Prepared asset in the best encoding the client accepts (304 when its ETag matches)"""
+    status, body, headers = get_static_bundle().response_parts(
+        asset, request.headers.get("accept-encoding"), request.headers.get("if-none-match"), immutable
+    )
+    if status == 304:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=asset.media_type, headers=headers)
 
 @app.get("/")
-async def read_root():
+async def read_root(request: Request):
     """Serve the main FVG Scanner interface"""
     try:
-        # Try to find and serve the main HTML file - FIXED PATH DETECTION
-        html_candidates = [
-            "static/index.html",  # This should work with your uploaded file
-            "index.html",
-            "static/fvg-scanner.html"
-        ]
-        
-        for html_file in html_candidates:
-            if os.path.exists(html_file):
-                logger.info(f"✅ Found and serving HTML from: {html_file}")
-                
-                with open(html_file, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    
-                    # Auto-fix WebSocket URLs in the HTML for Railway
-                    content = content.replace(
-                        'ws://localhost:8000/ws',
-                        'wss://web-production-6b86c.up.railway.app/ws'
-                    )
-                    content = content.replace(
-                        'ws://127.0.0.1:8000/ws', 
-                        'wss://web-production-6b86c.up.railway.app/ws'
-                    )
-                    
-                    # Ensure script.js path is correct
-                    content = content.replace(
-                        'src="/script.js"',
-                        'src="/static/script.js"'
-                    )
-                    
-                    logger.info(f"📄 Serving your beautiful FVG Scanner interface!")
-                    return HTMLResponse(content=content)
+        bundle = get_static_bundle()
+        if bundle.page is not None:
+            return asset_response(request, bundle.page)
         
         # If no HTML file found, show error with file listing
         logger.warning("❌ No HTML file found!")
@@ -160,24 +160,23 @@ async def read_root():
         </html>
         """)
 
-# Serve script.js file specifically
+# Serve script.js file specifically (the page itself links the hashed URL)
 @app.get("/script.js")
-async def serve_script():
+async def serve_script(request: Request):
     """Serve the script.js file"""
-    try:
-        script_paths = ["static/script.js", "script.js"]
-        
-        for script_path in script_paths:
-            if os.path.exists(script_path):
-                logger.info(f"✅ Serving script.js from: {script_path}")
-                return FileResponse(script_path, media_type="application/javascript")
-        
+    asset = get_static_bundle().by_name.get("script.js")
+    if asset is None:
         logger.warning("❌ script.js not found")
         return HTMLResponse(content="console.log('❌ script.js not found');", media_type="application/javascript")
-        
-    except Exception as e:
-        logger.error(f"❌ Error serving script.js: {e}")
-        return HTMLResponse(content=f"console.log('❌ script.js error: {str(e)}');", media_type="application/javascript")
+    return asset_response(request, asset)
+
+@app.get("/assets/{name}")
+async def serve_asset(request: Request, name: str):
+    """Content-hashed asset: immutable, cached by browsers for a year"""
+    asset = get_static_bundle().assets.get(f"/assets/{name}")
+    if asset is None:
+        return Response(status_code=404)
+    return asset_response(request, asset, immutable=True)
 
 @app.get("/health")
 async def health_check():
@@ -207,7 +206,13 @@ async def get_status():
         "websocket": "available",
         "scanner": "active",
         "clients_connected": len(connected_clients),
-        "data_buffer_size": len(fvg_data_buffer),
+        "data_buffer_size": len(get_fvg_store()),
+        "fvg_store": get_fvg_store().stats(),
+        "screener": get_fvg_store().screener.stats(),
+        "sharding": get_shard_status(),
+        "rate_governor": get_governor_status(),
+        "caches": get_cache_stats(),
+        "message_bus": get_bus_status(),
         "static_files_exist": os.path.exists("static/index.html"),
         "urls": {
             "main": "https://web-production-6b86c.up.railway.app",
@@ -217,6 +222,173 @@ async def get_status():
         }
     }
 
+@app.on_event("startup")
+async def start_shard_coordinator():
+    """FVG_SHARD_ROLE=coordinator: scan workers (python sharding.py worker) feed the shared scanner"""
+    if os.environ.get("FVG_SHARD_ROLE") != "coordinator":
+        return
+    from scanner import get_shared_scanner
+    from sharding import ShardCoordinator
+    await ShardCoordinator(get_shared_scanner()).start()
+
+@app.on_event("startup")
+async def warm_start():
+    """Load the last snapshot in the background: /health serves at once, clients get known gaps in ~1s"""
+    async def restore():
+        loop = asyncio.get_running_loop()
+        # Importing the scanner (ccxt, pandas) happens off the event loop
+        try:
+            scanner_module = await loop.run_in_executor(None, importlib.import_module, "scanner")
+            scanner_module.get_shared_scanner().restore_snapshot()
+        except Exception as e:
+            logger.error(f"❌ Warm start failed: {e}")
+    
+    asyncio.create_task(restore())
+
+@app.on_event("startup")
+async def start_shared_candles():
+    """FVG_SHARED_CANDLES=1 (several workers): one writer scans into shared memory, the rest follow"""
+    if os.environ.get("FVG_SHARED_CANDLES", "0").lower() not in ("1", "true", "yes"):
+        return
+    from scanner import get_shared_scanner
+    await get_shared_scanner().start_shared_candles()
+
+@app.on_event("startup")
+async def attach_message_bus():
+    """FVG_BUS_URL set: publish scanner events for gateway processes (gateway.py)"""
+    bus_url = os.environ.get("FVG_BUS_URL")
+    if not bus_url:
+        return
+    from scanner import get_shared_scanner
+    from message_bus import create_bus
+    await get_shared_scanner().attach_bus(create_bus(bus_url))
+
+@app.on_event("shutdown")
+async def save_snapshot():
+    """Persist the last known state for the next boot (only if the scanner ever ran)"""
+    scanner_module = sys.modules.get("scanner")
+    if scanner_module is not None and scanner_module._shared_scanner is not None:
+        scanner_module._shared_scanner.save_snapshot()
+        if scanner_module._shared_scanner.candle_rings is not None:
+            scanner_module._shared_scanner.candle_rings.close()
+
+def get_fvg_store():
+    """In-memory FVG state of the shared scanner"""
+    from scanner import get_shared_scanner
+    return get_shared_scanner().store
+
+def get_shard_status():
+    """Coordinator view of the scan workers (None when not sharded)"""
+    from scanner import get_shared_scanner
+    coordinator = get_shared_scanner().coordinator
+    return coordinator.status() if coordinator is not None else None
+
+def get_governor_status():
+    """Request weight budget of the shared scanner's exchange"""
+    from scanner import get_shared_scanner
+    return get_shared_scanner().governor.status()
+
+def get_bus_status():
+    """Publish counters of the scanner's message bus (None without FVG_BUS_URL)"""
+    from scanner import get_shared_scanner
+    bus = get_shared_scanner().bus
+    return getattr(bus, 'stats', None)
+
+def get_cache_stats():
+    """Size, hit / miss and eviction counts of the shared scanner's caches"""
+    from scanner import get_shared_scanner
+    return get_shared_scanner().caches.stats()
+
+def cached_json(request: Request, payload, version):
+    """JSON response with an ETag derived from the store version and the query"""
+    query_hash = hashlib.md5(str(request.url.query).encode()).hexdigest()[:8]
+    etag = f'W/"{version}-{query_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=payload, headers=headers)
+
+@app.get("/fvgs")
+async def query_fvgs(
+    request: Request,
+    symbol: Optional[str] = None,
+    timeframe: Optional[str] = None,
+    type: Optional[str] = Query(None, description="Bullish or Bearish"),
+    tier: Optional[str] = Query(None, description="priority, high, medium or low"),
+    min_distance: Optional[float] = None,
+    max_distance: Optional[float] = None,
+    min_strength: Optional[float] = None,
+    max_strength: Optional[float] = None,
+    touched: Optional[bool] = None,
+    proximity_only: bool = False,
+    sort: str = Query("distance", description="distance, strength or any record field"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Filtered, sorted and paginated active FVGs"""
+    store = get_fvg_store()
+    result = store.query(
+        symbol=symbol, timeframe=timeframe, fvg_type=type.capitalize() if type else None, tier=tier,
+        min_distance=min_distance, max_distance=max_distance,
+        min_strength=min_strength, max_strength=max_strength,
+        touched=touched, proximity_only=proximity_only,
+        sort=sort, order=order, offset=offset, limit=limit
+    )
+    return cached_json(request, result, result['version'])
+
+@app.get("/blocks")
+async def query_blocks(
+    request: Request,
+    symbol: Optional[str] = None,
+    timeframe: Optional[str] = None,
+    type: Optional[str] = None,
+    min_strength: Optional[float] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Institutional blocks, strongest first"""
+    store = get_fvg_store()
+    result = store.query_blocks(
+        symbol=symbol, timeframe=timeframe, block_type=type.capitalize() if type else None,
+        min_strength=min_strength, offset=offset, limit=limit
+    )
+    return cached_json(request, result, result['version'])
+
+@app.get("/symbols/{symbol}")
+async def get_symbol(request: Request, symbol: str):
+    """All FVGs and blocks of one symbol, grouped by timeframe"""
+    result = get_fvg_store().symbol_view(symbol)
+    return cached_json(request, result, result['version'])
+
+@app.get("/screener")
+async def get_screener(
+    request: Request,
+    rank: str = Query("distance", pattern="^(distance|strength|block_strength|confluence)$"),
+    limit: int = Query(50, ge=1, le=200)
+):
+    """Universe-wide top gaps (distance, strength) or blocks (block_strength, confluence), best first"""
+    store = get_fvg_store()
+    result = {'rank': rank, 'limit': limit, 'version': store.version, 'items': store.screener.top(rank, limit)}
+    return cached_json(request, result, result['version'])
+
+@app.get("/fill-stats")
+async def get_fill_stats(
+    request: Request,
+    symbol: Optional[str] = None,
+    timeframe: Optional[str] = None,
+    type: Optional[str] = Query(None, description="Bullish or Bearish")
+):
+    """Time-to-touch / time-to-fill quantiles (seconds) and rates per symbol, timeframe, type and gap size"""
+    from scanner import get_shared_scanner
+    fill_stats = get_shared_scanner().fill_stats
+    result = {
+        'version': fill_stats.version,
+        'items': fill_stats.query(symbol=symbol, timeframe=timeframe, fvg_type=type.capitalize() if type else None)
+    }
+    return cached_json(request, result, result['version'])
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time FVG data streaming"""
@@ -0,0 +1,316 @@
+"""message_bus.py — Pluggable publish/subscribe bus between scanners and gateways
+
+Without a bus every message a scanner produces is sent by that scanner to
+its own WebSocket clients. With FVG_BUS_URL set the scanner also publishes
+everything to a bus, and gateway processes (gateway.py) own the client
+connections, so scan capacity and client capacity scale independently:
+
+    fvg:events    scanner -> gateways   fvg_data / fvg_state / alert /
+                                        stats_update / control replies,
+                                        exactly the client message JSON
+    fvg:control   gateways -> scanner   start_scan / stop_scan /
+                                        update_settings / alert rule messages,
+                                        known_state requests
+
+A forwarded control message carries a ``reply_to`` address (gateway id and
+client id); the scanner answers through a BusReply, which tags the reply
+with the same address so only the asking client receives it.
+
+Backends (create_bus):
+
+    memory://              InProcessBus, asyncio queues inside one process
+    redis://host:port      RedisBus, the PUBLISH / SUBSCRIBE subset of the
+                           Redis protocol (RESP); works against a real Redis
+                           or the LocalBroker stand-in below
+
+``python message_bus.py broker --port 6380`` runs LocalBroker.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+from abc import ABC, abstractmethod
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = 'fvg:events'
+CONTROL_CHANNEL = 'fvg:control'
+DEFAULT_BUS_URL = os.environ.get('FVG_BUS_URL')
+QUEUE_SIZE = 10000               # Per subscriber; a slower consumer loses the newest messages
+
+class MessageBus(ABC):
+    """Interface: publish strings to a channel, iterate a channel's messages"""
+
+    @abstractmethod
+    async def publish(self, channel, payload):
+        """Publish one payload (str) on a channel"""
+
+    @abstractmethod
+    def subscribe(self, channel):
+        """Async iterator over the channel's payloads (str)"""
+
+    async def close(self):
+        pass
+
+class InProcessBus(MessageBus):
+    """Bus inside one process: one bounded queue per subscriber"""
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._queues = {}
+        self.stats = {'published': 0, 'dropped': 0}
+
+    async def publish(self, channel, payload):
+        self.stats['published'] += 1
+        for queue in self._queues.get(channel, ()):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self.stats['dropped'] += 1
+
+    async def subscribe(self, channel):
+        queue = asyncio.Queue(self.queue_size)
+        self._queues.setdefault(channel, set()).add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._queues[channel].discard(queue)
+
+# ------------------------------------------------------------------------ RESP
+
+def encode_command(*parts):
+    """RESP array of bulk strings (ints become RESP integers, as in server replies)"""
+    out = [f"*{len(parts)}\r\n".encode()]
+    for part in parts:
+        if isinstance(part, int):
+            out.append(f":{part}\r\n".encode())
+            continue
+        data = part if isinstance(part, bytes) else str(part).encode('utf-8')
+        out.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+    return b''.join(out)
+
+async def read_reply(reader):
+    """One RESP value (simple / error / integer / bulk / array)"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("bus connection closed")
+    kind, body = line[:1], line[1:-2]
+    if kind == b'+':
+        return body.decode()
+    if kind == b'-':
+        raise RuntimeError(body.decode())
+    if kind == b':':
+        return int(body)
+    if kind == b'$':
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        count = int(body)
+        return None if count < 0 else [await read_reply(reader) for _ in range(count)]
+    raise ConnectionError(f"bad RESP line: {line!r}")
+
+class RedisBus(MessageBus):
+    """PUBLISH / SUBSCRIBE over the Redis protocol, reconnecting with backoff"""
+
+    def __init__(self, host='127.0.0.1', port=6379):
+        self.host = host
+        self.port = port
+        self._writer = None
+        self._replies = None
+        self._lock = asyncio.Lock()
+        self.stats = {'published': 0, 'dropped': 0, 'reconnects': 0}
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        # Publish replies (subscriber counts) are drained in the background: publishes are pipelined
+        self._replies = asyncio.ensure_future(self._drain_replies(reader))
+        self._writer = writer
+
+    async def _drain_replies(self, reader):
+        try:
+            while True:
+                await read_reply(reader)
+        except (ConnectionError, asyncio.IncompleteReadError, RuntimeError):
+            self._writer = None
+
+    async def publish(self, channel, payload):
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await self._connect()
+                self._writer.write(encode_command('PUBLISH', channel, payload))
+                await self._writer.drain()
+                self.stats['published'] += 1
+            except (OSError, ConnectionError) as e:
+                # Events are deltas of live state: dropping while the bus is down beats blocking the scanner
+                self.stats['dropped'] += 1
+                if self._writer is not None:
+                    self._writer.close()
+                self._writer = None
+                logger.warning(f"📮 BUS: publish to {self.host}:{self.port} failed: {e}")
+
+    async def subscribe(self, channel):
+        backoff = 1.0
+        while True:
+            writer = None
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                writer.write(encode_command('SUBSCRIBE', channel))
+                await writer.drain()
+                backoff = 1.0
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b'message':
+                        yield reply[2].decode('utf-8')
+            except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+                self.stats['reconnects'] += 1
+                delay = backoff + random.uniform(0, backoff)
+                logger.warning(f"📮 BUS: subscription to {channel} lost ({e}), retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._replies is not None:
+            self._replies.cancel()
+
+class LocalBroker:
+    """Minimal Redis-protocol pub/sub broker (SUBSCRIBE / UNSUBSCRIBE / PUBLISH / PING)"""
+
+    def __init__(self, host='127.0.0.1', port=6380, max_buffer=2 ** 24):
+        self.host = host
+        self.port = port
+        self.max_buffer = max_buffer      # Bytes queued for one subscriber before it loses messages
+        self.channels = {}
+        self.server = None
+        self.stats = {'published': 0, 'delivered': 0, 'dropped': 0}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"📮 LOCAL BROKER: listening on redis://{self.host}:{self.port}")
+        return self.server
+
+    async def handle_connection(self, reader, writer):
+        subscribed = set()
+        try:
+            while True:
+                command = await read_reply(reader)
+                if not isinstance(command, list) or not command:
+                    continue
+                name = command[0].decode().upper()
+                args = [arg.decode('utf-8') for arg in command[1:]]
+
+                if name == 'PUBLISH' and len(args) == 2:
+                    writer.write(f":{self.publish(args[0], args[1])}\r\n".encode())
+                elif name == 'SUBSCRIBE':
+                    for channel in args:
+                        self.channels.setdefault(channel, set()).add(writer)
+                        subscribed.add(channel)
+                        writer.write(encode_command('subscribe', channel, len(subscribed)))
+                elif name == 'UNSUBSCRIBE':
+                    for channel in args or list(subscribed):
+                        self.channels.get(channel, set()).discard(writer)
+                        subscribed.discard(channel)
+                        writer.write(encode_command('unsubscribe', channel, len(subscribed)))
+                elif name == 'PING':
+                    writer.write(b"+PONG\r\n")
+                else:
+                    writer.write(f"-ERR unsupported command '{name}'\r\n".encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscribed:
+                self.channels.get(channel, set()).discard(writer)
+            writer.close()
+
+    def publish(self, channel, payload):
+        self.stats['published'] += 1
+        message = encode_command('message', channel, payload)
+        receivers = 0
+        for writer in list(self.channels.get(channel, ())):
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                self.stats['dropped'] += 1
+                continue
+            writer.write(message)
+            receivers += 1
+        self.stats['delivered'] += receivers
+        return receivers
+
+def create_bus(url=None):
+    """Bus for a URL: memory:// (process-wide InProcessBus) or redis://host:port"""
+    url = url or DEFAULT_BUS_URL or 'memory://'
+    parsed = urlparse(url)
+    if parsed.scheme == 'memory':
+        global _memory_bus
+        if _memory_bus is None:
+            _memory_bus = InProcessBus()
+        return _memory_bus
+    if parsed.scheme == 'redis':
+        return RedisBus(parsed.hostname or '127.0.0.1', parsed.port or 6379)
+    raise ValueError(f"Unsupported bus URL: {url}")
+
+_memory_bus = None
+
+class BusSink:
+    """Scanner-side client stand-in: every message sent to it is published on the events channel"""
+
+    remote_address = ('bus', 0)
+
+    def __init__(self, bus, channel=EVENTS_CHANNEL):
+        self.bus = bus
+        self.channel = channel
+
+    async def send(self, payload):
+        await self.bus.publish(self.channel, payload)
+
+class BusReply:
+    """Scanner-side stand-in for the one gateway client a control message came from"""
+
+    remote_address = ('bus', 0)
+
+    def __init__(self, sink, reply_to):
+        self.sink = sink
+        self.reply_to = reply_to
+
+    def __eq__(self, other):
+        return isinstance(other, BusReply) and other.reply_to == self.reply_to
+
+    def __hash__(self):
+        return hash(self.reply_to)
+
+    async def send(self, payload):
+        message = json.loads(payload)
+        message['reply_to'] = self.reply_to
+        await self.sink.send(json.dumps(message))
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="FVG message bus")
+    sub = parser.add_subparsers(dest='command', required=True)
+    broker = sub.add_parser('broker', help='run the local Redis-protocol stand-in')
+    broker.add_argument('--host', default='127.0.0.1')
+    broker.add_argument('--port', type=int, default=6380)
+    args = parser.parse_args()
+
+    async def _main():
+        server = await LocalBroker(args.host, args.port).start()
+        await server.serve_forever()
+
+    asyncio.run(_main())
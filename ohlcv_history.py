@@ -0,0 +1,159 @@
+"""ohlcv_history.py — Deep OHLCV history paged backward with ``since``
+
+One kline request returns at most ~1000 candles, so a lookback beyond that
+(years of 1d / 1w candles) is fetched in pages and kept on disk:
+
+    plan      page start times from the oldest wanted candle up to the
+              current one, PAGE_LIMIT candles apart
+    fetch     pages concurrently (at most ``concurrency`` in flight); every
+              page goes through the caller's fetch function, so the rate
+              governor still prices and paces each request
+    stitch    merge by open time - pages overlap at their edges and the
+              newest copy of a candle wins - then check the spacing: holes
+              inside the range are re-requested once, what remains is
+              exchange downtime and is counted, not retried
+    persist   one .npz per series under FVG_HISTORY_DIR; the next fetch
+              starts at the newest stored candle, so steady state costs one
+              page per series however deep the lookback is
+
+Before a symbol's listing the exchange simply has no candles, so a lookback
+deeper than the listing yields the full history.
+"""
+
+import os
+import asyncio
+import logging
+
+import numpy as np
+
+from candle_series import CandleSeries
+from scheduler import candle_open_time, timeframe_seconds
+
+logger = logging.getLogger(__name__)
+
+PAGE_LIMIT = 1000               # Candles per request (Binance spot max; futures allow 1500)
+DEFAULT_CONCURRENCY = 4
+
+def default_history_dir():
+    return os.environ.get('FVG_HISTORY_DIR', 'ohlcv_history')
+
+def page_starts(timeframe, lookback, page_limit=PAGE_LIMIT, now=None, since=None):
+    """Open times (ms) of the pages covering the newest ``lookback`` candles (or everything from ``since``)"""
+    period = timeframe_seconds(timeframe) * 1000
+    newest = int(candle_open_time(timeframe, now)) * 1000
+    oldest = newest - (lookback - 1) * period if since is None else int(since)
+    return list(range(oldest, newest + 1, page_limit * period))
+
+def stitch(pages):
+    """Merge OHLCV pages into one time-ordered CandleSeries; later pages win on duplicate open times"""
+    pages = [CandleSeries.coerce(page) for page in pages if len(page)]
+    if not pages:
+        return CandleSeries()
+    times = np.concatenate([page.timestamp for page in pages])
+    values = np.concatenate([page.values for page in pages], axis=1)
+    # np.unique keeps the first occurrence: run it backwards so the newest copy is the one kept
+    _, first_reversed = np.unique(times[::-1], return_index=True)
+    keep = len(times) - 1 - first_reversed
+    return CandleSeries.from_columns(times[keep], values[:, keep])
+
+def find_holes(series, timeframe):
+    """(since_ms, missing candles) for every spacing gap inside a series"""
+    period = timeframe_seconds(timeframe) * 1000
+    times = series.timestamp
+    if len(times) < 2:
+        return []
+    steps = np.diff(times)
+    return [(int(times[i]) + period, int(steps[i] // period) - 1) for i in np.flatnonzero(steps > period)]
+
+class OHLCVHistory:
+    """Paged deep-history fetcher with an on-disk cache per series"""
+
+    def __init__(self, directory=None, page_limit=PAGE_LIMIT, concurrency=DEFAULT_CONCURRENCY):
+        self.directory = directory or default_history_dir()
+        self.page_limit = page_limit
+        self.concurrency = concurrency
+        self.stats = {'fetches': 0, 'pages': 0, 'cached_series': 0, 'holes_refetched': 0, 'holes_left': 0}
+
+    # --------------------------------------------------------------- storage
+
+    def path(self, symbol, timeframe):
+        name = str(symbol).replace('/', '').replace(':', '_')
+        return os.path.join(self.directory, f"{name}_{timeframe}.npz")
+
+    def load(self, symbol, timeframe):
+        """(series, oldest requested open time) from disk, or (None, None)"""
+        path = self.path(symbol, timeframe)
+        if not os.path.exists(path):
+            return None, None
+        try:
+            with np.load(path) as data:
+                return CandleSeries.from_columns(data['times'], data['values']), int(data['requested_from'])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"📚 HISTORY: ignoring unreadable {path}: {e}")
+            return None, None
+
+    def save(self, symbol, timeframe, series, requested_from):
+        """Atomically write a series (temporary file renamed into place)"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(symbol, timeframe)
+        temporary = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(temporary, times=series.timestamp, values=series.values, requested_from=requested_from)
+        os.replace(temporary, path)
+
+    # -------------------------------------------------------------- fetching
+
+    async def _fetch_pages(self, fetch_page, starts, limit):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(since):
+            async with semaphore:
+                page = await fetch_page(since, limit)
+                self.stats['pages'] += 1
+                return page if page is not None else []
+
+        return await asyncio.gather(*(one(since) for since in starts))
+
+    async def fetch(self, fetch_page, symbol, timeframe, lookback, now=None):
+        """
+        Newest ``lookback`` candles of a series as a CandleSeries
+
+        ``fetch_page(since_ms, limit)`` is an async callable returning OHLCV
+        rows, e.g. a governed exchange.fetch_ohlcv(symbol, timeframe, since=..., limit=...).
+        """
+        self.stats['fetches'] += 1
+        starts = page_starts(timeframe, lookback, self.page_limit, now)
+        oldest = starts[0]
+
+        cached, requested_from = self.load(symbol, timeframe)
+        checked_until = None
+        if cached is not None and len(cached) and requested_from <= oldest:
+            # Everything older is on disk: only the newest stored candle onwards (it may have been forming)
+            self.stats['cached_series'] += 1
+            checked_until = cached.last_timestamp
+            pages = [cached] + await self._fetch_pages(
+                fetch_page, page_starts(timeframe, lookback, self.page_limit, now, since=cached.last_timestamp),
+                self.page_limit
+            )
+        else:
+            requested_from = oldest
+            pages = await self._fetch_pages(fetch_page, starts, self.page_limit)
+
+        series = stitch(pages)
+        # Stored candles were checked when they were fetched: known exchange gaps are not re-requested
+        fresh = series if checked_until is None else series[int(np.searchsorted(series.timestamp, checked_until)):]
+        holes = find_holes(fresh, timeframe)
+        if holes:
+            self.stats['holes_refetched'] += len(holes)
+            refetched = await asyncio.gather(*(
+                self._fetch_pages(fetch_page, [since], min(missing + 1, self.page_limit)) for since, missing in holes
+            ))
+            series = stitch([series] + [page for pages in refetched for page in pages])
+            remaining = find_holes(series, timeframe)
+            self.stats['holes_left'] += len(remaining)
+            if remaining:
+                logger.info(f"📚 HISTORY: {symbol} {timeframe} has {len(remaining)} exchange gaps")
+
+        series = series[int(np.searchsorted(series.timestamp, oldest)):]   # Disk holds the lookback, not more
+        if len(series):
+            self.save(symbol, timeframe, series, requested_from)
+        return series
@@ -0,0 +1,298 @@
+"""rate_governor.py — Weight-aware rate limiting for Binance REST calls
+
+Binance limits each IP by request *weight* per minute (spot 6000, futures
+2400), not by request count; exceeding it returns 429 and repeated 429s turn
+into 418 IP bans. RateGovernor sits in front of every exchange call:
+
+    weights      local model per endpoint (request_weight), corrected by the
+                 X-MBX-USED-WEIGHT-1M header of each response
+    scheduling   token bucket refilled at (limit * safety) / 60 per second;
+                 waiters are served by priority (HIGH before NORMAL before LOW)
+    coalescing   identical calls already in flight share one request
+    retries      429 / 418 / network errors back off with jitter; Retry-After
+                 pauses the whole governor, not just the failing call
+
+One governor per API (spot / futures) is shared process-wide via
+get_shared_governor(), so every caller of an API draws from its one budget
+(the scanner from spot, get_pairs' fapi calls from futures).
+The bucket is process-wide too; waiters, the dispatcher, the concurrency
+semaphore and coalescing are per event loop, since asyncio primitives are
+bound to the loop that uses them (fvg_metrics' helpers and get_pairs run
+their own asyncio.run loops).
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0     # Prices of symbols with gaps at / near price
+PRIORITY_NORMAL = 1   # Candle-close rescans, gap repair
+PRIORITY_LOW = 2      # Universe discovery, backfill
+
+WEIGHT_LIMITS = {'spot': 6000, 'futures': 2400}
+
+def kline_weight(limit):
+    """Binance /klines weight by requested candle count"""
+    limit = limit or 500
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+def tickers_weight(symbols):
+    """Binance /ticker/24hr weight by symbol count (None = whole market)"""
+    if symbols is None:
+        return 80
+    count = len(symbols)
+    if count <= 20:
+        return 2
+    if count <= 100:
+        return 40
+    return 80
+
+def request_weight(method, *args, **kwargs):
+    """Local weight model for the ccxt methods the scanner uses"""
+    if method == 'fetch_ohlcv':
+        limit = kwargs.get('limit', args[3] if len(args) > 3 else None)
+        return kline_weight(limit)
+    if method == 'fetch_tickers':
+        return tickers_weight(args[0] if args else kwargs.get('symbols'))
+    if method == 'fetch_ticker':
+        return 2
+    if method == 'load_markets':
+        return 20
+    return 1
+
+def _header(headers, name):
+    if not headers:
+        return None
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+class _LoopState:
+    """A governor's asyncio side for one event loop"""
+
+    def __init__(self, max_concurrent):
+        self.waiters = []                   # (priority, seq, weight, future)
+        self.wakeup = None
+        self.in_flight = {}                 # coalescing key -> _Flight
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+
+class _Flight:
+    """One in-flight request and how many callers still wait for it"""
+
+    def __init__(self, task):
+        self.task = task
+        self.callers = 0
+
+class RateGovernor:
+    """Token bucket over request weight with priorities, coalescing and backoff"""
+
+    def __init__(self, weight_limit=6000, safety=0.8, max_concurrent=8, max_retries=4):
+        self.weight_limit = weight_limit
+        self.capacity = weight_limit * safety
+        self.refill_rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.max_retries = max_retries
+        self.max_concurrent = max_concurrent
+
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()       # Bucket state is shared by every loop's dispatcher
+        self._seq = itertools.count()
+        self._loops = weakref.WeakKeyDictionary()   # event loop -> _LoopState
+
+        self.stats = {
+            'requests': 0, 'weight': 0, 'coalesced': 0, 'retries': 0,
+            'rate_limited': 0, 'server_used_weight': None
+        }
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loops.get(loop)
+            if state is None:
+                state = self._loops[loop] = _LoopState(self.max_concurrent)
+        return state
+
+    # ---------------------------------------------------------------- bucket
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    def observe_headers(self, headers):
+        """Sync the bucket with the weight the server says we used this minute"""
+        used = _header(headers, 'x-mbx-used-weight-1m')
+        if used is None:
+            return
+        try:
+            used = int(used)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self.stats['server_used_weight'] = used
+            self._refill()
+            # The server's count includes other processes on this IP - trust it when it is stricter
+            self.tokens = min(self.tokens, self.capacity - used)
+
+    def pause(self, seconds):
+        """Stop issuing requests (Retry-After / ban)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        logger.warning(f"🚦 RATE GOVERNOR: paused for {seconds:.0f}s")
+
+    async def acquire(self, weight, priority=PRIORITY_NORMAL):
+        """Wait until ``weight`` tokens are available, higher priority first"""
+        weight = min(weight, self.capacity)
+        state = self._state()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(state.waiters, (priority, next(self._seq), weight, future))
+        if state.wakeup is None or state.wakeup.done():
+            state.wakeup = asyncio.ensure_future(self._dispatch(state))
+        await future
+
+    async def _dispatch(self, state):
+        waiters = state.waiters
+        while waiters:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            priority, seq, weight, future = waiters[0]
+            if future.cancelled():
+                heapq.heappop(waiters)
+                continue
+
+            with self._lock:
+                self._refill()
+                granted = self.tokens >= weight
+                if granted:
+                    self.tokens -= weight
+                missing = weight - self.tokens
+            if granted:
+                heapq.heappop(waiters)
+                future.set_result(None)
+                continue
+            # Head-of-line waits: lower priorities never jump a starving higher one
+            await asyncio.sleep(missing / self.refill_rate)
+
+    # ------------------------------------------------------------------ calls
+
+    async def call(self, fn, *args, priority=PRIORITY_NORMAL, weight=None, exchange=None, **kwargs):
+        """
+        Run a (blocking) ccxt call under the governor
+
+        Identical calls (same method and arguments) that are already in flight
+        are coalesced into one request. Cancelling a caller only cancels that
+        caller; the request itself is cancelled once no caller waits for it.
+        """
+        name = getattr(fn, '__name__', str(fn))
+        owner = id(getattr(fn, '__self__', None))
+        key = (owner, name, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            key = (owner, name, repr(args), repr(sorted(kwargs.items())))
+
+        in_flight = self._state().in_flight
+        flight = in_flight.get(key)
+        if flight is not None:
+            self.stats['coalesced'] += 1
+        else:
+            task = asyncio.ensure_future(
+                self._call_with_retries(fn, args, kwargs, name, priority, weight, exchange))
+            flight = in_flight[key] = _Flight(task)
+            task.add_done_callback(lambda done: self._landed(in_flight, key, flight, done))
+
+        flight.callers += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.callers -= 1
+            if not flight.callers and not flight.task.done():
+                # Every caller was cancelled: later identical calls start afresh
+                self._landed(in_flight, key, flight, None)
+                flight.task.cancel()
+
+    @staticmethod
+    def _landed(in_flight, key, flight, task):
+        if in_flight.get(key) is flight:
+            del in_flight[key]
+        if task is not None and not task.cancelled():
+            task.exception()                # Mark retrieved when every caller was cancelled
+
+    async def _call_with_retries(self, fn, args, kwargs, name, priority, weight, exchange):
+        import ccxt
+
+        exchange = exchange or getattr(fn, '__self__', None)
+        weight = weight if weight is not None else request_weight(name, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        state = self._state()
+        backoff = 1.0
+
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(weight, priority)
+            captured = {}
+
+            def request():
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    # Read in the worker thread: the next call on this exchange replaces them
+                    captured['headers'] = getattr(exchange, 'last_response_headers', None)
+
+            try:
+                async with state.semaphore:
+                    self.stats['requests'] += 1
+                    self.stats['weight'] += weight
+                    result = await loop.run_in_executor(None, request)
+                self.observe_headers(captured.get('headers'))
+                return result
+
+            except (ccxt.RateLimitExceeded, ccxt.DDoSProtection) as e:
+                self.stats['rate_limited'] += 1
+                headers = captured.get('headers')
+                retry_after = _header(headers, 'retry-after')
+                self.observe_headers(headers)
+                self.pause(float(retry_after) if retry_after else backoff * 5)
+                error = e
+            except (ccxt.NetworkError, ccxt.ExchangeNotAvailable) as e:
+                error = e
+
+            if attempt == self.max_retries:
+                raise error
+            self.stats['retries'] += 1
+            delay = backoff + random.uniform(0, backoff)
+            logger.warning(f"🚦 RATE GOVERNOR: {name} failed ({error}), retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, 30)
+
+    def status(self):
+        with self._lock:
+            self._refill()
+            states = list(self._loops.values())
+        return dict(self.stats, tokens=round(self.tokens), capacity=self.capacity,
+                    waiting=sum(len(state.waiters) for state in states))
+
+_shared_governors = {}
+
+def get_shared_governor(api='spot'):
+    """Process-wide governor per Binance API ('spot' or 'futures')"""
+    governor = _shared_governors.get(api)
+    if governor is None:
+        governor = _shared_governors[api] = RateGovernor(WEIGHT_LIMITS.get(api, 6000))
+    return governor
@@ -1,30 +1,57 @@
 import asyncio
 import websockets
 import json
-import ccxt
-import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
 import logging
 from concurrent.futures import ThreadPoolExecutor
 import time
 import traceback
-from collections import defaultdict
 import threading
+import os
+
+import kline_stream
+from kline_stream import KlineStreamIngestor
+from fvg_metrics import classify_memory_tier
+from subscriptions import Subscription, SubscriptionIndex, normalize_symbol
+from touch_index import TouchIndex
+from alerts import AlertEngine, AlertRule
+from fvg_store import FVGStore
+from fill_stats import FillStats
+from screener import MAX_LIMIT as SCREENER_MAX_LIMIT
+from candle_series import CandleSeries
+from ohlcv_history import OHLCVHistory, PAGE_LIMIT
+from detection_pool import (DetectionPool, detect_active_fvg_arrays, detections_to_arrays, expand_detections,
+                            mitigate_fvg_arrays, prefilter_fvg_arrays)
+from rate_governor import PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW, get_shared_governor
+from scheduler import CandleCloseScheduler, progressive_order
+from adaptive_refresh import AdaptiveRefreshPlanner, TICKER_BATCH_SIZE, best_tier, candle_close_weight
+from tiered_cache import CacheManager
+import snapshot
+from candle_ring import CandleRings, shared_candles_enabled
+from message_bus import BusReply, BusSink, CONTROL_CHANNEL
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Settings applied after detection: changing one re-derives every series from the raw detection cache
+OUTPUT_SETTINGS = ('proximity_filter', 'min_block_fvgs')
+
 class FVGScanner:
     def __init__(self):
-        self.exchange = ccxt.binance()
+        # ccxt (and pandas) load on first use so a warm start does not wait for them
+        self._exchange = None
+        self._governor = None
         self.clients = set()
+        self.subscriptions = SubscriptionIndex()
         self.is_scanning = False
-        self.pairs_data = {}
-        self.fvg_cache = defaultdict(dict)
-        self.block_cache = defaultdict(list)
-        self.current_prices = {}
+        
+        # Bounded working caches under one memory ceiling (far-away / low-tier series evicted first);
+        # the FVG store is the live state and is never evicted, so nothing depends on a cache hit
+        self.caches = CacheManager()
+        self.fvg_cache = self.caches.cache('fvg_cache')              # (symbol, timeframe) -> raw detections
+        self.block_cache = self.caches.cache('block_cache')          # (symbol, timeframe) -> blocks
+        self.current_prices = self.caches.cache('current_prices', ttl=900)
         self.scan_stats = {
             'total_pairs': 0,
             'scanned_pairs': 0,
@@ -32,16 +59,100 @@ class FVGScanner:
             'bullish_fvgs': 0,
             'bearish_fvgs': 0,
             'institutional_blocks': 0,
-            'touched_fvgs': 0
+            'touched_fvgs': 0,
+            'pruned_fvgs': 0          # Rejected by the ATR prefilter before processing
         }
         
         # Pine Script settings
         self.pine_settings = {
             'proximity_filter': 1.0,  # Default 1.0% like Pine Script
-            'lookback': 500,          # Pine Script lookback
+            'lookback': 500,          # Pine Script lookback (candles per series)
+            'timeframe_lookback': {'1d': 2000, '1w': 1000},  # Deeper per timeframe: years of history, paged
             'min_block_fvgs': 2,      # Minimum FVGs for block
-            'timeframes': ['1m', '5m', '15m', '1h', '4h', '12h', '1d', '1w']
+            'mitigation': True,       # Drop gaps price has traded through (Pine deletes those boxes)
+            'changelvl': True,        # Pine "Move box levels with price touch"
+            'atr_period': 14,         # Rolling ATR window of the noise prefilter
+            'min_gap_atr': 0.0,       # Prune gaps smaller than this x ATR before processing (0 = off)
+            'timeframe_min_gap_atr': {'1m': 0.3, '5m': 0.2},  # Per-timeframe override: low timeframes are mostly noise
+            'timeframes': ['1m', '5m', '15m', '1h', '4h', '12h', '1d', '1w'],
+            'candle_close_schedule': True,  # Poll mode: rescan a series only after its candle closes
+            'request_budget': 1200,         # Exchange weight per minute for scheduled rescans + price refresh
+            'max_pairs': 50,                # Most liquid USDT pairs to scan (ranked by 24h quote volume)
+            'progressive_scan': True,       # First pass: liquid symbols and fast timeframes first
+            'ingestion_mode': os.environ.get('FVG_INGESTION_MODE', 'poll')  # 'poll' (REST rescans) or 'stream' (live klines)
         }
+        
+        # Live kline ingestion state (ingestion_mode == 'stream')
+        self.candle_buffers = {}
+        self.stream_ingestor = None
+        self.stream_url = os.environ.get('FVG_KLINE_STREAM_URL')
+        
+        # Candle-close rescan queue (poll mode) with bulk price refresh in between
+        self.scheduler = None
+        self.scan_batch_size = 8        # Series per scheduler pass, so stats / prices interleave with the first pass
+        self.refresh_planner = None
+        self.active_pairs = []
+        self.price_refresh_interval = 15
+        self.replan_interval = 60
+        
+        # Lookbacks beyond one request are paged backward and kept on disk
+        self.history = OHLCVHistory()
+        
+        # Detection runs in worker processes so CPU cycles do not stall client I/O
+        self.detection_pool = DetectionPool()
+        
+        # Several server workers: one writer scans into shared memory, the others follow it
+        self.candle_rings = CandleRings() if shared_candles_enabled() else None
+        
+        # Sorted FVG bounds per symbol for tick-rate touch / proximity evaluation
+        self.touch_index = TouchIndex(self.pine_settings['proximity_filter'])
+        
+        # Indexed FVG state behind the REST query API
+        self.store = FVGStore()
+        
+        # Time-to-touch / time-to-fill statistics fed by gap lifecycles, attached to records
+        self.fill_stats = FillStats()
+        self._fill_stats_sent = 0
+        
+        # Server-side alerts, delivered on their own channel
+        self.alert_engine = AlertEngine()
+        self.alert_clients = set()
+        
+        # Universe-wide top-K screens (FVGStore.screener) pushed to clients when their ranking changes
+        self.screener_clients = {}      # client -> (rank, limit)
+        self._screener_sent = {}        # client -> (id, score) signature of the last screen sent
+        self._published_ids = {}
+        self._published_blocks = {}
+        
+        # Sharded mode: coordinator links receive series snapshots (worker side);
+        # the coordinator object fans control messages out to workers (coordinator side)
+        self.shard_sinks = set()
+        self.coordinator = None
+        
+        # Message bus: gateways (gateway.py) fan out to clients, control comes back on the bus
+        self.bus = None
+        self._bus_control = None
+
+    @property
+    def exchange(self):
+        if self._exchange is None:
+            import ccxt
+            self._exchange = ccxt.binance()
+            # Every REST call goes through the weight-aware governor instead of ccxt's fixed delay
+            self._exchange.enableRateLimit = False
+        return self._exchange
+
+    @property
+    def governor(self):
+        if self._governor is None:
+            self._governor = get_shared_governor(
+                'futures' if self.exchange.options.get('defaultType') in ('future', 'swap') else 'spot'
+            )
+        return self._governor
+
+    def governor_for(self, symbol):
+        """Governor of the API serving a symbol: unified swap symbols ('1000PEPE/USDT:USDT') are futures"""
+        return get_shared_governor('futures') if ':' in symbol else self.governor
 
     def calculate_distance_percentage(self, current_price, fvg_low, fvg_high):
         """Calculate exact distance percentage like Pine Script"""
@@ -164,17 +275,39 @@ class FVGScanner:
         
         return f"{emoji} {fvg_type} BLOCK {timeframe} ({strength_label})"
 
-    def get_ohlcv_data(self, symbol, timeframe, limit=500):
-        """Fetch OHLCV data for FVG detection"""
+    def ohlcv_to_frame(self, ohlcv):
+        """Build the detection DataFrame from a CandleSeries or raw exchange OHLCV rows"""
+        import pandas as pd
+        df = CandleSeries.coerce(ohlcv).to_frame()
+        df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
+        return df
+
+    def lookback_for(self, timeframe):
+        """Candles to analyze for a timeframe (timeframe_lookback, else lookback)"""
+        overrides = self.pine_settings.get('timeframe_lookback') or {}
+        return int(overrides.get(timeframe, self.pine_settings['lookback']))
+
+    async def get_ohlcv_rows(self, symbol, timeframe, limit=None):
+        """Fetch OHLCV candles for FVG detection (columnar CandleSeries, no DataFrame)"""
+        limit = limit or self.lookback_for(timeframe)
         try:
-            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
-            return df
+            if limit > PAGE_LIMIT:
+                async def fetch_page(since, page_limit):
+                    return await self.governor_for(symbol).call(
+                        self.exchange.fetch_ohlcv, symbol, timeframe, since=since, limit=page_limit
+                    )
+                return await self.history.fetch(fetch_page, symbol, timeframe, limit)
+            ohlcv = await self.governor_for(symbol).call(self.exchange.fetch_ohlcv, symbol, timeframe, limit=limit)
+            return CandleSeries.from_ohlcv(ohlcv)
         except Exception as e:
             logger.error(f"Error fetching data for {symbol} {timeframe}: {e}")
             return None
 
+    async def get_ohlcv_data(self, symbol, timeframe, limit=None):
+        """Fetch OHLCV data for FVG detection"""
+        ohlcv = await self.get_ohlcv_rows(symbol, timeframe, limit)
+        return self.ohlcv_to_frame(ohlcv) if ohlcv is not None else None
+
     def detect_fvgs(self, df):
         """Detect FVGs using Pine Script logic"""
         if df is None or len(df) < 3:
@@ -221,14 +354,36 @@ class FVGScanner:
         
         return fvgs
 
+    def detection_options(self, timeframe):
+        """Vectorized detection stages configured by pine_settings (see detection_pool)"""
+        overrides = self.pine_settings.get('timeframe_min_gap_atr') or {}
+        return {
+            'mitigation': self.pine_settings['mitigation'],
+            'changelvl': self.pine_settings['changelvl'],
+            'min_gap_atr': float(overrides.get(timeframe, self.pine_settings['min_gap_atr'])),
+            'atr_period': int(self.pine_settings['atr_period'])
+        }
+
+    def active_fvgs(self, fvgs, ohlcv, timeframe):
+        """Drop sub-ATR noise gaps, then keep the ones still open after the candles that followed them"""
+        options = self.detection_options(timeframe)
+        if not fvgs or not (options['min_gap_atr'] or options['mitigation']):
+            return fvgs
+        arrays, pruned = prefilter_fvg_arrays(ohlcv, detections_to_arrays(fvgs), options['min_gap_atr'],
+                                              options['atr_period'])
+        self.scan_stats['pruned_fvgs'] += pruned
+        if options['mitigation']:
+            arrays = mitigate_fvg_arrays(ohlcv, arrays, options['changelvl'])
+        return expand_detections(arrays)
+
     def process_fvg_with_pine_logic(self, symbol, timeframe, fvg, current_price):
         """Process FVG with complete Pine Script logic"""
         # Calculate distance and proximity
         distance = self.calculate_distance_percentage(current_price, fvg['gap_low'], fvg['gap_high'])
-        is_within_proximity = distance <= self.pine_settings['proximity_filter']
+        is_within_proximity = bool(distance <= self.pine_settings['proximity_filter'])
         
-        # Check if touched
-        is_touched = self.is_fvg_touched(current_price, fvg['gap_low'], fvg['gap_high'])
+        # Check if touched (bool(): numpy comparisons are not JSON serializable)
+        is_touched = bool(self.is_fvg_touched(current_price, fvg['gap_low'], fvg['gap_high']))
         
         # Calculate strength and power score
         strength = self.calculate_fvg_strength(fvg['gap_size'], fvg['volume_strength'], timeframe)
@@ -239,6 +394,7 @@ class FVGScanner:
         
         # Format data for frontend
         enhanced_fvg = {
+            'fvg_id': fvg.get('fvg_id') or self.fvg_key(symbol, timeframe, fvg),
             'pair': symbol,
             'tf': timeframe,
             'type': 'fvg_data',  # Frontend will map to fvg_type
@@ -246,9 +402,11 @@ class FVGScanner:
             'gap_low': fvg['gap_low'],
             'gap_high': fvg['gap_high'],
             'gap_size': fvg['gap_size'],
+            'current_price': current_price,
             'distance_percentage': round(distance, 2),
             'is_within_proximity': is_within_proximity,
             'is_touched': is_touched,
+            'memory_tier': classify_memory_tier(distance, is_touched),
             'volume_strength': int(fvg['volume_strength']),
             'unfilled_orders': unfilled_orders,
             'unfilled_orders_formatted': self.format_orders(unfilled_orders),
@@ -257,11 +415,19 @@ class FVGScanner:
             'timestamp': fvg['timestamp'].isoformat() if hasattr(fvg['timestamp'], 'isoformat') else str(fvg['timestamp']),
             'is_block_member': False,  # Will be updated by block detection
             'block_badge': '',
-            'block_id': None
+            'block_id': None,
+            'fill_stats': self.fill_stats.summary(symbol, timeframe, fvg['fvg_type'],
+                                                  fvg['gap_low'], fvg['gap_high'])
         }
         
         return enhanced_fvg
 
+    def fvg_key(self, symbol, timeframe, fvg):
+        """Stable identity of a gap across rescans"""
+        timestamp = fvg['timestamp']
+        timestamp = timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp)
+        return f"{symbol}|{timeframe}|{fvg['fvg_type']}|{timestamp}"
+
     def format_orders(self, orders):
         """Format order numbers like 1.2M, 5.4K, etc."""
         if orders >= 1_000_000:
@@ -271,53 +437,128 @@ class FVGScanner:
         else:
             return str(int(orders))
 
-    async def scan_symbol_timeframe(self, symbol, timeframe):
+    async def scan_symbol_timeframe(self, symbol, timeframe, current_price=None):
         """Scan a specific symbol and timeframe for FVGs"""
         try:
-            # Get current price
-            ticker = self.exchange.fetch_ticker(symbol)
-            current_price = ticker['last']
-            self.current_prices[symbol] = current_price
+            # Get current price (unless the caller already has a fresh one)
+            if current_price is None:
+                ticker = await self.governor_for(symbol).call(self.exchange.fetch_ticker, symbol)
+                current_price = ticker['last']
+                self.cache_price(symbol, current_price)
             
             # Get OHLCV data
-            df = self.get_ohlcv_data(symbol, timeframe)
-            if df is None:
+            ohlcv = await self.get_ohlcv_rows(symbol, timeframe)
+            if ohlcv is None:
                 return []
             
-            # Detect FVGs
-            fvgs = self.detect_fvgs(df)
-            
-            # Process each FVG with Pine Script logic
-            processed_fvgs = []
-            for fvg in fvgs:
-                enhanced_fvg = self.process_fvg_with_pine_logic(symbol, timeframe, fvg, current_price)
-                
-                # Only include FVGs within proximity filter (like Pine Script)
-                if enhanced_fvg['is_within_proximity']:
-                    processed_fvgs.append(enhanced_fvg)
-            
-            # Detect institutional blocks
-            blocks = self.detect_institutional_blocks(symbol, timeframe, processed_fvgs)
-            
-            # Mark FVGs that are part of blocks
-            for block in blocks:
-                for fvg in block['fvgs']:
-                    for processed_fvg in processed_fvgs:
-                        if (processed_fvg['gap_low'] == fvg['gap_low'] and 
-                            processed_fvg['gap_high'] == fvg['gap_high']):
-                            processed_fvg['is_block_member'] = True
-                            processed_fvg['block_badge'] = block['badge']
-                            processed_fvg['block_id'] = block['block_id']
-            
-            # Update statistics
-            self.update_scan_stats(processed_fvgs, blocks)
-            
-            return processed_fvgs
+            fvgs = await self.process_candles(symbol, timeframe, ohlcv, current_price)
+            await self.publish_series_events(symbol, timeframe, fvgs, current_price)
+            return fvgs
             
         except Exception as e:
             logger.error(f"Error scanning {symbol} {timeframe}: {e}")
             return []
 
+    async def process_candles(self, symbol, timeframe, ohlcv, current_price):
+        """Detect live FVGs on raw OHLCV rows (process pool when enabled) and run the pipeline"""
+        fvgs = None
+        options = self.detection_options(timeframe)
+        if self.detection_pool.enabled:
+            try:
+                fvgs, pruned = await self.detection_pool.detect(ohlcv, **options)
+            except Exception as e:
+                logger.error(f"Detection pool failed for {symbol} {timeframe}, detecting in-process: {e}")
+        if fvgs is None:
+            arrays, pruned = detect_active_fvg_arrays(ohlcv, **options)
+            fvgs = expand_detections(arrays)
+        self.scan_stats['pruned_fvgs'] += pruned
+        if self.candle_rings is not None and self.candle_rings.is_writer:
+            self.candle_rings.publish_series(symbol, timeframe, ohlcv, detections_to_arrays(fvgs), current_price)
+        return self.apply_detections(symbol, timeframe, fvgs, current_price)
+
+    def process_series(self, symbol, timeframe, df, current_price):
+        """Detect FVGs on a candle series and run the Pine Script pipeline"""
+        ohlcv = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']].to_numpy(dtype='float64')
+        fvgs = self.active_fvgs(self.detect_fvgs(df), ohlcv, timeframe)
+        return self.apply_detections(symbol, timeframe, fvgs, current_price)
+
+    def apply_detections(self, symbol, timeframe, fvgs, current_price):
+        """Identify raw detections, refresh the touch index and build the output"""
+        for fvg in fvgs:
+            fvg['fvg_id'] = self.fvg_key(symbol, timeframe, fvg)
+            fvg['timeframe'] = timeframe
+        self.fill_stats.observe_series(symbol, timeframe, fvgs, mitigation=self.pine_settings['mitigation'],
+                                       lookback=self.lookback_for(timeframe))
+        
+        output = self.build_series_output(symbol, timeframe, fvgs, current_price)
+        
+        # Keep raw detections so a settings change can re-derive the output without refetching
+        self.fvg_cache.set((symbol, timeframe), fvgs, self.series_tier(symbol, timeframe))
+        self.rebuild_touch_index(symbol)
+        
+        return output
+
+    def rebuild_touch_index(self, symbol):
+        """Index every stored gap of a symbol (from the store: cache evictions must not hide gaps)"""
+        return self.touch_index.rebuild_symbol(symbol, [
+            record for timeframe in self.pine_settings['timeframes']
+            for record in self.store.series_records(symbol, timeframe)
+        ])
+
+    def series_tier(self, symbol, timeframe):
+        """Most urgent memory tier of a series' active FVGs (cache retention)"""
+        return best_tier(self.store.series_tiers(symbol, timeframe))
+
+    def cache_price(self, symbol, price):
+        tier = self.refresh_planner.tiers.get(symbol) if self.refresh_planner is not None else None
+        self.current_prices.set(symbol, price, tier)
+        if self.candle_rings is not None and self.candle_rings.is_writer:
+            self.candle_rings.publish_price(symbol, price)
+
+    def retier_caches(self, symbol_tiers):
+        """Follow tier changes from price moves so retention tracks distance to price"""
+        for symbol, tier in symbol_tiers.items():
+            self.current_prices.set_tier(symbol, tier)
+            for timeframe in self.pine_settings['timeframes']:
+                series_tier = self.series_tier(symbol, timeframe)
+                self.fvg_cache.set_tier((symbol, timeframe), series_tier)
+                self.block_cache.set_tier((symbol, timeframe), series_tier)
+
+    def build_series_output(self, symbol, timeframe, fvgs, current_price, update_stats=True, update_store=True):
+        """Proximity filter, block detection and stats for raw detections"""
+        # Process each FVG with Pine Script logic
+        all_fvgs = []
+        processed_fvgs = []
+        for fvg in fvgs:
+            enhanced_fvg = self.process_fvg_with_pine_logic(symbol, timeframe, fvg, current_price)
+            all_fvgs.append(enhanced_fvg)
+            
+            # Only include FVGs within proximity filter (like Pine Script)
+            if enhanced_fvg['is_within_proximity']:
+                processed_fvgs.append(enhanced_fvg)
+        
+        # Detect institutional blocks
+        blocks = self.detect_institutional_blocks(symbol, timeframe, processed_fvgs)
+        
+        # Mark FVGs that are part of blocks
+        for block in blocks:
+            for fvg in block['fvgs']:
+                for processed_fvg in processed_fvgs:
+                    if (processed_fvg['gap_low'] == fvg['gap_low'] and 
+                        processed_fvg['gap_high'] == fvg['gap_high']):
+                        processed_fvg['is_block_member'] = True
+                        processed_fvg['block_badge'] = block['badge']
+                        processed_fvg['block_id'] = block['block_id']
+        
+        # Update statistics
+        if update_store:
+            self.store.replace_series(symbol, timeframe, all_fvgs, blocks)
+            self.block_cache.set((symbol, timeframe), blocks, self.series_tier(symbol, timeframe))
+        if update_stats:
+            self.update_scan_stats(processed_fvgs, blocks)
+        
+        return processed_fvgs
+
     def update_scan_stats(self, fvgs, blocks):
         """Update scanning statistics"""
         self.scan_stats['scanned_pairs'] += 1
@@ -334,23 +575,17 @@ class FVGScanner:
         
         self.scan_stats['institutional_blocks'] += len(blocks)
 
-    async def send_fvg_data(self, fvg_data):
-        """Send FVG data to all connected clients"""
-        if not self.clients:
+    async def send_to_clients(self, clients, message):
+        """Encode a message once and send it to the given clients"""
+        if not clients:
             return
         
-        message = {
-            'type': 'fvg_data',
-            'data': fvg_data,
-            'stats': self.scan_stats.copy(),
-            'timestamp': datetime.now().isoformat()
-        }
+        payload = json.dumps(message)
         
-        # Send to all clients
         disconnected_clients = set()
-        for client in self.clients.copy():
+        for client in list(clients):
             try:
-                await client.send(json.dumps(message))
+                await client.send(payload)
             except websockets.exceptions.ConnectionClosed:
                 disconnected_clients.add(client)
             except Exception as e:
@@ -358,28 +593,87 @@ class FVGScanner:
                 disconnected_clients.add(client)
         
         # Remove disconnected clients
-        self.clients -= disconnected_clients
+        for client in disconnected_clients:
+            self.remove_client(client)
+
+    def remove_client(self, client):
+        """Forget a client and its subscription"""
+        self.clients.discard(client)
+        self.alert_clients.discard(client)
+        self.alert_engine.remove_owner(client)
+        self.shard_sinks.discard(client)
+        self.screener_clients.pop(client, None)
+        self._screener_sent.pop(client, None)
+        self.subscriptions.remove_client(client)
+
+    async def send_fvg_data(self, fvg_data):
+        """Send FVG data to the clients subscribed to it"""
+        if not self.clients:
+            return
+        
+        # Routing index: only interested subscribers get (and cost) an encode/send
+        recipients = self.subscriptions.route(fvg_data)
+        if not recipients:
+            return
+        
+        message = {
+            'type': 'fvg_data',
+            'data': fvg_data,
+            'stats': self.scan_stats.copy(),
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        await self.send_to_clients(recipients, message)
+
+    async def select_active_pairs(self):
+        """USDT pairs with enough volume to be worth scanning, most liquid first"""
+        # Get trading pairs
+        markets = await self.governor.call(self.exchange.load_markets, priority=PRIORITY_LOW)
+        usdt_pairs = {symbol for symbol in markets.keys() if symbol.endswith('/USDT')}
+        
+        # Rank the whole universe by 24h quote volume from one bulk ticker request
+        try:
+            tickers = await self.governor.call(self.exchange.fetch_tickers, priority=PRIORITY_NORMAL)
+        except Exception as e:
+            logger.error(f"Error fetching tickers for pair selection: {e}")
+            return []
+        
+        ranked = sorted(
+            (ticker for symbol, ticker in tickers.items()
+             if symbol in usdt_pairs and (ticker.get('quoteVolume') or 0) > 1000000),  # Min $1M volume
+            key=lambda ticker: ticker['quoteVolume'], reverse=True
+        )
+        active_pairs = [ticker['symbol'] for ticker in ranked[:self.pine_settings['max_pairs']]]
+        
+        # The selection tickers double as the first prices: no per-series ticker on the first pass
+        for ticker in ranked[:self.pine_settings['max_pairs']]:
+            if ticker.get('last'):
+                self.cache_price(ticker['symbol'], ticker['last'])
+        
+        return active_pairs
+
+    def initial_scan_order(self, symbols):
+        """(symbol, timeframe) order of the first pass over newly scanned symbols"""
+        timeframes = self.pine_settings['timeframes']
+        if self.pine_settings.get('progressive_scan', True):
+            return progressive_order(symbols, timeframes)
+        return [(symbol, timeframe) for symbol in symbols for timeframe in timeframes]
 
     async def scan_markets(self):
         """Main scanning loop with Pine Script logic"""
         try:
-            # Get trading pairs
-            markets = self.exchange.load_markets()
-            usdt_pairs = [symbol for symbol in markets.keys() if symbol.endswith('/USDT')]
-            
-            # Filter for active pairs with good volume
-            active_pairs = []
-            for symbol in usdt_pairs[:50]:  # Limit for performance
-                try:
-                    ticker = self.exchange.fetch_ticker(symbol)
-                    if ticker['quoteVolume'] and ticker['quoteVolume'] > 1000000:  # Min $1M volume
-                        active_pairs.append(symbol)
-                except:
-                    continue
+            active_pairs = await self.select_active_pairs()
+            if not active_pairs and self.active_pairs:
+                logger.warning("Pair selection failed, scanning the restored universe")
+                active_pairs = list(self.active_pairs)
             
             self.scan_stats['total_pairs'] = len(active_pairs)
             logger.info(f"🚀 PINE SCRIPT SCANNER: Starting scan of {len(active_pairs)} pairs")
             
+            if self.pine_settings.get('candle_close_schedule', True):
+                await self.run_scheduled_scans(active_pairs)
+                return
+            
             # Scan each pair across all timeframes
             for symbol in active_pairs:
                 if not self.is_scanning:
@@ -411,6 +705,610 @@ class FVGScanner:
             logger.error(f"Error in scan_markets: {e}")
             traceback.print_exc()
 
+    async def run_scheduled_scans(self, active_pairs):
+        """Rescan each series when its candle closes; adaptive price refresh in between"""
+        self.active_pairs = list(active_pairs)
+        if self.candle_rings is not None and self.candle_rings.is_writer:
+            self.candle_rings.retain(self.active_pairs)
+        self.scheduler = CandleCloseScheduler()
+        for symbol, timeframe in self.initial_scan_order(self.active_pairs):
+            self.scheduler.add(symbol, timeframe)  # Due now: initial fetch
+        
+        self.refresh_planner = AdaptiveRefreshPlanner(request_budget=self.pine_settings['request_budget'])
+        self.refresh_planner.mark_refreshed(self.active_pairs)
+        last_plan = 0
+        started, first_series = time.time(), True
+        
+        while self.is_scanning:
+            due = self.scheduler.pop_due(max_items=self.scan_batch_size)
+            for symbol, timeframe in due:
+                if not self.is_scanning:
+                    break
+                if symbol not in self.active_pairs:
+                    continue  # Reassigned to another shard meanwhile
+                # A price refreshed recently by the planner saves a ticker request per series
+                refreshed = self.refresh_planner.last_refresh.get(symbol, 0)
+                fresh_price = time.time() - refreshed < self.price_refresh_interval
+                fvgs = await self.scan_symbol_timeframe(
+                    symbol, timeframe, self.current_prices.get(symbol) if fresh_price else None
+                )
+                for fvg in fvgs:
+                    await self.send_fvg_data(fvg)
+                self.scheduler.schedule_close(symbol, timeframe)
+                if first_series:
+                    first_series = False
+                    logger.info(f"⚡ SCHEDULER: first series ({symbol} {timeframe}) published "
+                                f"{time.time() - started:.1f}s after start")
+                await asyncio.sleep(0.2)
+            
+            if due:
+                await self.send_stats_update()
+                logger.info(f"⏱️ SCHEDULER: rescanned {len(due)} series, next close in "
+                            f"{self.scheduler.seconds_until_next() or 0:.0f}s")
+            
+            if time.time() - last_plan >= self.replan_interval:
+                self.plan_refresh_intervals(self.active_pairs)
+                last_plan = time.time()
+            
+            refresh = self.refresh_planner.due()
+            if refresh:
+                await self.refresh_prices(refresh)
+                self.refresh_planner.mark_refreshed(refresh)
+            
+            waits = [w for w in (self.scheduler.seconds_until_next(), self.refresh_planner.seconds_until_next())
+                     if w is not None]
+            wait = min(waits, default=self.price_refresh_interval)
+            # Work through a backlog of due series back to back; otherwise sleep until the next one
+            await asyncio.sleep(max(wait, 0.5) if wait > 0 or not due else 0)
+        
+        self.scheduler = None
+        logger.info("🎯 PINE SCRIPT SCANNER: Scheduled scanning stopped")
+
+    async def assign_pairs(self, pairs, start=True):
+        """Shard worker: replace the scanned pair set without restarting the scheduler"""
+        pairs = list(pairs)
+        for symbol in set(self.active_pairs) - set(pairs):
+            self.forget_symbol(symbol)
+        
+        added = [symbol for symbol in pairs if symbol not in self.active_pairs]
+        self.active_pairs = pairs
+        self.scan_stats['total_pairs'] = len(pairs)
+        if self.scheduler is not None:
+            for symbol, timeframe in self.initial_scan_order(added):
+                self.scheduler.add(symbol, timeframe)
+        
+        if start and not self.is_scanning and pairs:
+            self.is_scanning = True
+            asyncio.create_task(self.run_scheduled_scans(pairs))
+
+    def forget_symbol(self, symbol):
+        """Drop all state of a symbol that is no longer scanned here"""
+        if self.scheduler is not None:
+            self.scheduler.remove_symbol(symbol)
+        if self.candle_rings is not None and self.candle_rings.is_writer:
+            self.candle_rings.drop_symbol(symbol)
+        self.touch_index.remove_symbol(symbol)
+        self.store.remove_symbol(symbol)
+        self.fill_stats.forget_symbol(symbol)
+        for cache in (self.fvg_cache, self.block_cache):
+            for key in [k for k in cache.keys() if k[0] == symbol]:
+                cache.pop(key)
+        self.current_prices.pop(symbol)
+        for key in [k for k in self._published_ids if k[0] == symbol]:
+            self._published_ids.pop(key, None)
+            self._published_blocks.pop(key, None)
+
+    def forget_series(self, symbol, timeframe):
+        """Reader worker: the writer stopped publishing one series"""
+        if not any(key[0] == symbol for key in self.candle_rings.rings):
+            self.forget_symbol(symbol)
+            return
+        self.store.replace_series(symbol, timeframe, [], [])
+        self.fvg_cache.pop((symbol, timeframe))
+        self.block_cache.pop((symbol, timeframe))
+        self._published_ids.pop((symbol, timeframe), None)
+        self._published_blocks.pop((symbol, timeframe), None)
+        self.rebuild_touch_index(symbol)
+
+    def plan_refresh_intervals(self, symbols):
+        """Per-symbol refresh intervals from memory tiers and volatility, inside the budget"""
+        series = [(symbol, timeframe) for symbol in symbols for timeframe in self.pine_settings['timeframes']]
+        self.refresh_planner.request_budget = self.pine_settings['request_budget']
+        available = max(self.pine_settings['request_budget'] - candle_close_weight(series), 0)
+        symbol_tiers = {symbol: best_tier(self.store.symbol_tiers(symbol)) for symbol in symbols}
+        self.refresh_planner.plan(symbol_tiers, available_budget=available)
+        self.refresh_planner.log_plan()
+        self.retier_caches(symbol_tiers)
+
+    def is_priority_batch(self, symbols):
+        """A price batch containing a symbol with a gap at price jumps the request queue"""
+        if self.refresh_planner is None:
+            return False
+        return any(self.refresh_planner.tiers.get(symbol) == 'priority' for symbol in symbols)
+
+    async def refresh_prices(self, symbols):
+        """Batched ticker refresh; a touched gap pulls its series forward in the schedule"""
+        tickers = {}
+        # One batch serves one API: swap symbols are priced (and charged) on the futures side
+        by_governor = {}
+        for symbol in symbols:
+            by_governor.setdefault(self.governor_for(symbol), []).append(symbol)
+        for governor, group in by_governor.items():
+            for start in range(0, len(group), TICKER_BATCH_SIZE):
+                batch = group[start:start + TICKER_BATCH_SIZE]
+                try:
+                    priority = PRIORITY_HIGH if self.is_priority_batch(batch) else PRIORITY_NORMAL
+                    tickers.update(await governor.call(self.exchange.fetch_tickers, batch, priority=priority))
+                except Exception as e:
+                    logger.error(f"Error refreshing prices: {e}")
+        
+        for symbol in symbols:
+            price = (tickers.get(symbol) or {}).get('last')
+            if not price:
+                continue
+            self.cache_price(symbol, price)
+            if self.refresh_planner is not None:
+                self.refresh_planner.observe(symbol, price)
+            
+            transitions = self.touch_index.on_price(symbol, price)
+            if not transitions:
+                continue
+            states = await self.send_fvg_transitions(symbol, price, transitions)
+            await self.send_alerts(self.alert_engine.process(
+                [AlertEngine.transition_event(state) for state in states]
+            ))
+            if self.scheduler is not None:
+                for state in states:
+                    if state['transition'] == 'touched':
+                        self.scheduler.request_refresh(symbol, state['tf'])
+        
+        await self.send_screener_updates()
+
+    async def run_in_thread(self, fn, *args, **kwargs):
+        """Run a blocking (sync ccxt) call without stalling the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+
+    def stream_config(self):
+        """Stream endpoint and price stream matching the REST market type"""
+        if self.exchange.options.get('defaultType') in ('future', 'swap'):
+            base_url, price_stream = kline_stream.FUTURES_STREAM_URL, kline_stream.FUTURES_PRICE_STREAM
+        else:
+            base_url, price_stream = kline_stream.SPOT_STREAM_URL, kline_stream.SPOT_PRICE_STREAM
+        return self.stream_url or base_url, price_stream
+
+    def merge_candle(self, symbol, timeframe, candle):
+        """Insert or replace a candle in the series buffer (by open time)"""
+        buffer = self.candle_buffers.setdefault((symbol, timeframe), CandleSeries())
+        last = buffer.last_timestamp
+        if last == candle[0]:
+            buffer.set_last(candle)
+        elif last is None or candle[0] > last:
+            buffer.append(candle)
+        else:
+            return  # Older than what we hold - REST already has it
+        
+        lookback = self.lookback_for(timeframe)
+        if len(buffer) > lookback:
+            self.candle_buffers[(symbol, timeframe)] = buffer[-lookback:]   # View; appends compact it once the buffer is full
+
+    async def repair_series(self, symbol, timeframe):
+        """REST backfill (empty buffer) or gap repair (after a reconnect)"""
+        buffer = self.candle_buffers.get((symbol, timeframe))
+        since = buffer[-1][0] if buffer else None
+        
+        if since is None:
+            ohlcv = await self.get_ohlcv_rows(symbol, timeframe)   # Backfill the whole lookback (paged if deep)
+            if ohlcv is None:
+                return []
+        else:
+            try:
+                ohlcv = await self.governor_for(symbol).call(
+                    self.exchange.fetch_ohlcv, symbol, timeframe, since=since, limit=PAGE_LIMIT
+                )
+            except Exception as e:
+                logger.error(f"Error repairing {symbol} {timeframe}: {e}")
+                return []
+        
+        for candle in ohlcv:
+            self.merge_candle(symbol, timeframe, candle)
+        
+        buffer = self.candle_buffers.get((symbol, timeframe))
+        if not buffer:
+            return []
+        
+        current_price = self.current_prices.get(symbol, buffer[-1][4])
+        fvgs = await self.process_candles(symbol, timeframe, buffer, current_price)
+        await self.publish_series_events(symbol, timeframe, fvgs, current_price)
+        return fvgs
+
+    async def on_stream_candle_close(self, symbol, timeframe, candle):
+        """Candle-close event: re-detect on the buffered series and push results"""
+        self.merge_candle(symbol, timeframe, candle)
+        buffer = self.candle_buffers[(symbol, timeframe)]
+        current_price = self.current_prices.get(symbol, candle[4])
+        
+        fvgs = await self.process_candles(symbol, timeframe, buffer, current_price)
+        await self.publish_series_events(symbol, timeframe, fvgs, current_price)
+        for fvg in fvgs:
+            await self.send_fvg_data(fvg)
+        await self.send_stats_update()
+
+    async def on_stream_candle_update(self, symbol, timeframe, candle):
+        """Forming candle update: keep the buffer current, no detection"""
+        self.merge_candle(symbol, timeframe, candle)
+
+    async def on_stream_price(self, symbol, price):
+        """Price tick: binary-search the touch index and push state transitions"""
+        self.cache_price(symbol, price)
+        
+        transitions = self.touch_index.on_price(symbol, price)
+        if transitions:
+            states = await self.send_fvg_transitions(symbol, price, transitions)
+            await self.send_alerts(self.alert_engine.process(
+                [AlertEngine.transition_event(state) for state in states]
+            ))
+
+    async def publish_series_events(self, symbol, timeframe, fvgs, current_price):
+        """Diff a re-processed series, push touch transitions and evaluate alerts"""
+        key = (symbol, timeframe)
+        # The first pass over a series is the baseline, not a state change
+        has_baseline = key in self._published_ids
+        previous_ids = self._published_ids.get(key, set())
+        previous_blocks = self._published_blocks.get(key, set())
+        
+        events = [AlertEngine.fvg_event(fvg, has_baseline and fvg['fvg_id'] not in previous_ids) for fvg in fvgs]
+        self._published_ids[key] = {fvg['fvg_id'] for fvg in fvgs}
+        
+        block_keys = set()
+        for block in self.block_cache.get((symbol, timeframe), []):
+            block_key = tuple(sorted(fvg['fvg_id'] for fvg in block['fvgs']))
+            block_keys.add(block_key)
+            if has_baseline and block_key not in previous_blocks:
+                events.append(AlertEngine.block_event(block, block_key))
+        self._published_blocks[key] = block_keys
+        
+        if current_price:
+            transitions = self.touch_index.on_price(symbol, current_price)
+            states = await self.send_fvg_transitions(symbol, current_price, transitions)
+            events.extend(AlertEngine.transition_event(state) for state in states)
+        
+        await self.send_alerts(self.alert_engine.process(events))
+        
+        if self.shard_sinks:
+            await self.send_series_snapshot(symbol, timeframe)
+
+    async def send_series_snapshot(self, symbol, timeframe):
+        """Shard worker: full series state (all gaps + blocks) for the coordinator's store"""
+        key = (normalize_symbol(symbol), timeframe)
+        await self.send_to_clients(self.shard_sinks, {
+            'type': 'series_snapshot',
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'fvgs': [self.store.records[fvg_id] for fvg_id in self.store.series.get(key, ())],
+            'blocks': self.store.blocks.get(key, [])
+        })
+
+    async def send_series_snapshots(self):
+        """Shard worker: resend every series after (re)connecting to the coordinator"""
+        for symbol in self.active_pairs:
+            for timeframe in self.pine_settings['timeframes']:
+                if (normalize_symbol(symbol), timeframe) in self.store.series:
+                    await self.send_series_snapshot(symbol, timeframe)
+
+    async def send_alerts(self, alerts):
+        """Deliver alerts on the separate low-volume alert channel"""
+        for owner, alert in alerts:
+            if owner is None:
+                recipients = self.alert_clients
+            elif owner in self.alert_clients or isinstance(owner, BusReply):
+                recipients = [owner]    # A client's own rule (gateways check their alert subscriptions)
+            else:
+                continue
+            await self.send_to_clients(recipients, {
+                'type': 'alert',
+                'alert': alert,
+                'timestamp': datetime.now().isoformat()
+            })
+
+    async def send_fvg_transitions(self, symbol, price, transitions):
+        """Send touch / proximity transitions as lightweight fvg_state messages"""
+        states = []
+        for fvg, transition, distance in transitions:
+            if transition == 'touched':
+                self.fill_stats.record_touch(fvg['fvg_id'])
+            state = {
+                'fvg_id': fvg['fvg_id'],
+                'pair': symbol,
+                'tf': fvg['tf'],
+                'fvg_type': fvg['fvg_type'],
+                'gap_low': fvg['gap_low'],
+                'gap_high': fvg['gap_high'],
+                'transition': transition,
+                'current_price': price,
+                'distance_percentage': distance,
+                'is_within_proximity': transition != 'left',
+                'is_touched': transition == 'touched',
+                'memory_tier': classify_memory_tier(distance, transition == 'touched')
+            }
+            
+            await self.broadcast_fvg_state(state)
+            states.append(state)
+        return states
+
+    async def broadcast_fvg_state(self, state):
+        """Apply a state transition to the store and send it to subscribed clients"""
+        self.store.apply_state(state)
+        
+        # A client filtering on distance still needs to hear that a gap left its range
+        recipients = self.subscriptions.route(state, ignore_distance=(state['transition'] == 'left'))
+        await self.send_to_clients(recipients, {
+            'type': 'fvg_state',
+            'data': state,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    async def on_stream_reconnect(self, series):
+        """Gap repair for every series on a reconnected stream"""
+        logger.info(f"🔄 KLINE STREAM: repairing {len(series)} series after reconnect")
+        for symbol, timeframe in series:
+            for fvg in await self.repair_series(symbol, timeframe):
+                await self.send_fvg_data(fvg)
+
+    async def run_stream_ingestion(self):
+        """Live ingestion: REST backfill once, then kline/price streams drive updates"""
+        try:
+            active_pairs = await self.select_active_pairs()
+            timeframes = list(self.pine_settings['timeframes'])
+            self.scan_stats['total_pairs'] = len(active_pairs)
+            if self.candle_rings is not None and self.candle_rings.is_writer:
+                self.candle_rings.retain(active_pairs)
+            logger.info(f"📡 STREAM MODE: backfilling {len(active_pairs)} pairs x {len(timeframes)} timeframes")
+            
+            for symbol in active_pairs:
+                for timeframe in timeframes:
+                    if not self.is_scanning:
+                        return
+                    for fvg in await self.repair_series(symbol, timeframe):
+                        await self.send_fvg_data(fvg)
+                await self.send_stats_update()
+            
+            base_url, price_stream = self.stream_config()
+            self.stream_ingestor = KlineStreamIngestor(
+                active_pairs,
+                timeframes,
+                on_candle_close=self.on_stream_candle_close,
+                on_price=self.on_stream_price,
+                on_candle_update=self.on_stream_candle_update,
+                on_reconnect=self.on_stream_reconnect,
+                base_url=base_url,
+                price_stream=price_stream
+            )
+            await self.stream_ingestor.run()
+            
+        except Exception as e:
+            logger.error(f"Error in stream ingestion: {e}")
+            traceback.print_exc()
+        finally:
+            self.stream_ingestor = None
+
+    async def attach_bus(self, bus):
+        """Publish every client message on the bus and take scan control from gateways"""
+        self.bus = bus
+        sink = BusSink(bus)
+        # Registered like a client with the full stream, so every send path reaches the bus unchanged
+        self.clients.add(sink)
+        self.subscriptions.add_client(sink)
+        self.alert_clients.add(sink)
+        # Keep a reference: the event loop only holds tasks weakly
+        self._bus_control = asyncio.create_task(self.consume_bus_control(sink))
+        await sink.send(json.dumps({'type': 'settings_updated', 'settings': self.pine_settings.copy()}))
+        logger.info(f"📮 BUS: publishing scanner events via {type(bus).__name__}")
+
+    async def consume_bus_control(self, sink):
+        async for payload in self.bus.subscribe(CONTROL_CHANNEL):
+            try:
+                data = json.loads(payload)
+                # Replies go back tagged for the gateway client that asked
+                reply_to = data.pop('reply_to', None)
+                client = BusReply(sink, reply_to) if reply_to else sink
+                if data.get('type') == 'known_state':
+                    await self.send_known_state(client, Subscription.from_message(data.get('subscription') or {}))
+                else:
+                    await self.handle_client_message(data, client)
+            except Exception as e:
+                logger.error(f"Error handling bus control message: {e}")
+
+    def start_scan_task(self):
+        self.is_scanning = True
+        if self.pine_settings.get('ingestion_mode') == 'stream':
+            return asyncio.create_task(self.run_stream_ingestion())
+        return asyncio.create_task(self.scan_markets())
+
+    async def start_shared_candles(self):
+        """Multi-worker server: the elected writer scans right away, every other worker follows it"""
+        if self.candle_rings.elect():
+            logger.info(f"🧷 SHARED CANDLES: worker {os.getpid()} is the writer")
+            self.start_scan_task()
+        else:
+            logger.info(f"🧷 SHARED CANDLES: worker {os.getpid()} follows the writer")
+            self.is_scanning = True
+            asyncio.create_task(self.follow_shared_candles())
+
+    async def follow_shared_candles(self, interval=0.5):
+        """Reader worker: apply series / prices the writer published, serve them to our clients"""
+        while self.is_scanning:
+            if self.candle_rings.elect():
+                logger.warning(f"🧷 SHARED CANDLES: writer gone, worker {os.getpid()} takes over")
+                self.start_scan_task()
+                return
+            
+            try:
+                changes = self.candle_rings.poll()
+            except Exception as e:
+                logger.error(f"Error reading shared candles: {e}")
+                changes = []
+            
+            for symbol, timeframe, kind, candles, arrays, price in changes:
+                if kind == 'removed':
+                    self.forget_series(symbol, timeframe)
+                    continue
+                if kind == 'price' or not price:
+                    if price:
+                        await self.on_stream_price(symbol, price)
+                    continue
+                self.cache_price(symbol, price)
+                fvgs = self.apply_detections(symbol, timeframe, expand_detections(arrays), price)
+                await self.publish_series_events(symbol, timeframe, fvgs, price)
+                for fvg in fvgs:
+                    await self.send_fvg_data(fvg)
+            
+            if any(change[2] != 'price' for change in changes):
+                self.scan_stats['total_pairs'] = len({key[0] for key in self.candle_rings.rings})
+                await self.send_stats_update()
+            await asyncio.sleep(interval)
+
+    def known_fvgs(self, subscription):
+        """In-proximity gaps of the store a subscription asks for"""
+        return [
+            record for record in self.store.records.values()
+            if record.get('is_within_proximity') and subscription.accepts(record)
+        ]
+
+    async def send_known_state(self, websocket, subscription=None):
+        """Last known in-proximity gaps in one frame, so a new client is not empty until the next scan"""
+        if subscription is None:
+            subscription = self.subscriptions.subscriptions.get(websocket)
+        if subscription is None or not len(self.store):
+            return
+        fvgs = self.known_fvgs(subscription)
+        if fvgs:
+            await websocket.send(json.dumps({
+                'type': 'fvg_snapshot',
+                'data': fvgs,
+                'stats': self.scan_stats.copy(),
+                'timestamp': datetime.now().isoformat()
+            }, default=str))
+
+    async def refilter_cached_series(self):
+        """
+        Re-derive every cached series under the current settings (no fetch, no detection)
+        
+        Raw detections stay in fvg_cache, so a new proximity filter or block
+        size only reruns the settings-dependent stages; clients then get the
+        whole result as one fvg_refresh batch instead of waiting for a rescan.
+        Every stored series is re-derived: one evicted from the cache from its
+        store records, at the best price still known (see known_price).
+        """
+        started = time.perf_counter()
+        refreshed = []
+        for (_, timeframe), ids in list(self.store.series.items()):
+            records = [self.store.records[fvg_id] for fvg_id in ids]
+            symbol = records[0]['pair']
+            fvgs = self.fvg_cache.get((symbol, timeframe))
+            if fvgs is None:
+                # Records carry every field the settings-dependent stages read
+                fvgs = [dict(record, timeframe=timeframe) for record in records]
+            price = self.known_price(symbol, records)
+            if not price:
+                continue
+            self.build_series_output(symbol, timeframe, fvgs, price, update_stats=False)
+            refreshed.append((symbol, timeframe))
+        
+        for symbol, timeframe in refreshed:
+            if self.shard_sinks:
+                await self.send_series_snapshot(symbol, timeframe)
+        logger.info(f"⚙️ Re-filtered {len(refreshed)} cached series in {(time.perf_counter() - started) * 1000:.0f}ms")
+        await self.send_refreshed_state()
+        return len(refreshed)
+
+    def known_price(self, symbol, records=()):
+        """Latest price still known for a symbol: ticker cache, touch index, candle buffers, then stored records"""
+        price = self.current_prices.get(symbol)
+        if price:
+            return price
+        index = self.touch_index.symbols.get(symbol)
+        if index is not None and index.last_price:
+            return index.last_price
+        for timeframe in self.pine_settings['timeframes']:
+            buffer = self.candle_buffers.get((symbol, timeframe))
+            if buffer is not None and len(buffer):
+                return float(buffer.close[-1])
+        return next((record['current_price'] for record in records if record.get('current_price')), None)
+
+    async def send_refreshed_state(self):
+        """Every client's in-proximity gaps as one batch that replaces what it shows"""
+        timestamp = datetime.now().isoformat()
+        for client in list(self.clients):
+            subscription = self.subscriptions.subscriptions.get(client)
+            if subscription is None:
+                continue    # Alert-only client
+            message = {
+                'type': 'fvg_refresh',
+                'data': self.known_fvgs(subscription),
+                'stats': self.scan_stats.copy(),
+                'timestamp': timestamp
+            }
+            await self.send_to_clients([client], message)
+
+    def snapshot_state(self):
+        """Compact last known state: universe, prices and every series (records + block summaries)"""
+        prices = {symbol: self.current_prices.get(symbol) for symbol in self.current_prices.keys()}
+        return {
+            'universe': list(self.active_pairs),
+            'prices': {symbol: price for symbol, price in prices.items() if price},
+            'scan_stats': self.scan_stats.copy(),
+            'fill_stats': self.fill_stats.to_dict(include_open=True),
+            'series': [
+                {
+                    'symbol': symbol,
+                    'timeframe': timeframe,
+                    'fvgs': [self.store.records[fvg_id] for fvg_id in ids],
+                    'blocks': self.store.blocks.get((symbol, timeframe), [])
+                }
+                for (symbol, timeframe), ids in self.store.series.items()
+            ]
+        }
+
+    def save_snapshot(self, path=None):
+        try:
+            path = snapshot.write_snapshot(self.snapshot_state(), path)
+            logger.info(f"💾 SNAPSHOT: saved {len(self.store)} FVGs to {path}")
+        except Exception as e:
+            logger.error(f"Error saving snapshot: {e}")
+
+    def restore_snapshot(self, path=None):
+        """Load the last snapshot into the store, touch index and caches; True if one was used"""
+        state = snapshot.read_snapshot(path)
+        if state is None:
+            return False
+        
+        self.active_pairs = state.get('universe') or []
+        self.scan_stats.update(state.get('scan_stats') or {})
+        if state.get('fill_stats'):
+            self.fill_stats = FillStats.from_dict(state['fill_stats'])
+        for symbol, price in (state.get('prices') or {}).items():
+            self.current_prices.set(symbol, price)
+        
+        pairs = set()
+        for series in state.get('series', []):
+            timeframe, fvgs = series['timeframe'], series['fvgs']
+            self.store.replace_series(series['symbol'], timeframe, fvgs, series.get('blocks') or [])
+            if not fvgs:
+                continue
+            pairs.add(fvgs[0].get('pair', series['symbol']))
+        
+        for pair in pairs:
+            self.rebuild_touch_index(pair)
+            price = self.current_prices.get(pair)
+            if price:
+                self.touch_index.on_price(pair, price)  # Prime touch states silently
+        
+        age = time.time() - state.get('saved_at', time.time())
+        logger.info(f"💾 SNAPSHOT: restored {len(self.store)} FVGs, {len(self.active_pairs)} pairs "
+                    f"({age / 60:.0f} min old)")
+        return True
+
     async def send_stats_update(self):
         """Send statistics update to clients"""
         if not self.clients:
@@ -422,15 +1320,42 @@ class FVGScanner:
             'timestamp': datetime.now().isoformat()
         }
         
-        for client in self.clients.copy():
-            try:
-                await client.send(json.dumps(message))
-            except:
-                self.clients.discard(client)
+        await self.send_to_clients(self.clients, message)
+        await self.send_screener_updates()
+        
+        # Shard worker: the coordinator merges every worker's cumulative fill statistics
+        if self.shard_sinks and self.fill_stats.version != self._fill_stats_sent:
+            self._fill_stats_sent = self.fill_stats.version
+            await self.send_to_clients(self.shard_sinks, {'type': 'fill_stats', 'stats': self.fill_stats.to_dict()})
+
+    def screener_signature(self, rank, items):
+        """Membership and order of a screen: a change is worth a push, field churn is not"""
+        score = self.store.screener.rankings[rank].score
+        return tuple((item.get('fvg_id') or item.get('block_id'), score(item)) for item in items)
+
+    async def send_screener(self, client, rank, limit, force=False):
+        """Current top ``limit`` of a ranking, unless the client already has it"""
+        items = self.store.screener.top(rank, limit)
+        signature = self.screener_signature(rank, items)
+        if not force and self._screener_sent.get(client) == signature:
+            return
+        self._screener_sent[client] = signature
+        await self.send_to_clients([client], {
+            'type': 'screener_update',
+            'rank': rank,
+            'limit': limit,
+            'data': items,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    async def send_screener_updates(self):
+        for client, (rank, limit) in list(self.screener_clients.items()):
+            await self.send_screener(client, rank, limit)
 
-    async def handle_client(self, websocket, path):
+    async def handle_client(self, websocket, path=None):
         """Handle WebSocket client connections"""
         self.clients.add(websocket)
+        self.subscriptions.add_client(websocket)
         client_info = f"{websocket.remote_address[0]}:{websocket.remote_address[1]}"
         logger.info(f"🔗 PRODUCTION: Client connected from {client_info}")
         
@@ -443,6 +1368,7 @@ class FVGScanner:
                 'settings': self.pine_settings.copy()
             }
             await websocket.send(json.dumps(welcome_message))
+            await self.send_known_state(websocket)
             
             # Handle client messages
             async for message in websocket:
@@ -459,7 +1385,7 @@ class FVGScanner:
         except Exception as e:
             logger.error(f"Error handling client {client_info}: {e}")
         finally:
-            self.clients.discard(websocket)
+            self.remove_client(websocket)
             logger.info(f"🔌 PRODUCTION: Client {client_info} disconnected")
 
     async def handle_client_message(self, data, websocket):
@@ -470,7 +1396,14 @@ class FVGScanner:
             if not self.is_scanning:
                 self.is_scanning = True
                 logger.info("🚀 PINE SCRIPT SCANNER: Starting scan requested by client")
-                asyncio.create_task(self.scan_markets())
+                if self.coordinator is not None:
+                    await self.coordinator.broadcast({'type': 'start_scan'})
+                elif self.candle_rings is not None and not self.candle_rings.is_writer:
+                    asyncio.create_task(self.follow_shared_candles())
+                elif self.pine_settings.get('ingestion_mode') == 'stream':
+                    asyncio.create_task(self.run_stream_ingestion())
+                else:
+                    asyncio.create_task(self.scan_markets())
                 await websocket.send(json.dumps({
                     'type': 'scan_status',
                     'status': 'started',
@@ -479,6 +1412,11 @@ class FVGScanner:
         
         elif message_type == 'stop_scan':
             self.is_scanning = False
+            if self.stream_ingestor:
+                self.stream_ingestor.stop()
+            self.detection_pool.shutdown()
+            if self.coordinator is not None:
+                await self.coordinator.broadcast({'type': 'stop_scan'})
             logger.info("⏹️ PINE SCRIPT SCANNER: Stop scan requested by client")
             await websocket.send(json.dumps({
                 'type': 'scan_status',
@@ -489,17 +1427,155 @@ class FVGScanner:
         elif message_type == 'update_settings':
             settings = data.get('settings', {})
             self.pine_settings.update(settings)
+            if 'proximity_filter' in settings:
+                self.touch_index.set_proximity(float(self.pine_settings['proximity_filter']))
+            if self.coordinator is not None:
+                await self.coordinator.broadcast({'type': 'update_settings', 'settings': settings})
             logger.info(f"⚙️ Settings updated: {settings}")
             await websocket.send(json.dumps({
                 'type': 'settings_updated',
                 'settings': self.pine_settings.copy()
             }))
+            if any(key in settings for key in OUTPUT_SETTINGS):
+                await self.refilter_cached_series()
+        
+        elif message_type == 'subscribe':
+            try:
+                subscription = Subscription.from_message(data)
+            except (TypeError, ValueError) as e:
+                await websocket.send(json.dumps({
+                    'type': 'error',
+                    'message': f'Invalid subscription: {e}'
+                }))
+                return
+            self.subscriptions.subscribe(websocket, subscription)
+            logger.info(f"📡 Subscription updated: {subscription.to_dict()}")
+            await websocket.send(json.dumps({
+                'type': 'subscription_updated',
+                'subscription': subscription.to_dict()
+            }))
+            # The client replaces its rows: give it what the new filters match right away
+            await self.send_known_state(websocket, subscription)
+        
+        elif message_type == 'unsubscribe':
+            self.subscriptions.subscribe(websocket, Subscription())
+            await websocket.send(json.dumps({
+                'type': 'subscription_updated',
+                'subscription': Subscription().to_dict()
+            }))
+            await self.send_known_state(websocket, Subscription())
+        
+        elif message_type == 'subscribe_alerts':
+            self.alert_clients.add(websocket)
+            if data.get('alerts_only'):
+                # Alert-only clients do not receive the FVG stream at all
+                self.subscriptions.remove_client(websocket)
+            await websocket.send(json.dumps({
+                'type': 'alert_rules',
+                'subscribed': True,
+                'rules': self.alert_engine.list_rules(websocket)
+            }))
+        
+        elif message_type == 'unsubscribe_alerts':
+            self.alert_clients.discard(websocket)
+            await websocket.send(json.dumps({
+                'type': 'alert_rules',
+                'subscribed': False,
+                'rules': self.alert_engine.list_rules(websocket)
+            }))
+        
+        elif message_type == 'add_alert_rule':
+            try:
+                # Client rules are the client's own; the server rules stay read-only
+                rule = self.alert_engine.add_rule(AlertRule.from_dict(data.get('rule', {})), owner=websocket)
+            except (TypeError, ValueError) as e:
+                await websocket.send(json.dumps({
+                    'type': 'error',
+                    'message': f'Invalid alert rule: {e}'
+                }))
+                return
+            logger.info(f"🚨 Alert rule added: {rule.to_dict()}")
+            await websocket.send(json.dumps({
+                'type': 'alert_rules',
+                'subscribed': websocket in self.alert_clients,
+                'rules': self.alert_engine.list_rules(websocket)
+            }))
+        
+        elif message_type in ('remove_alert_rule', 'clear_alert_rules', 'list_alert_rules'):
+            if message_type == 'remove_alert_rule':
+                try:
+                    self.alert_engine.remove_rule(data.get('rule_id'), owner=websocket)
+                except ValueError as e:
+                    await websocket.send(json.dumps({'type': 'error', 'message': str(e)}))
+                    return
+            elif message_type == 'clear_alert_rules':
+                self.alert_engine.remove_owner(websocket)
+            await websocket.send(json.dumps({
+                'type': 'alert_rules',
+                'subscribed': websocket in self.alert_clients,
+                'rules': self.alert_engine.list_rules(websocket)
+            }))
+        
+        elif message_type == 'screener':
+            rank = data.get('rank', 'distance')
+            try:
+                limit = max(1, min(int(data.get('limit', 50)), SCREENER_MAX_LIMIT))
+                self.store.screener.top(rank, limit)
+            except (TypeError, ValueError) as e:
+                await websocket.send(json.dumps({
+                    'type': 'error',
+                    'message': f'Invalid screener: {e}'
+                }))
+                return
+            self.screener_clients[websocket] = (rank, limit)
+            await self.send_screener(websocket, rank, limit, force=True)
+        
+        elif message_type == 'unsubscribe_screener':
+            self.screener_clients.pop(websocket, None)
+            self._screener_sent.pop(websocket, None)
         
         elif message_type == 'ping':
             await websocket.send(json.dumps({'type': 'pong'}))
 
+class FastAPIWebSocketClient:
+    """Adapts a FastAPI/Starlette WebSocket to the websockets-style client API"""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        client = getattr(websocket, 'client', None)
+        self.remote_address = (client.host, client.port) if client else ('unknown', 0)
+
+    async def send(self, message):
+        await self.websocket.send_text(message)
+
+    def __aiter__(self):
+        return self._iter_messages()
+
+    async def _iter_messages(self):
+        from starlette.websockets import WebSocketDisconnect
+        while True:
+            try:
+                yield await self.websocket.receive_text()
+            except WebSocketDisconnect:
+                return
+
+_shared_scanner = None
+
+def get_shared_scanner():
+    """Process-wide scanner shared by the FastAPI app"""
+    global _shared_scanner
+    if _shared_scanner is None:
+        _shared_scanner = FVGScanner()
+    return _shared_scanner
+
+async def start_fvg_scanner(websocket):
+    """Serve a FastAPI WebSocket (already accepted) from the shared scanner"""
+    scanner = get_shared_scanner()
+    await scanner.handle_client(FastAPIWebSocketClient(websocket), '/ws')
+
 def main():
     scanner = FVGScanner()
+    scanner.restore_snapshot()
     
     # Start WebSocket server
     start_server = websockets.serve(
@@ -513,8 +1589,11 @@ def main():
     logger.info("🚀 PINE SCRIPT FVG SCANNER: WebSocket server starting on port 8765")
     
     # Run the server
-    asyncio.get_event_loop().run_until_complete(start_server)
-    asyncio.get_event_loop().run_forever()
+    try:
+        asyncio.get_event_loop().run_until_complete(start_server)
+        asyncio.get_event_loop().run_forever()
+    finally:
+        scanner.save_snapshot()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,144 @@
+"""scheduler.py — Candle-close-aware rescan scheduling
+
+A (symbol, timeframe) series can only produce new FVGs when one of its
+candles closes, so instead of rescanning every timeframe on every pass the
+scanner keeps a priority queue keyed by each series' next candle close:
+
+    1m   -> due every minute
+    1d   -> due once a day (00:00 UTC + grace)
+    1w   -> due once a week (Monday 00:00 UTC + grace)
+
+Between closes a series is only refreshed when price does something that
+can change it (e.g. touches one of its gaps), via request_refresh().
+"""
+
+import heapq
+import time
+
+TIMEFRAME_SECONDS = {
+    '1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '8h': 28800, '12h': 43200,
+    '1d': 86400, '3d': 259200, '1w': 604800
+}
+
+# Weekly candles open on Monday 00:00 UTC; the Unix epoch was a Thursday
+WEEK_OFFSET = 4 * 86400
+
+def timeframe_seconds(timeframe):
+    if timeframe in TIMEFRAME_SECONDS:
+        return TIMEFRAME_SECONDS[timeframe]
+    unit = timeframe[-1]
+    multiplier = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}.get(unit)
+    if multiplier is None:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return int(timeframe[:-1]) * multiplier
+
+def candle_open_time(timeframe, now=None):
+    """Open time (seconds) of the candle that contains ``now``"""
+    now = time.time() if now is None else now
+    period = timeframe_seconds(timeframe)
+    offset = WEEK_OFFSET if period % 604800 == 0 else 0
+    return ((now - offset) // period) * period + offset
+
+def next_candle_close(timeframe, now=None):
+    """Close time (seconds) of the candle that contains ``now``"""
+    return candle_open_time(timeframe, now) + timeframe_seconds(timeframe)
+
+# Progressive first pass: the 10 most liquid symbols, then the next 40, then the long tail
+PROGRESSIVE_TIERS = (10, 50)
+
+def progressive_order(symbols, timeframes, tiers=PROGRESSIVE_TIERS):
+    """
+    Initial scan order for volume-ranked symbols
+
+    Within each liquidity tier the fastest timeframes come first (for every
+    symbol of the tier), so the first results land within seconds and the
+    long tail of quiet symbols / slow timeframes is worked down afterwards.
+    """
+    bounds = sorted(tiers)
+    def tier(rank):
+        return next((i for i, bound in enumerate(bounds) if rank < bound), len(bounds))
+    series = [
+        (tier(rank), timeframe_seconds(timeframe), rank, symbol, timeframe)
+        for rank, symbol in enumerate(symbols) for timeframe in timeframes
+    ]
+    series.sort()
+    return [(symbol, timeframe) for *_, symbol, timeframe in series]
+
+class CandleCloseScheduler:
+    """Priority queue of (symbol, timeframe) series keyed by next due time"""
+
+    def __init__(self, grace=2.0):
+        self.grace = grace              # Seconds after the close before the candle is final on the exchange
+        self._heap = []
+        self._due = {}                  # Current due time per key (heap entries may be stale)
+        self._seq = 0
+        self.stats = {'scheduled': 0, 'refresh_requests': 0, 'popped': 0}
+
+    def __len__(self):
+        return len(self._due)
+
+    def __contains__(self, key):
+        return key in self._due
+
+    def _push(self, key, due):
+        self._due[key] = due
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, key))
+
+    def add(self, symbol, timeframe, due=None):
+        """Track a series; due defaults to now (initial fetch, popped in insertion order)"""
+        self._push((symbol, timeframe), time.time() if due is None else due)
+
+    def schedule_close(self, symbol, timeframe, now=None):
+        """Schedule a series for its next candle close"""
+        due = next_candle_close(timeframe, now) + self.grace
+        self._push((symbol, timeframe), due)
+        self.stats['scheduled'] += 1
+        return due
+
+    def request_refresh(self, symbol, timeframe, due=None):
+        """Bring a series forward (price-driven refresh); never pushes it back"""
+        key = (symbol, timeframe)
+        due = time.time() if due is None else due
+        if key in self._due and self._due[key] <= due:
+            return False
+        self._push(key, due)
+        self.stats['refresh_requests'] += 1
+        return True
+
+    def remove(self, symbol, timeframe):
+        self._due.pop((symbol, timeframe), None)
+
+    def remove_symbol(self, symbol):
+        for key in [k for k in self._due if k[0] == symbol]:
+            del self._due[key]
+
+    def pop_due(self, now=None, max_items=None):
+        """Pop every series whose due time has passed (earliest first)"""
+        now = time.time() if now is None else now
+        ready = []
+        while self._heap and self._heap[0][0] <= now:
+            due, _, key = heapq.heappop(self._heap)
+            if self._due.get(key) != due:
+                continue  # Stale entry (rescheduled or removed)
+            del self._due[key]
+            ready.append(key)
+            if max_items is not None and len(ready) >= max_items:
+                break
+        self.stats['popped'] += len(ready)
+        return ready
+
+    def seconds_until_next(self, now=None):
+        """Seconds until the next live entry is due (None if empty)"""
+        now = time.time() if now is None else now
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - now)
+
+    def upcoming(self, limit=20):
+        """Next due series, for status output"""
+        items = sorted(self._due.items(), key=lambda item: item[1])[:limit]
+        return [{'symbol': k[0], 'timeframe': k[1], 'due': due} for k, due in items]
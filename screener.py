@@ -0,0 +1,183 @@
+"""screener.py — Universe-wide top-K rankings kept current on every store write
+
+The dashboard looks at "the 50 closest / strongest gaps across every pair and
+timeframe", not at everything. Sorting the whole store (or the whole client
+stream) per view does not scale with the universe, so FVGStore feeds every
+write into one TopK per ranking:
+
+    distance         FVG records, closest first (distance_percentage)
+    strength         FVG records, highest power_score first
+    block_strength   block summaries, strongest first
+    confluence       block summaries, most member FVGs first
+
+A TopK tracks the best ``capacity`` items in a heap rooted at the worst
+tracked one, with the invariant that every untracked item ranks no better
+than that root. An update is O(log K): compare with the root, push (and
+evict the root when full), or leave the item untracked. Superseded heap
+entries are skipped lazily. Removals can thin the tracked set; once fewer
+than capacity / 2 remain while untracked items exist, the next query refills
+it from the store in one O(n log K) pass. Queries up to MAX_LIMIT are exact.
+"""
+
+import heapq
+import itertools
+
+DEFAULT_CAPACITY = 400
+MAX_LIMIT = DEFAULT_CAPACITY // 2
+
+# ranking -> (item kind, score: lower ranks first)
+RANKINGS = {
+    'distance': ('fvg', lambda record: record.get('distance_percentage') or 0),
+    'strength': ('fvg', lambda record: -(record.get('power_score') or 0)),
+    'block_strength': ('block', lambda block: -(block.get('strength') or 0)),
+    'confluence': ('block', lambda block: -(block.get('fvg_count') or 0)),
+}
+
+class TopK:
+    """Best ``capacity`` items by score, maintained incrementally"""
+
+    def __init__(self, score, source, capacity=DEFAULT_CAPACITY):
+        self.score = score
+        self.source = source              # () -> iterable of (item_id, item): the full set for refills
+        self.capacity = capacity
+        self.known = set()                # Every item id, tracked or not
+        self.members = {}                 # item_id -> (score, seq) of tracked items
+        self.items = {}                   # item_id -> item (tracked only)
+        self.version = 0
+        self.stats = {'updates': 0, 'refills': 0}
+        self._heap = []                   # (-score, seq, item_id): worst tracked item at the root
+        self._seq = itertools.count()
+        self._ranked = None
+
+    def __len__(self):
+        return len(self.known)
+
+    def _root(self):
+        """Worst tracked (score, item_id), dropping superseded heap entries"""
+        heap = self._heap
+        while heap:
+            negative, seq, item_id = heap[0]
+            if self.members.get(item_id, (None, None))[1] == seq:
+                return -negative, item_id
+            heapq.heappop(heap)
+        return None
+
+    def _track(self, item_id, item, score):
+        seq = next(self._seq)
+        self.members[item_id] = (score, seq)
+        self.items[item_id] = item
+        heapq.heappush(self._heap, (-score, seq, item_id))
+
+    def _untrack(self, item_id):
+        self.members.pop(item_id, None)
+        self.items.pop(item_id, None)
+        if len(self._heap) > 2 * self.capacity + 64:
+            # Mostly superseded entries: rebuild from the live members
+            self._heap = [(-score, seq, i) for i, (score, seq) in self.members.items()]
+            heapq.heapify(self._heap)
+
+    def upsert(self, item_id, item):
+        self.stats['updates'] += 1
+        self.known.add(item_id)
+        score = self.score(item)
+        current = self.members.get(item_id)
+        if current is not None:
+            if current[0] == score:
+                self.items[item_id] = item        # Same rank, newer record
+                self._ranked = None
+                self.version += 1
+                return
+            self._untrack(item_id)
+            self._ranked = None
+            self.version += 1
+
+        root = self._root()
+        untracked_others = len(self.known) - len(self.members) - 1
+        if root is not None and score < root[0]:
+            self._track(item_id, item, score)
+            if len(self.members) > self.capacity:
+                self._untrack(self._root()[1])   # The old root joins the untracked (all ranked after it)
+        elif untracked_others == 0 and len(self.members) < self.capacity:
+            self._track(item_id, item, score)     # Everything is tracked: nothing can rank in between
+        else:
+            return                                # Ranks after the root: stays untracked
+        self._ranked = None
+        self.version += 1
+
+    def remove(self, item_id):
+        self.known.discard(item_id)
+        if item_id in self.members:
+            self._untrack(item_id)
+            self._ranked = None
+            self.version += 1
+
+    def refill(self):
+        """Re-select the tracked set from the full item set"""
+        self.stats['refills'] += 1
+        best = heapq.nsmallest(self.capacity, ((self.score(item), item_id, item)
+                                               for item_id, item in self.source()),
+                               key=lambda entry: (entry[0], entry[1]))
+        self.members, self.items, self._heap = {}, {}, []
+        for score, item_id, item in best:
+            self._track(item_id, item, score)
+        self._ranked = None
+        self.version += 1
+
+    def top(self, limit):
+        """Best ``limit`` items, best first"""
+        limit = min(limit, MAX_LIMIT, self.capacity)
+        untracked = len(self.known) - len(self.members)
+        if untracked and len(self.members) < max(limit, self.capacity // 2):
+            self.refill()
+        if self._ranked is None:
+            self._ranked = sorted(self.members, key=lambda item_id: (self.members[item_id][0], item_id))
+        return [self.items[item_id] for item_id in self._ranked[:limit]]
+
+class Screener:
+    """One TopK per ranking over a FVGStore's records and block summaries"""
+
+    def __init__(self, store, capacity=DEFAULT_CAPACITY):
+        self.store = store
+        sources = {'fvg': self._records, 'block': self._blocks}
+        self.rankings = {
+            name: TopK(score, sources[kind], capacity) for name, (kind, score) in RANKINGS.items()
+        }
+        self._kinds = {kind: [self.rankings[name] for name, (k, _) in RANKINGS.items() if k == kind]
+                       for kind in sources}
+
+    def _records(self):
+        return self.store.records.items()
+
+    def _blocks(self):
+        return ((block['block_id'], block) for blocks in self.store.blocks.values() for block in blocks)
+
+    # ----------------------------------------------------------- store writes
+
+    def upsert_record(self, record):
+        for ranking in self._kinds['fvg']:
+            ranking.upsert(record['fvg_id'], record)
+
+    def remove_record(self, fvg_id):
+        for ranking in self._kinds['fvg']:
+            ranking.remove(fvg_id)
+
+    def replace_blocks(self, previous, blocks):
+        """A series' block summaries were replaced"""
+        current = {block['block_id'] for block in blocks}
+        for ranking in self._kinds['block']:
+            for block in previous:
+                if block['block_id'] not in current:
+                    ranking.remove(block['block_id'])
+            for block in blocks:
+                ranking.upsert(block['block_id'], block)
+
+    # ---------------------------------------------------------------- queries
+
+    def top(self, rank='distance', limit=50):
+        if rank not in self.rankings:
+            raise ValueError(f"Unknown ranking '{rank}' (one of {', '.join(RANKINGS)})")
+        return self.rankings[rank].top(limit)
+
+    def stats(self):
+        return {name: dict(ranking.stats, tracked=len(ranking.members), items=len(ranking))
+                for name, ranking in self.rankings.items()}
@@ -0,0 +1,391 @@
+"""sharding.py — Horizontal sharding of the pair universe across scan workers
+
+One coordinator owns the client-facing state (the FastAPI app's shared
+scanner, or a standalone WebSocket server); N worker processes each scan a
+shard of the universe from get_pairs.get_all_usdt_perpetual_pairs:
+
+    coordinator   consistent-hash ring of live workers -> symbol assignment,
+                  rebalanced when a worker registers or its connection dies;
+                  merges worker output into one FVG store, one client stream,
+                  one stats view and one set of fill statistics
+    worker        a normal FVGScanner in scheduled mode whose coordinator link
+                  is registered as a client, so fvg_data / fvg_state / alert /
+                  stats_update messages reach the coordinator unchanged; series
+                  snapshots keep the coordinator's REST store complete, and
+                  symbols a worker drops or cannot resolve leave it again
+
+Running it locally:
+
+    FVG_SHARD_ROLE=coordinator uvicorn main:app --port 8000
+    python sharding.py worker --coordinator ws://127.0.0.1:8767
+    python sharding.py worker --coordinator ws://127.0.0.1:8767
+
+or without FastAPI: ``python sharding.py coordinator`` (dashboard WebSocket on 8765).
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import time
+
+import websockets
+
+from fill_stats import FillStats
+from subscriptions import normalize_symbol
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COORDINATOR_PORT = int(os.environ.get('FVG_COORDINATOR_PORT', 8767))
+DEFAULT_COORDINATOR_URL = os.environ.get('FVG_COORDINATOR_URL', f'ws://127.0.0.1:{DEFAULT_COORDINATOR_PORT}')
+VIRTUAL_NODES = 64
+
+def _hash(key):
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+class ConsistentHashRing:
+    """Hash ring with virtual nodes; adding/removing a worker only moves its own share"""
+
+    def __init__(self, virtual_nodes=VIRTUAL_NODES):
+        self.virtual_nodes = virtual_nodes
+        self.nodes = set()
+        self._points = []      # Sorted ring positions
+        self._owners = {}      # Ring position -> node
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add_node(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for replica in range(self.virtual_nodes):
+            point = _hash(f"{node}#{replica}")
+            self._owners[point] = node
+            bisect.insort(self._points, point)
+
+    def remove_node(self, node):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        self._points = [p for p in self._points if self._owners[p] != node]
+        self._owners = {p: n for p, n in self._owners.items() if n != node}
+
+    def node_for(self, key):
+        if not self._points:
+            return None
+        pos = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[self._points[pos]]
+
+    def assign(self, keys):
+        """node -> sorted keys it owns"""
+        assignment = {node: [] for node in self.nodes}
+        for key in keys:
+            node = self.node_for(key)
+            if node is not None:
+                assignment[node].append(key)
+        for owned in assignment.values():
+            owned.sort()
+        return assignment
+
+class ShardCoordinator:
+    """Assigns symbols to workers and merges their output into a (non-scanning) scanner"""
+
+    def __init__(self, scanner, host='0.0.0.0', port=DEFAULT_COORDINATOR_PORT, universe=None):
+        self.scanner = scanner
+        self.host = host
+        self.port = port
+        self.universe = list(universe) if universe else []
+        self.ring = ConsistentHashRing()
+        self.workers = {}            # worker_id -> websocket
+        self.assignments = {}        # worker_id -> [symbol ids]
+        self.worker_stats = {}       # worker_id -> last stats_update
+        self.unresolved = {}         # worker_id -> assigned ids the worker found no market for
+        self.owners = {}             # symbol id -> (worker_id, symbol) whose snapshots the store holds
+        self.fill_stats_parts = {}   # FillStats incarnation -> its last cumulative copy (kept after workers leave)
+        self.server = None
+        self.stats = {'rebalances': 0, 'moved_symbols': 0, 'messages': 0}
+
+    async def load_universe(self):
+        if self.universe:
+            return self.universe
+        from get_pairs import get_all_usdt_perpetual_pairs
+        self.universe = await get_all_usdt_perpetual_pairs()
+        return self.universe
+
+    async def start(self):
+        await self.load_universe()
+        self.scanner.coordinator = self
+        self.scanner.scan_stats['total_pairs'] = len(self.universe)
+        # Pings detect dead workers; their shards are rebalanced on disconnect
+        self.server = await websockets.serve(
+            self.handle_worker, self.host, self.port, ping_interval=20, ping_timeout=20, max_size=2 ** 24
+        )
+        logger.info(f"🧩 SHARD COORDINATOR: {len(self.universe)} symbols, workers connect to ws://{self.host}:{self.port}")
+        return self.server
+
+    async def handle_worker(self, websocket, path=None):
+        worker_id = None
+        try:
+            hello = json.loads(await websocket.recv())
+            if hello.get('type') != 'register' or not hello.get('worker_id'):
+                await websocket.close(code=1008, reason='register first')
+                return
+            worker_id = str(hello['worker_id'])
+            if worker_id in self.workers:
+                worker_id = f"{worker_id}-{int(time.time() * 1000) % 100000}"
+
+            self.workers[worker_id] = websocket
+            self.ring.add_node(worker_id)
+            logger.info(f"🧩 SHARD COORDINATOR: worker {worker_id} joined ({len(self.workers)} live)")
+            await self.rebalance()
+
+            async for raw in websocket:
+                try:
+                    await self.handle_worker_message(worker_id, json.loads(raw))
+                except Exception as e:
+                    logger.error(f"Error handling message from worker {worker_id}: {e}")
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            if worker_id is not None:
+                self.workers.pop(worker_id, None)
+                self.assignments.pop(worker_id, None)
+                self.worker_stats.pop(worker_id, None)
+                self.unresolved.pop(worker_id, None)
+                self.ring.remove_node(worker_id)
+                logger.info(f"🧩 SHARD COORDINATOR: worker {worker_id} left ({len(self.workers)} live)")
+                await self.rebalance()
+
+    async def rebalance(self):
+        """Recompute the assignment and notify workers whose shard changed"""
+        assignments = self.ring.assign(self.universe)
+        moved = 0
+        for worker_id, websocket in list(self.workers.items()):
+            symbols = assignments.get(worker_id, [])
+            previous = self.assignments.get(worker_id)
+            if symbols == previous:
+                continue
+            moved += len(set(symbols) - set(previous or ()))
+            try:
+                await websocket.send(json.dumps({
+                    'type': 'assign',
+                    'worker_id': worker_id,
+                    'symbols': symbols,
+                    'settings': self.scanner.pine_settings,
+                    'scanning': self.scanner.is_scanning
+                }))
+            except websockets.exceptions.ConnectionClosed:
+                continue
+        self.assignments = assignments
+        self.stats['rebalances'] += 1
+        self.stats['moved_symbols'] += moved
+        logger.info(f"🧩 SHARD COORDINATOR: rebalanced {len(self.universe)} symbols over "
+                    f"{len(self.workers)} workers ({moved} moved)")
+
+    async def handle_worker_message(self, worker_id, data):
+        """Merge one worker message into the coordinator's store, stream and stats"""
+        self.stats['messages'] += 1
+        message_type = data.get('type')
+        scanner = self.scanner
+
+        if message_type == 'series_snapshot':
+            scanner.store.replace_series(data['symbol'], data['timeframe'], data['fvgs'], data.get('blocks'))
+            self.owners[normalize_symbol(data['symbol'])] = (worker_id, data['symbol'])
+        elif message_type == 'dropped':
+            # The worker no longer scans these; a new owner's snapshots may already have replaced them
+            for symbol in data.get('symbols') or []:
+                if self.owners.get(normalize_symbol(symbol), (None,))[0] == worker_id:
+                    self.forget_symbol(symbol)
+        elif message_type == 'fvg_data':
+            await scanner.send_fvg_data(data['data'])
+        elif message_type == 'fvg_state':
+            await scanner.broadcast_fvg_state(data['data'])
+        elif message_type == 'alert':
+            # Fired by the worker's server rules: every alert subscriber gets it
+            await scanner.send_alerts([(None, data['alert'])])
+        elif message_type == 'fvg_refresh':
+            # The worker re-filtered after update_settings; its series snapshots are already merged
+            await scanner.send_refreshed_state()
+        elif message_type == 'fill_stats':
+            # Cumulative per worker process: a reconnecting worker replaces its own earlier copy
+            stats = FillStats.from_dict(data.get('stats') or {})
+            self.fill_stats_parts[stats.incarnation] = stats
+            scanner.fill_stats = FillStats.merged(self.fill_stats_parts.values())
+        elif message_type == 'unresolved':
+            self.unresolved[worker_id] = data.get('ids') or []
+            # Nobody can scan these: whatever an earlier owner left is stale
+            for market_id in self.unresolved[worker_id]:
+                owner = self.owners.get(normalize_symbol(market_id))
+                self.forget_symbol(owner[1] if owner else market_id)
+            if self.unresolved[worker_id]:
+                logger.warning(f"⚠️ SHARD COORDINATOR: worker {worker_id} cannot scan "
+                               f"{', '.join(self.unresolved[worker_id])}")
+        elif message_type == 'stats_update':
+            self.worker_stats[worker_id] = data.get('stats', {})
+            scanner.scan_stats.update(self.merged_stats())
+            await scanner.send_stats_update()
+
+    def forget_symbol(self, symbol):
+        """Drop the merged state of a symbol no worker reports any more"""
+        self.owners.pop(normalize_symbol(symbol), None)
+        self.scanner.forget_symbol(symbol)
+
+    def merged_stats(self):
+        merged = {}
+        for stats in self.worker_stats.values():
+            for key, value in stats.items():
+                if isinstance(value, (int, float)):
+                    merged[key] = merged.get(key, 0) + value
+        merged['total_pairs'] = len(self.universe)
+        return merged
+
+    async def broadcast(self, message):
+        """Send a control message (start_scan, stop_scan, update_settings) to every worker"""
+        payload = json.dumps(message)
+        for websocket in list(self.workers.values()):
+            try:
+                await websocket.send(payload)
+            except websockets.exceptions.ConnectionClosed:
+                continue
+
+    def status(self):
+        return {
+            'universe': len(self.universe),
+            'workers': {
+                worker_id: {'symbols': len(self.assignments.get(worker_id, [])),
+                            'unresolved': self.unresolved.get(worker_id, []),
+                            'stats': self.worker_stats.get(worker_id, {})}
+                for worker_id in self.workers
+            },
+            'stats': dict(self.stats)
+        }
+
+class ShardWorker:
+    """Scans the symbols assigned by the coordinator and streams results back"""
+
+    def __init__(self, scanner, coordinator_url=DEFAULT_COORDINATOR_URL, worker_id=None):
+        self.scanner = scanner
+        self.coordinator_url = coordinator_url
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.link = None
+
+    def resolve_symbols(self, ids):
+        """
+        Exchange ids from get_pairs ('BTCUSDT') -> unified symbols
+
+        The ids are USDT perpetuals. The scanner's spot market is used where
+        the pair also trades spot; perpetual-only listings (1000PEPEUSDT)
+        resolve to the linear swap ('1000PEPE/USDT:USDT'), which ccxt serves
+        from the futures API. Returns (symbols, unresolved ids).
+        """
+        self.scanner.exchange.load_markets()
+        markets_by_id = self.scanner.exchange.markets_by_id
+        symbols, unresolved = [], []
+        for market_id in ids:
+            markets = markets_by_id.get(market_id) or []
+            if isinstance(markets, dict):
+                markets = [markets]
+            spot = [market for market in markets if market.get('spot')]
+            swap = [market for market in markets if market.get('swap') and market.get('linear')]
+            market = (spot or swap or [None])[0]
+            if market is None:
+                unresolved.append(market_id)
+            else:
+                symbols.append(market['symbol'])
+        return symbols, unresolved
+
+    async def run(self):
+        """Connect, register and follow assignments; reconnects with jittered backoff"""
+        backoff = 1.0
+        while True:
+            try:
+                async with websockets.connect(self.coordinator_url, ping_interval=20, ping_timeout=20,
+                                              max_size=2 ** 24) as link:
+                    self.link = link
+                    await link.send(json.dumps({'type': 'register', 'worker_id': self.worker_id}))
+                    backoff = 1.0
+                    logger.info(f"🧩 SHARD WORKER {self.worker_id}: connected to {self.coordinator_url}")
+
+                    # The link is an ordinary scanner client plus the snapshot sink
+                    self.scanner.clients.add(link)
+                    self.scanner.subscriptions.add_client(link)
+                    self.scanner.alert_clients.add(link)
+                    self.scanner.shard_sinks.add(link)
+                    self.scanner._fill_stats_sent = 0     # The new link has no fill statistics yet
+                    await self.scanner.send_series_snapshots()
+
+                    async for raw in link:
+                        await self.handle_message(json.loads(raw))
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                delay = backoff + random.uniform(0, backoff)
+                logger.warning(f"⚠️ SHARD WORKER {self.worker_id}: coordinator link lost ({e}), "
+                               f"reconnecting in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if self.link is not None:
+                    self.scanner.remove_client(self.link)
+                    self.link = None
+
+    async def handle_message(self, data):
+        message_type = data.get('type')
+        if message_type == 'assign':
+            self.worker_id = data.get('worker_id', self.worker_id)
+            self.scanner.pine_settings.update(data.get('settings') or {})
+            symbols, unresolved = await self.scanner.run_in_thread(self.resolve_symbols, data.get('symbols', []))
+            kept = set(symbols)
+            dropped = [symbol for symbol in self.scanner.active_pairs if symbol not in kept]
+            logger.info(f"🧩 SHARD WORKER {self.worker_id}: assigned {len(symbols)} symbols")
+            if unresolved:
+                logger.warning(f"⚠️ SHARD WORKER {self.worker_id}: {len(unresolved)} assigned ids have no market: "
+                               f"{', '.join(unresolved)}")
+            await self.link.send(json.dumps({'type': 'unresolved', 'ids': unresolved}))
+            await self.scanner.assign_pairs(symbols, start=data.get('scanning', True))
+            if dropped:
+                await self.link.send(json.dumps({'type': 'dropped', 'symbols': dropped}))
+        elif message_type == 'start_scan':
+            await self.scanner.assign_pairs(self.scanner.active_pairs, start=True)
+        else:
+            # stop_scan, update_settings, ... behave exactly as for a dashboard client
+            await self.scanner.handle_client_message(data, self.link)
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Sharded FVG scanning")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    coord = sub.add_parser('coordinator')
+    coord.add_argument('--host', default='0.0.0.0')
+    coord.add_argument('--port', type=int, default=DEFAULT_COORDINATOR_PORT)
+    coord.add_argument('--ws-port', type=int, default=8765, help='dashboard WebSocket port')
+
+    work = sub.add_parser('worker')
+    work.add_argument('--coordinator', default=DEFAULT_COORDINATOR_URL)
+    work.add_argument('--worker-id', default=None)
+
+    args = parser.parse_args()
+
+    async def _main():
+        from scanner import FVGScanner
+
+        scanner = FVGScanner()
+        if args.command == 'coordinator':
+            await ShardCoordinator(scanner, args.host, args.port).start()
+            dashboard = await websockets.serve(scanner.handle_client, args.host, args.ws_port,
+                                               ping_interval=30, ping_timeout=10)
+            await dashboard.wait_closed()
+        else:
+            await ShardWorker(scanner, args.coordinator, args.worker_id).run()
+
+    asyncio.run(_main())
@@ -0,0 +1,102 @@
+"""singleflight.py — Share one in-flight call between concurrent callers
+
+Concurrent callers asking for the same key (e.g. the same symbol, timeframe
+and candle) share the first caller's request and its result instead of each
+going to the exchange. A completed result is served for ``ttl`` more seconds,
+failures are never cached.
+
+Works across event loops and threads (fvg_metrics' sync helpers each run
+their own asyncio.run loop): the shared slot is a concurrent.futures.Future.
+
+Results are shared objects - callers must treat them as read-only.
+
+Cancelling a caller only cancels that caller: followers wait behind a
+shield, and the leader's work runs in its own task, so a cancelled leader
+still finishes it for the others. Only when that task itself is cancelled
+(its loop is shutting down) do the followers retry, one of them becoming
+the new leader.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+class LeaderGone(Exception):
+    """The leading call was cancelled before it finished; followers retry"""
+
+class SingleFlight:
+    """Deduplicates concurrent async calls by key, with a short post-completion cache"""
+
+    def __init__(self, ttl=2.0, max_entries=2048):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._calls = {}      # key -> (Future, completed_at or None)
+        self._tasks = set()   # Leading calls in flight
+        self.stats = {'calls': 0, 'shared': 0, 'cached': 0}
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Await ``fn(*args, **kwargs)`` once per key; concurrent callers get the same result"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._calls.get(key)
+            if entry is not None and entry[1] is not None and now - entry[1] >= self.ttl:
+                entry = None
+            if entry is None:
+                future = Future()
+                self._calls[key] = (future, None)
+                leader = True
+                self.stats['calls'] += 1
+            else:
+                future = entry[0]
+                leader = False
+                self.stats['cached' if entry[1] is not None else 'shared'] += 1
+
+        if not leader:
+            try:
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except LeaderGone:
+                return await self.do(key, fn, *args, **kwargs)
+
+        # Referenced: the loop holds tasks weakly
+        task = asyncio.ensure_future(self._lead(key, future, fn, args, kwargs))
+        with self._lock:
+            self._tasks.add(task)
+        task.add_done_callback(self._forget_task)
+        return await asyncio.shield(task)
+
+    async def _lead(self, key, future, fn, args, kwargs):
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self._calls.pop(key, None)
+            if not future.done():
+                future.set_exception(e if isinstance(e, Exception) else LeaderGone(key))
+            raise
+
+        if not future.done():
+            future.set_result(result)
+        with self._lock:
+            self._calls[key] = (future, time.monotonic())
+            if len(self._calls) > self.max_entries:
+                self._prune()
+        return result
+
+    def _forget_task(self, task):
+        with self._lock:
+            self._tasks.discard(task)
+        if not task.cancelled():
+            task.exception()      # Retrieved: a leader cancelled meanwhile must not log "never retrieved"
+
+    def _prune(self):
+        now = time.monotonic()
+        self._calls = {
+            key: entry for key, entry in self._calls.items()
+            if entry[1] is None or now - entry[1] < self.ttl
+        }
+
+    def clear(self):
+        with self._lock:
+            self._calls = {key: entry for key, entry in self._calls.items() if entry[1] is None}
@@ -0,0 +1,61 @@
+"""snapshot.py — Warm-start snapshot of the scanner's last known state
+
+On shutdown the scanner writes its active FVG state (every series' records
+and block summaries), prices and scanned universe to a gzipped JSON file;
+on boot it is read back so clients see the last known gaps within a second
+while the first rescan runs. FVGScanner.snapshot_state / restore_snapshot
+decide what goes in, this module only handles the file:
+
+    FVG_SNAPSHOT_PATH      file location (default fvg_snapshot.json.gz)
+    FVG_SNAPSHOT_MAX_AGE   snapshots older than this many hours are ignored (24)
+
+Writes go to a temporary file first and are renamed into place, so a crash
+mid-write never leaves a truncated snapshot behind.
+"""
+
+import os
+import gzip
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+def default_snapshot_path():
+    return os.environ.get('FVG_SNAPSHOT_PATH', 'fvg_snapshot.json.gz')
+
+def default_max_age():
+    return float(os.environ.get('FVG_SNAPSHOT_MAX_AGE', 24)) * 3600
+
+def write_snapshot(state, path=None):
+    """Atomically write a state dict; returns the path"""
+    path = path or default_snapshot_path()
+    payload = dict(state, version=SNAPSHOT_VERSION, saved_at=time.time())
+    temporary = f"{path}.{os.getpid()}.tmp"     # Several server workers may save at once
+    with gzip.open(temporary, 'wt', encoding='utf-8', compresslevel=5) as f:
+        json.dump(payload, f, separators=(',', ':'), default=str)
+    os.replace(temporary, path)
+    return path
+
+def read_snapshot(path=None, max_age=None):
+    """State dict of a usable snapshot, or None (missing, stale, other version or unreadable)"""
+    path = path or default_snapshot_path()
+    max_age = default_max_age() if max_age is None else max_age
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"💾 SNAPSHOT: ignoring unreadable {path}: {e}")
+        return None
+
+    if state.get('version') != SNAPSHOT_VERSION:
+        return None
+    age = time.time() - state.get('saved_at', 0)
+    if age > max_age:
+        logger.info(f"💾 SNAPSHOT: ignoring {path}, {age / 3600:.1f}h old")
+        return None
+    return state
@@ -10,6 +10,7 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Global variables
     window.fvgData = [];
+    window.screener = null;  // Server-ranked closest gaps across the whole universe
     window.ws = null;
     window.isConnected = false;
     window.isScanning = false;
@@ -67,6 +68,15 @@ document.addEventListener('DOMContentLoaded', function() {
                 window.isConnected = true;
                 updateConnectionStatus(true);
                 
+                // Tell the server what the current filters can show
+                sendSubscription();
+                
+                // Alerts are evaluated server-side and arrive on their own channel
+                window.ws.send(JSON.stringify({ type: 'subscribe_alerts' }));
+                
+                // Universe-wide top-K kept by the server: no client-side sort of the whole stream
+                window.ws.send(JSON.stringify({ type: 'screener', rank: 'distance', limit: 100 }));
+                
                 // Send ping every 30 seconds to keep connection alive (Railway requirement)
                 setInterval(() => {
                     if (window.ws && window.ws.readyState === WebSocket.OPEN) {
@@ -126,8 +136,37 @@ document.addEventListener('DOMContentLoaded', function() {
                 break;
                 
             case 'fvg_data':
-                // Handle direct FVG data (data is the FVG object itself)
-                handleFVGData(data);
+                // Scanner wraps the FVG in data.data, sample generator sends it flat
+                handleFVGData(data.data || data);
+                break;
+                
+            case 'fvg_snapshot':
+                // Last known gaps matching the subscription, sent on connect and on every
+                // (un)subscribe: replaces the held rows
+                window.fvgData = [];
+                (data.data || []).forEach(handleFVGData);
+                filterAndDisplayData();
+                if (data.stats) {
+                    window.stats = data.stats;
+                    updateStatistics();
+                }
+                break;
+                
+            case 'fvg_refresh':
+                // Whole in-proximity state re-derived after a settings change: replaces the held rows
+                window.fvgData = [];
+                (data.data || []).forEach(handleFVGData);
+                filterAndDisplayData();
+                if (data.stats) {
+                    window.stats = data.stats;
+                    updateStatistics();
+                }
+                break;
+                
+            case 'screener_update':
+                // Closest gaps across every pair and timeframe, already ranked by the server
+                window.screener = (data.data || []).map(normalizeFVG);
+                filterAndDisplayData();
                 break;
                 
             case 'enhanced_fvg':
@@ -167,6 +206,26 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
                 break;
                 
+            case 'fvg_state':
+                // Tick-rate touch / proximity transition for an FVG we already hold
+                handleFVGState(data.data || data);
+                break;
+                
+            case 'alert':
+                if (window.pineSettings.alertsEnabled && data.alert) {
+                    showAlert(data.alert.message, data.alert.category || 'proximity');
+                }
+                break;
+                
+            case 'alert_rules':
+                window.serverAlerts = Boolean(data.subscribed);
+                console.log("🚨 Server alert rules:", data.rules);
+                break;
+                
+            case 'subscription_updated':
+                console.log("📡 Server subscription:", data.subscription);
+                break;
+                
             case 'pong':
                 console.log("🏓 Ping-pong successful");
                 break;
@@ -176,14 +235,9 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    // Handle FVG data with Pine Script logic
-    function handleFVGData(data) {
-        if (!data) return;
-        
-        console.log("📊 Processing FVG data:", data.pair, data.timeframe || data.tf, data.fvg_type);
-        
-        // Ensure all required fields have valid values
-        const safeFVG = {
+    // Ensure all required fields have valid values
+    function normalizeFVG(data) {
+        return {
             pair: data.pair || 'UNKNOWN',
             timeframe: data.timeframe || data.tf || '1h',
             type: data.fvg_type || data.type || 'Unknown',
@@ -203,6 +257,15 @@ document.addEventListener('DOMContentLoaded', function() {
             block_badge: data.block_badge || '',
             block_id: data.block_id || null
         };
+    }
+    
+    // Handle FVG data with Pine Script logic
+    function handleFVGData(data) {
+        if (!data) return;
+        
+        console.log("📊 Processing FVG data:", data.pair, data.timeframe || data.tf, data.fvg_type);
+        
+        const safeFVG = normalizeFVG(data);
         
         // Create enhanced FVG entry with Pine Script features
         const fvgEntry = {
@@ -233,10 +296,36 @@ document.addEventListener('DOMContentLoaded', function() {
         console.log("✅ FVG processed and added to display:", fvgEntry.pair, fvgEntry.timeframe, fvgEntry.type);
     }
     
+    // Apply a server-side touch / proximity transition to the held rows
+    function handleFVGState(state) {
+        if (!state) return;
+        
+        let updated = 0;
+        window.fvgData.forEach(fvg => {
+            if (fvg.pair === state.pair && fvg.timeframe === state.tf &&
+                fvg.gap_low === Number(state.gap_low) && fvg.gap_high === Number(state.gap_high)) {
+                fvg.distance_percentage = Number(state.distance_percentage) || 0;
+                fvg.is_within_proximity = Boolean(state.is_within_proximity);
+                fvg.is_touched = Boolean(state.is_touched);
+                fvg.pine_distance = fvg.distance_percentage;
+                fvg.pine_proximity = fvg.is_within_proximity;
+                fvg.pine_touched = fvg.is_touched;
+                updated++;
+            }
+        });
+        
+        if (updated > 0) {
+            filterAndDisplayData();
+        }
+    }
+    
     // Pine Script alert system
     function checkFVGAlerts(fvg) {
         if (!window.pineSettings.alertsEnabled) return;
         
+        // The server alert engine already covers these (with dedupe / rate limits)
+        if (window.serverAlerts) return;
+        
         // Touch alert
         if (fvg.is_touched) {
             showAlert(`🎯 FVG TOUCHED: ${fvg.pair} ${fvg.timeframe} ${fvg.type} FVG`, 'touch');
@@ -376,6 +465,60 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    // FVG Type options (#fvgFilter) -> row predicate
+    const TYPE_FILTERS = {
+        bullish: fvg => fvg.type.toLowerCase() === 'bullish',
+        bearish: fvg => fvg.type.toLowerCase() === 'bearish',
+        touching: fvg => fvg.is_touched,
+        tested: fvg => fvg.is_touched,
+        untested: fvg => !fvg.is_touched,
+        new: fvg => Date.now() - new Date(fvg.timestamp).getTime() < 24 * 3600 * 1000,
+        historical: fvg => fvg.distance_percentage >= 10,  // The store's 'low' memory tier
+        extreme_orders: fvg => fvg.unfilled_orders >= 1_000_000,
+        strong_orders: fvg => fvg.unfilled_orders >= 100_000,
+        institutional: fvg => fvg.is_block_member && ['1d', '1w'].includes(fvg.timeframe),
+        blocks: fvg => fvg.is_block_member,
+        extreme_blocks: fvg => fvg.is_block_member && fvg.block_badge.includes('(EXTREME)'),
+        strong_blocks: fvg => fvg.is_block_member && /\((EXTREME|STRONG)\)/.test(fvg.block_badge)
+    };
+    
+    function readFilters() {
+        const typeControl = document.getElementById('fvgFilter') || document.getElementById('type-filter');
+        const distanceControl = document.getElementById('maxDistance') || document.getElementById('distance-filter');
+        const maxDistance = parseFloat(distanceControl?.value);
+        
+        let timeframes = null;  // null = every timeframe
+        const timeframeChecks = document.querySelectorAll('.timeframe-check');
+        if (timeframeChecks.length) {
+            timeframes = new Set(Array.from(timeframeChecks).filter(check => check.checked).map(check => check.value));
+        } else {
+            const timeframe = document.getElementById('timeframe-filter')?.value || 'all';
+            if (timeframe !== 'all') timeframes = new Set([timeframe]);
+        }
+        
+        return {
+            type: (typeControl?.value || 'all').toLowerCase(),
+            timeframes: timeframes,
+            maxDistance: isNaN(maxDistance) ? 100 : maxDistance,
+            proximityOnly: document.getElementById('proximity-only')?.checked || false,
+            blocksOnly: document.getElementById('blocks-only')?.checked || false,
+            touchedOnly: document.getElementById('touched-only')?.checked || false
+        };
+    }
+    
+    function matchesFilters(fvg, filters) {
+        const typeMatches = TYPE_FILTERS[filters.type];
+        if (typeMatches && !typeMatches(fvg)) return false;
+        if (filters.timeframes && !filters.timeframes.has(fvg.timeframe)) return false;
+        if (fvg.distance_percentage > filters.maxDistance) return false;
+        
+        // Proximity filter (Pine Script logic)
+        if (filters.proximityOnly && !fvg.is_within_proximity) return false;
+        if (filters.blocksOnly && !fvg.is_block_member) return false;
+        if (filters.touchedOnly && !fvg.is_touched) return false;
+        return true;
+    }
+    
     // Filter and display FVG data
     window.filterAndDisplayData = function() {
         // Try multiple ways to find the table
@@ -407,36 +550,17 @@ document.addEventListener('DOMContentLoaded', function() {
         // Clear existing rows
         tbody.innerHTML = '';
         
-        // Get filter values (with fallbacks)
-        const typeFilter = document.getElementById('type-filter')?.value || 'all';
-        const timeframeFilter = document.getElementById('timeframe-filter')?.value || 'all';
-        const distanceFilter = parseFloat(document.getElementById('distance-filter')?.value || 100);
-        const proximityOnly = document.getElementById('proximity-only')?.checked || false;
-        const blocksOnly = document.getElementById('blocks-only')?.checked || false;
-        const touchedOnly = document.getElementById('touched-only')?.checked || false;
-        
-        // Filter data
-        let filteredData = window.fvgData.filter(fvg => {
-            // Type filter
-            if (typeFilter !== 'all' && fvg.type !== typeFilter) return false;
-            
-            // Timeframe filter
-            if (timeframeFilter !== 'all' && fvg.timeframe !== timeframeFilter) return false;
-            
-            // Distance filter
-            if (fvg.distance_percentage > distanceFilter) return false;
-            
-            // Proximity filter (Pine Script logic)
-            if (proximityOnly && !fvg.is_within_proximity) return false;
-            
-            // Blocks filter
-            if (blocksOnly && !fvg.is_block_member) return false;
-            
-            // Touched filter
-            if (touchedOnly && !fvg.is_touched) return false;
-            
-            return true;
-        });
+        // Filters from the page's controls (the legacy ids are fallbacks)
+        const filters = readFilters();
+        
+        // Unfiltered type view: the server screener is already the closest gaps across the universe,
+        // but it ranks every active gap - rows outside proximity, the distance cap or the selected
+        // timeframes must still go
+        const narrowed = filters.type !== 'all' || filters.blocksOnly || filters.touchedOnly;
+        const source = window.screener && !narrowed ? window.screener : window.fvgData;
+        
+        let filteredData = source.filter(fvg =>
+            matchesFilters(fvg, filters) && (source !== window.screener || fvg.is_within_proximity));
         
         // Sort by distance (closest first)
         filteredData.sort((a, b) => a.distance_percentage - b.distance_percentage);
@@ -456,7 +580,7 @@ document.addEventListener('DOMContentLoaded', function() {
             countElement.textContent = filteredData.length;
         }
         
-        console.log(`📊 Display updated: ${filteredData.length} FVGs shown out of ${window.fvgData.length} total`);
+        console.log(`📊 Display updated: ${filteredData.length} FVGs shown out of ${source.length} total`);
     };
     
     // Create FVG table row
@@ -616,10 +740,34 @@ document.addEventListener('DOMContentLoaded', function() {
         console.log("🔄 PRODUCTION: Reconnection initiated");
     });
     
+    // Server-side subscription: the server only streams what these filters can show
+    function sendSubscription() {
+        if (!(window.ws && window.ws.readyState === WebSocket.OPEN)) return;
+        
+        const typeFilter = document.getElementById('type-filter')?.value || 'all';
+        const timeframeFilter = document.getElementById('timeframe-filter')?.value || 'all';
+        const distanceFilter = parseFloat(document.getElementById('distance-filter')?.value || 100);
+        
+        window.ws.send(JSON.stringify({
+            type: 'subscribe',
+            types: typeFilter !== 'all' ? [typeFilter] : [],
+            timeframes: timeframeFilter !== 'all' ? [timeframeFilter] : [],
+            max_distance: distanceFilter < 100 ? distanceFilter : null
+        }));
+    }
+    window.sendSubscription = sendSubscription;
+    
     // Filter event handlers
-    document.getElementById('type-filter')?.addEventListener('change', filterAndDisplayData);
-    document.getElementById('timeframe-filter')?.addEventListener('change', filterAndDisplayData);
+    document.getElementById('type-filter')?.addEventListener('change', function() {
+        sendSubscription();
+        filterAndDisplayData();
+    });
+    document.getElementById('timeframe-filter')?.addEventListener('change', function() {
+        sendSubscription();
+        filterAndDisplayData();
+    });
     document.getElementById('distance-filter')?.addEventListener('input', filterAndDisplayData);
+    document.getElementById('distance-filter')?.addEventListener('change', sendSubscription);
     document.getElementById('proximity-only')?.addEventListener('change', filterAndDisplayData);
     document.getElementById('blocks-only')?.addEventListener('change', filterAndDisplayData);
     document.getElementById('touched-only')?.addEventListener('change', filterAndDisplayData);
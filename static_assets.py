@@ -0,0 +1,161 @@
+"""static_assets.py — Dashboard assets rendered and compressed once at startup
+
+The page and its scripts never change while the server runs, so instead of
+reading and rewriting them per request everything is prepared once:
+
+    render      index.html with the configured URL rewrites applied and every
+                local asset reference pointed at a content-hashed URL
+                (/assets/script.3f9c2a1b.js)
+    compress    gzip (and brotli, when the brotli package is installed)
+                variants, kept only where smaller than the original
+    serve       by Accept-Encoding with a strong ETag per variant; hashed
+                URLs are immutable for a year, the page itself revalidates
+                (a 304 costs no body)
+
+Configuration:
+
+    FVG_PUBLIC_WS_URL      WebSocket URL written over the local development
+                           URLs in the page (default: the Railway deployment)
+    FVG_HTML_REWRITES      extra rewrites, "old=>new" pairs separated by ";"
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:                 # Optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+HTML_CANDIDATES = ("static/index.html", "index.html", "static/fvg-scanner.html")
+ASSET_EXTENSIONS = ('.js', '.css')
+ASSET_PREFIX = '/assets/'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+DEFAULT_PUBLIC_WS_URL = 'wss://web-production-6b86c.up.railway.app/ws'
+LOCAL_WS_URLS = ('ws://localhost:8000/ws', 'ws://127.0.0.1:8000/ws')
+
+def configured_rewrites():
+    """(old, new) text rewrites applied to the page, from the environment"""
+    public_ws_url = os.environ.get('FVG_PUBLIC_WS_URL', DEFAULT_PUBLIC_WS_URL)
+    rewrites = [(local, public_ws_url) for local in LOCAL_WS_URLS]
+    for pair in os.environ.get('FVG_HTML_REWRITES', '').split(';'):
+        if '=>' in pair:
+            old, new = pair.split('=>', 1)
+            rewrites.append((old.strip(), new.strip()))
+    return rewrites
+
+def accepted_encodings(accept_encoding):
+    """Accept-Encoding header -> {encoding: q}"""
+    accepted = {}
+    for part in (accept_encoding or '').lower().split(','):
+        encoding, *params = [piece.strip() for piece in part.split(';')]
+        if not encoding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[encoding] = q
+    return accepted
+
+class Asset:
+    """One prepared response body with its encoded variants"""
+    __slots__ = ('name', 'media_type', 'digest', 'variants')
+
+    def __init__(self, name, body, media_type):
+        self.name = name
+        self.media_type = media_type
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = {'identity': body}
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            self.variants['gzip'] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=11)
+            if len(compressed) < len(body):
+                self.variants['br'] = compressed
+
+    def etag(self, encoding):
+        return f'"{self.digest}-{encoding}"' if encoding != 'identity' else f'"{self.digest}"'
+
+    def negotiate(self, accept_encoding):
+        """Best variant the client accepts: br, then gzip, then identity (q=0 refuses an encoding)"""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return encoding
+        return 'identity'
+
+class StaticBundle:
+    """The rendered page plus its hashed assets"""
+
+    def __init__(self, directory='static', html_candidates=HTML_CANDIDATES, rewrites=None):
+        self.directory = directory
+        self.html_candidates = html_candidates
+        self.rewrites = configured_rewrites() if rewrites is None else rewrites
+        self.page = None            # Asset, or None when no HTML file exists
+        self.assets = {}            # hashed URL -> Asset
+        self.by_name = {}           # file name -> Asset
+
+    def build(self):
+        """Read, hash, rewrite and compress everything (once, at startup)"""
+        if os.path.isdir(self.directory):
+            for name in sorted(os.listdir(self.directory)):
+                path = os.path.join(self.directory, name)
+                if not name.endswith(ASSET_EXTENSIONS) or not os.path.isfile(path):
+                    continue
+                with open(path, 'rb') as f:
+                    asset = Asset(name, f.read(), mimetypes.guess_type(name)[0] or 'application/octet-stream')
+                self.by_name[name] = asset
+                self.assets[self.asset_url(asset)] = asset
+
+        for html_file in self.html_candidates:
+            if os.path.exists(html_file):
+                with open(html_file, 'r', encoding='utf-8') as f:
+                    self.page = Asset(html_file, self.render(f.read()).encode('utf-8'), 'text/html; charset=utf-8')
+                logger.info(f"📄 STATIC: rendered {html_file} with {len(self.assets)} hashed assets "
+                            f"({', '.join(sorted(self.page.variants))})")
+                break
+        else:
+            logger.warning("❌ STATIC: no HTML file found")
+        return self
+
+    @staticmethod
+    def asset_url(asset):
+        stem, extension = os.path.splitext(asset.name)
+        return f"{ASSET_PREFIX}{stem}.{asset.digest[:8]}{extension}"
+
+    def render(self, html):
+        for old, new in self.rewrites:
+            html = html.replace(old, new)
+        for name, asset in self.by_name.items():
+            url = self.asset_url(asset)
+            for attribute in ('src', 'href'):
+                for path in (f'/{name}', f'/static/{name}'):
+                    html = html.replace(f'{attribute}="{path}"', f'{attribute}="{url}"')
+        return html
+
+    def response_parts(self, asset, accept_encoding, if_none_match, immutable):
+        """(status, body, headers) for a request of an asset"""
+        encoding = asset.negotiate(accept_encoding)
+        etag = asset.etag(encoding)
+        headers = {
+            'ETag': etag,
+            'Cache-Control': IMMUTABLE if immutable else REVALIDATE,
+            'Vary': 'Accept-Encoding'
+        }
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        if if_none_match and etag in {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}:
+            return 304, b'', headers
+        return 200, asset.variants[encoding], headers
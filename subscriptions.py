@@ -0,0 +1,189 @@
+"""subscriptions.py — Server-side subscription filters for the FVG stream
+
+Clients tell the scanner what they watch instead of receiving every FVG and
+filtering in the browser. A subscription message looks like:
+
+    {
+        'type': 'subscribe',
+        'symbols': ['BTCUSDT', 'ETH/USDT'],   # empty / missing = all symbols
+        'timeframes': ['4h', '1d'],           # empty / missing = all timeframes
+        'types': ['Bullish'],                 # empty / missing = both types
+        'max_distance': 1.5,                  # optional, distance in %
+        'tiers': ['priority', 'high']         # optional memory tiers
+    }
+
+SubscriptionIndex keeps a (symbol, timeframe) routing index so an update is
+only matched against - and only encoded for - the clients that asked for it.
+Clients that never subscribe keep receiving the full stream.
+"""
+
+from collections import defaultdict
+
+from fvg_metrics import MEMORY_TIERS, classify_memory_tier
+
+def normalize_symbol(symbol):
+    """Normalize 'BTC/USDT', 'BTC/USDT:USDT' and 'btcusdt' to 'BTCUSDT'"""
+    if not symbol:
+        return ''
+    return str(symbol).split(':')[0].replace('/', '').upper()
+
+def _as_set(values, normalize=None):
+    """Turn a message field into a set (None = wildcard)"""
+    if not values or values == 'all':
+        return None
+    if isinstance(values, str):
+        values = [values]
+    if normalize:
+        return {normalize(v) for v in values}
+    return set(values)
+
+class Subscription:
+    """A client's filter over the FVG stream"""
+
+    def __init__(self, symbols=None, timeframes=None, types=None, max_distance=None, tiers=None):
+        self.symbols = _as_set(symbols, normalize_symbol)
+        self.timeframes = _as_set(timeframes)
+        self.types = _as_set(types, lambda t: str(t).capitalize())
+        self.max_distance = float(max_distance) if max_distance is not None else None
+        self.tiers = _as_set(tiers, lambda t: str(t).lower())
+
+        if self.tiers:
+            unknown = self.tiers - set(MEMORY_TIERS)
+            if unknown:
+                raise ValueError(f"Unknown memory tiers: {sorted(unknown)}")
+
+    @classmethod
+    def from_message(cls, data):
+        """Build a subscription from a client 'subscribe' message"""
+        return cls(
+            symbols=data.get('symbols'),
+            timeframes=data.get('timeframes'),
+            types=data.get('types'),
+            max_distance=data.get('max_distance'),
+            tiers=data.get('tiers')
+        )
+
+    @property
+    def is_wildcard(self):
+        return (self.symbols is None and self.timeframes is None and self.types is None and
+                self.max_distance is None and self.tiers is None)
+
+    def matches(self, fvg, ignore_distance=False):
+        """Check the non-routing parts of the filter (type, distance, tier)"""
+        if self.types is not None and fvg.get('fvg_type') not in self.types:
+            return False
+
+        if ignore_distance:
+            return True
+
+        distance = fvg.get('distance_percentage')
+        if self.max_distance is not None and distance is not None and distance > self.max_distance:
+            return False
+
+        if self.tiers is not None:
+            tier = fvg.get('memory_tier')
+            if tier is None and distance is not None:
+                tier = classify_memory_tier(distance, fvg.get('is_touched', False))
+            if tier not in self.tiers:
+                return False
+
+        return True
+
+    def accepts(self, fvg, ignore_distance=False):
+        """The whole filter: symbol / timeframe routing plus matches() (for batches outside the index)"""
+        if self.symbols is not None and normalize_symbol(fvg.get('pair')) not in self.symbols:
+            return False
+        if self.timeframes is not None and fvg.get('tf') not in self.timeframes:
+            return False
+        return self.matches(fvg, ignore_distance)
+
+    def to_dict(self):
+        return {
+            'symbols': sorted(self.symbols) if self.symbols is not None else 'all',
+            'timeframes': sorted(self.timeframes) if self.timeframes is not None else 'all',
+            'types': sorted(self.types) if self.types is not None else 'all',
+            'max_distance': self.max_distance,
+            'tiers': sorted(self.tiers) if self.tiers is not None else 'all'
+        }
+
+class SubscriptionIndex:
+    """Routing index from (symbol, timeframe) to subscribed clients"""
+
+    def __init__(self):
+        self.subscriptions = {}
+        # Four routing buckets: exact pair, symbol-only, timeframe-only, wildcard
+        self._by_pair = defaultdict(set)
+        self._by_symbol = defaultdict(set)
+        self._by_timeframe = defaultdict(set)
+        self._wildcard = set()
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def __contains__(self, client):
+        return client in self.subscriptions
+
+    def add_client(self, client, subscription=None):
+        """Register a client (default: full stream)"""
+        self.subscribe(client, subscription or Subscription())
+
+    def subscribe(self, client, subscription):
+        """Replace a client's subscription and re-index it"""
+        self._unindex(client)
+        self.subscriptions[client] = subscription
+
+        if subscription.symbols is not None and subscription.timeframes is not None:
+            for symbol in subscription.symbols:
+                for timeframe in subscription.timeframes:
+                    self._by_pair[(symbol, timeframe)].add(client)
+        elif subscription.symbols is not None:
+            for symbol in subscription.symbols:
+                self._by_symbol[symbol].add(client)
+        elif subscription.timeframes is not None:
+            for timeframe in subscription.timeframes:
+                self._by_timeframe[timeframe].add(client)
+        else:
+            self._wildcard.add(client)
+
+    def remove_client(self, client):
+        self._unindex(client)
+        self.subscriptions.pop(client, None)
+
+    def _unindex(self, client):
+        subscription = self.subscriptions.get(client)
+        if subscription is None:
+            return
+
+        if subscription.symbols is not None and subscription.timeframes is not None:
+            bucket = self._by_pair
+            keys = [(s, tf) for s in subscription.symbols for tf in subscription.timeframes]
+        elif subscription.symbols is not None:
+            bucket, keys = self._by_symbol, subscription.symbols
+        elif subscription.timeframes is not None:
+            bucket, keys = self._by_timeframe, subscription.timeframes
+        else:
+            self._wildcard.discard(client)
+            return
+
+        for key in keys:
+            clients = bucket.get(key)
+            if clients is not None:
+                clients.discard(client)
+                if not clients:
+                    del bucket[key]
+
+    def candidates(self, symbol, timeframe):
+        """Clients whose symbol/timeframe routing matches"""
+        symbol = normalize_symbol(symbol)
+        clients = set(self._wildcard)
+        clients |= self._by_pair.get((symbol, timeframe), set())
+        clients |= self._by_symbol.get(symbol, set())
+        clients |= self._by_timeframe.get(timeframe, set())
+        return clients
+
+    def route(self, fvg, ignore_distance=False):
+        """Return the clients interested in an FVG record"""
+        return [
+            client for client in self.candidates(fvg.get('pair'), fvg.get('tf'))
+            if self.subscriptions[client].matches(fvg, ignore_distance)
+        ]
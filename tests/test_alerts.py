@@ -0,0 +1,51 @@
+"""AlertEngine: server rules as a read-only base layer, client rules per owner"""
+
+import pytest
+
+from alerts import AlertEngine, AlertRule, MAX_CLIENT_RULES
+
+
+def touched(fvg_id='a'):
+    return AlertEngine.transition_event({'fvg_id': fvg_id, 'pair': 'BTCUSDT', 'tf': '4h',
+                                         'fvg_type': 'Bullish', 'distance_percentage': 0.2,
+                                         'transition': 'touched'})
+
+
+def test_client_rules_alert_only_their_owner():
+    engine = AlertEngine()
+    engine.add_rule(AlertRule('mine', 'distance', threshold=1.0), owner='alice')
+
+    alerts = engine.process([touched()], now=0)
+    owners = sorted((owner or '', alert['rule_id']) for owner, alert in alerts)
+    assert owners == [('', 'proximity-0.5'), ('', 'touch'), ('alice', 'mine')]
+
+
+def test_server_rules_are_read_only_for_clients():
+    engine = AlertEngine()
+    with pytest.raises(ValueError):
+        engine.remove_rule('touch', owner='mallory')
+    assert 'touch' in engine.rules
+
+    # A client rule with the same id shadows nothing: it is the client's own
+    engine.add_rule(AlertRule('touch', 'touch'), owner='mallory')
+    assert engine.remove_rule('touch', owner='mallory') is not None
+    assert 'touch' in engine.rules
+
+
+def test_rules_are_listed_and_dropped_per_owner():
+    engine = AlertEngine()
+    engine.add_rule(AlertRule('mine', 'touch'), owner='alice')
+    listed = {rule['rule_id']: rule['read_only'] for rule in engine.list_rules('alice')}
+    assert listed['mine'] is False and listed['touch'] is True
+    assert 'mine' not in {rule['rule_id'] for rule in engine.list_rules('bob')}
+
+    engine.remove_owner('alice')
+    assert engine.process([touched('b')], now=0) and not engine.client_rules
+
+
+def test_rules_per_client_are_capped():
+    engine = AlertEngine()
+    for i in range(MAX_CLIENT_RULES):
+        engine.add_rule(AlertRule(f'r{i}', 'touch'), owner='alice')
+    with pytest.raises(ValueError):
+        engine.add_rule(AlertRule('one-more', 'touch'), owner='alice')
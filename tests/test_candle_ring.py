@@ -0,0 +1,95 @@
+"""Seqlock consistency across processes and directory bookkeeping of the candle rings"""
+
+import multiprocessing
+import os
+import uuid
+
+import numpy as np
+
+from candle_ring import CandleRings, SeriesRing
+
+CAPACITY = 500
+WRITES = 20000
+
+
+def fvg_arrays(value, count):
+    return (np.full(count, value, dtype=np.int64), np.ones(count, dtype=bool),
+            np.full(count, value, dtype=np.float64), np.full(count, value, dtype=np.float64),
+            np.full(count, value, dtype=np.float64), np.full(count, value, dtype=np.float64))
+
+
+def write_series(name, ready, done):
+    ring = SeriesRing(name, CAPACITY, create=True)
+    ready.set()
+    try:
+        for value in range(1, WRITES + 1):
+            count = value % 50 + 1
+            ring.replace(np.full((CAPACITY, 6), value, dtype=np.float64), fvg_arrays(value, count), price=value)
+        done.wait(30)
+    finally:
+        ring.close(unlink=True)
+
+
+def test_reader_never_sees_a_torn_write():
+    context = multiprocessing.get_context('fork')   # Own resource tracker per process, like separate server workers
+    name = f"fvgtest_{uuid.uuid4().hex[:12]}"
+    ready, done = context.Event(), context.Event()
+    writer = context.Process(target=write_series, args=(name, ready, done))
+    writer.start()
+    try:
+        assert ready.wait(30)
+        ring = SeriesRing(name)
+        reads, values = 0, set()
+        while True:
+            seq, generation, candles, arrays, price = ring.read()
+            assert seq % 2 == 0
+            if generation:
+                value = candles[0, 0]
+                assert (candles == value).all()
+                assert price == value and generation == value
+                assert len(arrays[0]) == value % 50 + 1
+                assert all((np.asarray(column, dtype=np.float64) == value).all() for column in arrays[2:])
+                values.add(value)
+            reads += 1
+            if generation == WRITES:
+                break
+        ring.close()
+        assert reads > 1 and len(values) > 1
+    finally:
+        done.set()
+        writer.join(30)
+    assert writer.exitcode == 0
+
+
+def test_directory_follows_the_writer(tmp_path):
+    prefix = f"fvgtest_{uuid.uuid4().hex[:12]}"
+    lock_path = os.path.join(tmp_path, 'rings.lock')
+    writer = CandleRings(prefix, capacity=10, lock_path=lock_path)
+    reader = CandleRings(prefix, capacity=10, lock_path=lock_path)
+    try:
+        assert writer.elect() and not reader.elect()
+        candles = np.ones((5, 6))
+        for timeframe in ('1h', '4h'):
+            writer.publish_series('BTC/USDT', timeframe, candles, fvg_arrays(1, 2), price=100.0)
+        writer.publish_series('ETH/USDT', '1h', candles, fvg_arrays(1, 2), price=10.0)
+        assert sorted((change[0], change[1], change[2]) for change in reader.poll()) == [
+            ('BTC/USDT', '1h', 'series'), ('BTC/USDT', '4h', 'series'), ('ETH/USDT', '1h', 'series')]
+
+        writer.publish_price('BTC/USDT', 101.0)
+        assert sorted((change[1], change[2], change[5]) for change in reader.poll()) == [
+            ('1h', 'price', 101.0), ('4h', 'price', 101.0)]
+
+        writer.retain(['ETH/USDT'])
+        assert sorted((change[0], change[1], change[2]) for change in reader.poll()) == [
+            ('BTC/USDT', '1h', 'removed'), ('BTC/USDT', '4h', 'removed')]
+        assert set(reader.rings) == {('ETH/USDT', '1h')}
+
+        # Dropped and published again between two polls: a new segment, not the stale one
+        writer.drop_symbol('ETH/USDT')
+        writer.publish_series('ETH/USDT', '1h', candles * 2, fvg_arrays(2, 3), price=20.0)
+        (change,) = reader.poll()
+        assert change[:3] == ('ETH/USDT', '1h', 'series') and change[5] == 20.0
+        assert (change[3] == 2).all()
+    finally:
+        reader.close()
+        writer.close()
@@ -0,0 +1,26 @@
+"""FVGStore.query ordering on fields without a sorted index"""
+
+from fvg_store import FVGStore
+
+
+def make_store(values):
+    store = FVGStore()
+    records = [{'fvg_id': f'id{i}', 'pair': 'BTCUSDT', 'tf': '1h', 'fvg_type': 'Bullish',
+                'distance_percentage': 1.0, 'power_score': 1.0, 'age': value}
+               for i, value in enumerate(values)]
+    store.replace_series('BTCUSDT', '1h', records)
+    return store
+
+
+def test_numeric_fields_sort_numerically_with_missing_last():
+    store = make_store([10, 9, None, 100, 2.5])
+    ages = lambda order: [r['age'] for r in store.query(sort='age', order=order)['items']]
+    assert ages('asc') == [2.5, 9, 10, 100, None]
+    assert ages('desc') == [100, 10, 9, 2.5, None]
+
+
+def test_paging_follows_the_numeric_order():
+    store = make_store(list(range(12)))
+    page = store.query(sort='age', order='desc', offset=2, limit=3)
+    assert page['total'] == 12
+    assert [r['age'] for r in page['items']] == [9, 8, 7]
@@ -0,0 +1,73 @@
+"""RateGovernor coalescing under cancellation, and use from several event loops"""
+
+import asyncio
+import threading
+import time
+
+from rate_governor import RateGovernor
+
+
+class FakeExchange:
+    def __init__(self):
+        self.calls = []
+        self.last_response_headers = {}
+
+    def fetch_ticker(self, symbol):
+        self.calls.append(symbol)
+        time.sleep(0.05)
+        self.last_response_headers = {'X-MBX-USED-WEIGHT-1M': '100'}
+        return {'symbol': symbol}
+
+
+def test_cancelling_the_first_caller_leaves_coalesced_callers_served():
+    exchange, governor = FakeExchange(), RateGovernor()
+
+    async def main():
+        first = asyncio.ensure_future(governor.call(exchange.fetch_ticker, 'BTC/USDT'))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(governor.call(exchange.fetch_ticker, 'BTC/USDT'))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    result, cancelled = asyncio.run(main())
+    assert result == {'symbol': 'BTC/USDT'} and cancelled
+    assert exchange.calls == ['BTC/USDT']
+    assert governor.stats['coalesced'] == 1
+    assert governor.stats['server_used_weight'] == 100
+
+
+def test_request_is_cancelled_once_every_caller_is():
+    exchange, governor = FakeExchange(), RateGovernor(weight_limit=1, safety=1)
+    governor.tokens = 0          # Callers queue in acquire, before any request
+
+    async def main():
+        callers = [asyncio.ensure_future(governor.call(exchange.fetch_ticker, 'ETH/USDT')) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return governor._state().in_flight
+
+    assert asyncio.run(main()) == {}
+    assert exchange.calls == []
+
+
+def test_one_governor_serves_several_event_loops():
+    exchange, governor = FakeExchange(), RateGovernor()
+    results = []
+
+    def run(symbol):
+        results.append(asyncio.run(governor.call(exchange.fetch_ticker, symbol)))
+
+    run('BTC/USDT')
+    threads = [threading.Thread(target=run, args=(symbol,)) for symbol in ('ETH/USDT', 'SOL/USDT')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    run('BNB/USDT')
+
+    assert sorted(result['symbol'] for result in results) == ['BNB/USDT', 'BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+    assert governor.stats['requests'] == 4
@@ -0,0 +1,55 @@
+"""Randomized TopK / Screener checks against a brute-force sort"""
+
+import random
+
+import pytest
+
+from screener import TopK, MAX_LIMIT
+
+
+def brute_force(items, score, limit):
+    return [item_id for item_id, _ in sorted(items.items(), key=lambda entry: (score(entry[1]), entry[0]))[:limit]]
+
+
+def test_worse_score_of_tracked_item_invalidates_ranking():
+    items = {i: {'score': float(i)} for i in range(8)}
+    ranking = TopK(lambda item: item['score'], items.items, capacity=4)
+    for item_id, item in items.items():
+        ranking.upsert(item_id, item)
+    assert [item['score'] for item in ranking.top(2)] == [0.0, 1.0]
+
+    items[0] = {'score': 100.0}
+    ranking.upsert(0, items[0])
+    assert [item['score'] for item in ranking.top(2)] == [1.0, 2.0]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_topk_matches_brute_force_under_churn(seed):
+    rng = random.Random(seed)
+    items = {}
+    score = lambda item: item['score']
+    ranking = TopK(score, items.items, capacity=16)
+
+    for step in range(4000):
+        action = rng.random()
+        if action < 0.55 or not items:
+            item_id = rng.randrange(120)
+            items[item_id] = {'score': rng.choice((rng.random(), float(rng.randrange(10))))}
+            ranking.upsert(item_id, items[item_id])
+        elif action < 0.75:
+            item_id = rng.choice(list(items))
+            del items[item_id]
+            ranking.remove(item_id)
+        else:
+            limit = rng.randrange(1, 12)
+            expected = brute_force(items, score, limit)
+            actual = ranking.top(limit)
+            assert [score(item) for item in actual] == [score(items[i]) for i in expected], step
+
+
+def test_limit_is_capped():
+    items = {i: {'score': float(i)} for i in range(3 * MAX_LIMIT)}
+    ranking = TopK(lambda item: item['score'], items.items)
+    for item_id, item in items.items():
+        ranking.upsert(item_id, item)
+    assert len(ranking.top(10 * MAX_LIMIT)) == MAX_LIMIT
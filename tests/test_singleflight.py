@@ -0,0 +1,104 @@
+"""SingleFlight: one call per key, and cancelling one caller never cancels the others"""
+
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def slow(calls, gate, value='result'):
+    calls.append(value)
+    await gate.wait()
+    return value
+
+
+def test_concurrent_calls_share_one_execution():
+    async def main():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        tasks = [asyncio.ensure_future(flights.do('key', slow, calls, gate)) for _ in range(5)]
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(*tasks), calls, flights.stats
+
+    results, calls, stats = run(main())
+    assert results == ['result'] * 5
+    assert calls == ['result']
+    assert stats['calls'] == 1 and stats['shared'] == 4
+
+
+def test_cancelled_follower_leaves_leader_and_other_followers_intact():
+    async def main():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        leader = asyncio.ensure_future(flights.do('key', slow, calls, gate))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(flights.do('key', slow, calls, gate))
+        follower = asyncio.ensure_future(flights.do('key', slow, calls, gate))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        return await leader, await follower, cancelled.cancelled(), calls
+
+    leader, follower, was_cancelled, calls = run(main())
+    assert (leader, follower, was_cancelled) == ('result', 'result', True)
+    assert calls == ['result']
+
+
+def test_cancelled_leader_still_finishes_for_followers():
+    async def main():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        leader = asyncio.ensure_future(flights.do('key', slow, calls, gate))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do('key', slow, calls, gate))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        result = await follower
+        # Completed work is cached for later callers too
+        cached = await flights.do('key', slow, calls, gate)
+        return leader.cancelled(), result, cached, calls
+
+    was_cancelled, result, cached, calls = run(main())
+    assert (was_cancelled, result, cached) == (True, 'result', 'result')
+    assert calls == ['result']
+
+
+def test_follower_takes_over_when_leading_work_is_cancelled():
+    async def main():
+        flights, calls, gate = SingleFlight(), [], asyncio.Event()
+        leader = asyncio.ensure_future(flights.do('key', slow, calls, gate))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do('key', slow, calls, gate, 'retried'))
+        await asyncio.sleep(0)
+        for task in list(flights._tasks):
+            task.cancel()               # As at loop shutdown
+        await asyncio.sleep(0)
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower, calls
+
+    result, calls = run(main())
+    assert result == 'retried'
+    assert calls == ['result', 'retried']
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    async def fail():
+        await asyncio.sleep(0)
+        raise ValueError('boom')
+
+    async def main():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do('key', fail) for _ in range(3)), return_exceptions=True)
+        return results, 'key' in flights._calls
+
+    results, cached = run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not cached
@@ -0,0 +1,214 @@
+"""tiered_cache.py — Bounded, tier-aware caches under one memory ceiling
+
+The scanner's working caches (raw detections, blocks, prices) used to be
+unbounded dicts, so memory only grew as symbols churned. CacheManager owns
+every such cache and keeps their combined size under a fixed ceiling:
+
+    accounting   each entry is sized once on write (estimate_size)
+    ttl          per cache; expired entries miss and are swept periodically
+    retention    over the ceiling, the least recently used entry of the
+                 least important memory tier goes first:
+                 untiered -> low -> medium -> high -> priority
+
+so gaps at / near price (priority, high) stay hot while far-away (low) ones
+are dropped first. Hits, misses, evictions and expirations are counted per
+cache and reported by CacheManager.stats(). Only derived working data lives
+here: the live state (FVGStore, touch index) is outside the ceiling, and a
+miss must only ever cost a recomputation.
+"""
+
+import os
+import sys
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+EVICTION_ORDER = (None, 'low', 'medium', 'high', 'priority')
+_TIER_RANK = {tier: rank for rank, tier in enumerate(EVICTION_ORDER)}
+
+def default_max_bytes():
+    """FVG_CACHE_MB (default 256) in bytes"""
+    return int(float(os.environ.get('FVG_CACHE_MB', 256)) * 1024 * 1024)
+
+def estimate_size(value, _depth=0):
+    """Approximate deep size in bytes (shared objects are counted per reference)"""
+    size = sys.getsizeof(value)
+    if _depth >= 4:
+        return size
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(v, _depth + 1) for v in value)
+    return size
+
+class _Entry:
+    __slots__ = ('value', 'size', 'rank', 'stored_at', 'used_at')
+
+    def __init__(self, value, size, rank, now):
+        self.value = value
+        self.size = size
+        self.rank = rank
+        self.stored_at = now
+        self.used_at = now
+
+class TieredCache:
+    """LRU per memory tier with optional TTL; evicted by its CacheManager"""
+
+    def __init__(self, name, manager=None, ttl=None):
+        self.name = name
+        self.manager = manager
+        self.ttl = ttl
+        self.bytes = 0
+        self._entries = {}
+        self._lru = [OrderedDict() for _ in EVICTION_ORDER]   # Per tier rank, least recent first
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and not self._expired(entry, time.monotonic())
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry.stored_at >= self.ttl
+
+    def keys(self):
+        return list(self._entries)
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.counters['misses'] += 1
+            return default
+        now = time.monotonic()
+        if self._expired(entry, now):
+            self._remove(key)
+            self.counters['expirations'] += 1
+            self.counters['misses'] += 1
+            return default
+        entry.used_at = now
+        self._lru[entry.rank].move_to_end(key)
+        self.counters['hits'] += 1
+        return entry.value
+
+    def set(self, key, value, tier=None, size=None):
+        """Store a value; ``tier`` is the memory tier deciding its retention"""
+        self._remove(key)
+        if size is None:
+            size = estimate_size(key) + estimate_size(value)
+        entry = _Entry(value, size, _TIER_RANK.get(tier, 0), time.monotonic())
+        self._entries[key] = entry
+        self._lru[entry.rank][key] = entry
+        self.bytes += size
+        if self.manager is not None:
+            self.manager.enforce()
+
+    def set_tier(self, key, tier):
+        """Move an entry to another retention tier (e.g. after a price move)"""
+        entry = self._entries.get(key)
+        rank = _TIER_RANK.get(tier, 0)
+        if entry is None or entry.rank == rank:
+            return
+        del self._lru[entry.rank][key]
+        entry.rank = rank
+        self._lru[rank][key] = entry
+
+    def pop(self, key, default=None):
+        entry = self._remove(key)
+        return default if entry is None else entry.value
+
+    def clear(self):
+        self._entries.clear()
+        for lru in self._lru:
+            lru.clear()
+        self.bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            del self._lru[entry.rank][key]
+            self.bytes -= entry.size
+        return entry
+
+    def oldest(self, rank):
+        """(key, entry) least recently used in a tier rank, or None"""
+        lru = self._lru[rank]
+        return next(iter(lru.items()), None)
+
+    def evict(self, key):
+        if self._remove(key) is not None:
+            self.counters['evictions'] += 1
+
+    def purge_expired(self, now=None):
+        if self.ttl is None:
+            return
+        now = time.monotonic() if now is None else now
+        for key in [k for k, entry in self._entries.items() if self._expired(entry, now)]:
+            self._remove(key)
+            self.counters['expirations'] += 1
+
+    def stats(self):
+        lookups = self.counters['hits'] + self.counters['misses']
+        return dict(
+            self.counters,
+            entries=len(self._entries),
+            bytes=self.bytes,
+            hit_rate=round(self.counters['hits'] / lookups, 3) if lookups else None,
+            tiers={str(tier): len(lru) for tier, lru in zip(EVICTION_ORDER, self._lru) if lru}
+        )
+
+class CacheManager:
+    """Named TieredCaches sharing one memory ceiling"""
+
+    def __init__(self, max_bytes=None, sweep_interval=60):
+        self.max_bytes = default_max_bytes() if max_bytes is None else max_bytes
+        self.sweep_interval = sweep_interval
+        self.caches = {}
+        self._last_sweep = time.monotonic()
+
+    def cache(self, name, ttl=None):
+        cache = self.caches[name] = TieredCache(name, self, ttl)
+        return cache
+
+    @property
+    def bytes(self):
+        return sum(cache.bytes for cache in self.caches.values())
+
+    def enforce(self):
+        """Sweep expired entries now and then; evict least important LRU entries while over the ceiling"""
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            for cache in self.caches.values():
+                cache.purge_expired(now)
+
+        total = self.bytes
+        evicted = 0
+        while total > self.max_bytes:
+            victim = self._victim()
+            if victim is None:
+                break
+            cache, key, entry = victim
+            cache.evict(key)
+            total -= entry.size
+            evicted += 1
+        if evicted:
+            logger.debug(f"🧹 CACHE: evicted {evicted} entries ({total / 1048576:.1f} MB in use)")
+
+    def _victim(self):
+        for rank in range(len(EVICTION_ORDER)):
+            candidates = [(cache,) + oldest for cache in self.caches.values()
+                          for oldest in (cache.oldest(rank),) if oldest is not None]
+            if candidates:
+                return min(candidates, key=lambda c: c[2].used_at)
+        return None
+
+    def stats(self):
+        return {
+            'max_bytes': self.max_bytes,
+            'bytes': self.bytes,
+            'caches': {name: cache.stats() for name, cache in self.caches.items()}
+        }
@@ -0,0 +1,172 @@
+"""touch_index.py — Boundary-sorted touch index for tick-rate FVG evaluation
+
+Per symbol, the bounds of every active FVG are kept in two sorted arrays
+(by low and by high). On each price tick the gaps that can possibly be
+touched or within proximity are found by binary search, their distances
+are recomputed in bulk with numpy, and only state transitions are returned:
+
+    entered_proximity   FAR -> NEAR
+    touched             FAR/NEAR -> TOUCHED
+    untouched           TOUCHED -> NEAR
+    left                NEAR/TOUCHED -> FAR
+
+Distance and touch semantics match FVGScanner.calculate_distance_percentage
+and FVGScanner.is_fvg_touched.
+"""
+
+import numpy as np
+
+FAR, NEAR, TOUCHED = 0, 1, 2
+STATE_NAMES = {FAR: 'far', NEAR: 'near', TOUCHED: 'touched'}
+
+def transition_name(old_state, new_state):
+    if new_state == TOUCHED:
+        return 'touched'
+    if new_state == NEAR:
+        return 'untouched' if old_state == TOUCHED else 'entered_proximity'
+    return 'left'
+
+def bulk_distance_percentage(price, lows, highs):
+    """Vectorized calculate_distance_percentage"""
+    below = (lows - price) / price * 100
+    above = (price - highs) / price * 100
+    return np.where(price < lows, below, np.where(price > highs, above, 0.0))
+
+class SymbolTouchIndex:
+    """Sorted FVG bounds for one symbol"""
+
+    def __init__(self, symbol, proximity_pct=1.0, touch_tolerance=0.001):
+        self.symbol = symbol
+        self.proximity_pct = proximity_pct
+        self.touch_tolerance = touch_tolerance
+        self.entries = []
+        self.ids = {}
+        self._lows = np.empty(0)
+        self._highs = np.empty(0)
+        self._low_order = np.empty(0, dtype=np.int64)
+        self._high_order = np.empty(0, dtype=np.int64)
+        self._low_sorted = np.empty(0)
+        self._high_sorted = np.empty(0)
+        self._state = np.empty(0, dtype=np.int8)
+        self._active = np.empty(0, dtype=np.int64)   # Positions not in FAR state
+        self.last_price = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def rebuild(self, entries):
+        """
+        Replace the indexed gaps
+
+        entries: iterable of dicts with at least 'fvg_id', 'gap_low', 'gap_high'.
+        States of gaps that survive the rebuild (same fvg_id) are kept so a
+        rescan does not re-emit transitions.
+        """
+        previous = {entry['fvg_id']: self._state[pos] for entry, pos in
+                    ((e, self.ids[e['fvg_id']]) for e in self.entries)}
+
+        self.entries = list(entries)
+        self.ids = {entry['fvg_id']: pos for pos, entry in enumerate(self.entries)}
+
+        self._lows = np.fromiter((e['gap_low'] for e in self.entries), dtype=np.float64, count=len(self.entries))
+        self._highs = np.fromiter((e['gap_high'] for e in self.entries), dtype=np.float64, count=len(self.entries))
+        self._low_order = np.argsort(self._lows, kind='stable')
+        self._high_order = np.argsort(self._highs, kind='stable')
+        self._low_sorted = self._lows[self._low_order]
+        self._high_sorted = self._highs[self._high_order]
+
+        self._state = np.fromiter((previous.get(e['fvg_id'], FAR) for e in self.entries),
+                                  dtype=np.int8, count=len(self.entries))
+        self._active = np.flatnonzero(self._state).astype(np.int64)
+
+    def _candidates(self, price):
+        """Positions whose bounds can be NEAR or TOUCHED at this price (binary search)"""
+        proximity = self.proximity_pct / 100
+        tolerance = self.touch_tolerance
+        # distance <= proximity  <=>  low <= p(1+prox) and high >= p(1-prox)
+        # touched                <=>  low <= p/(1-tol) and high >= p/(1+tol)
+        low_bound = max(price * (1 + proximity), price / (1 - tolerance))
+        high_bound = min(price * (1 - proximity), price / (1 + tolerance))
+
+        n_low = np.searchsorted(self._low_sorted, low_bound, side='right')
+        first_high = np.searchsorted(self._high_sorted, high_bound, side='left')
+
+        # Walk the smaller side, filter with the other bound
+        if n_low <= len(self._high_sorted) - first_high:
+            positions = self._low_order[:n_low]
+            return positions[self._highs[positions] >= high_bound]
+        positions = self._high_order[first_high:]
+        return positions[self._lows[positions] <= low_bound]
+
+    def update(self, price):
+        """
+        Re-evaluate at a new price
+
+        Returns a list of (entry, transition, distance_pct) for gaps whose
+        state changed.
+        """
+        self.last_price = price
+        if not self.entries or not price or price <= 0:
+            return []
+
+        candidates = self._candidates(price)
+        positions = np.union1d(candidates, self._active)
+        if positions.size == 0:
+            return []
+
+        lows = self._lows[positions]
+        highs = self._highs[positions]
+        distances = bulk_distance_percentage(price, lows, highs)
+        touched = (price >= lows * (1 - self.touch_tolerance)) & (price <= highs * (1 + self.touch_tolerance))
+        near = distances <= self.proximity_pct
+
+        new_states = np.where(touched, TOUCHED, np.where(near, NEAR, FAR)).astype(np.int8)
+        old_states = self._state[positions]
+        changed = np.flatnonzero(new_states != old_states)
+
+        self._state[positions] = new_states
+        self._active = positions[new_states != FAR]
+
+        return [
+            (self.entries[positions[i]],
+             transition_name(old_states[i], new_states[i]),
+             round(float(distances[i]), 2))
+            for i in changed
+        ]
+
+    def states(self):
+        """fvg_id -> state name for every gap that is not FAR"""
+        return {self.entries[pos]['fvg_id']: STATE_NAMES[int(self._state[pos])] for pos in self._active}
+
+class TouchIndex:
+    """Per-symbol touch indexes for the whole universe"""
+
+    def __init__(self, proximity_pct=1.0, touch_tolerance=0.001):
+        self.proximity_pct = proximity_pct
+        self.touch_tolerance = touch_tolerance
+        self.symbols = {}
+
+    def __len__(self):
+        return sum(len(index) for index in self.symbols.values())
+
+    def set_proximity(self, proximity_pct):
+        self.proximity_pct = proximity_pct
+        for index in self.symbols.values():
+            index.proximity_pct = proximity_pct
+
+    def rebuild_symbol(self, symbol, entries):
+        index = self.symbols.get(symbol)
+        if index is None:
+            index = self.symbols[symbol] = SymbolTouchIndex(symbol, self.proximity_pct, self.touch_tolerance)
+        index.rebuild(entries)
+        return index
+
+    def remove_symbol(self, symbol):
+        self.symbols.pop(symbol, None)
+
+    def on_price(self, symbol, price):
+        """Transitions for one symbol at a new price"""
+        index = self.symbols.get(symbol)
+        if index is None:
+            return []
+        return index.update(price)